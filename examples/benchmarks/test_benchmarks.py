@@ -231,3 +231,58 @@ async def import_benchmark(rs, model_class, models):
 @pytest.mark.parametrize("rs, ab, models, model_class, key_prefix", parameters)
 def test_bulk_insert(rs, ab, models, model_class, key_prefix):
     ab(import_benchmark, rs, model_class, models)
+
+
+def serialize_benchmark(model_class, models):
+    for model in models:
+        model_class.serialize_partially(model.dict())
+
+
+def deserialize_benchmark(model_class, serialized_models):
+    for serialized in serialized_models:
+        model_class.deserialize_partially(dict(serialized))
+
+
+@pytest.mark.parametrize("rs, ab, models, model_class, key_prefix", parameters)
+def test_serialize(rs, ab, models, model_class, key_prefix):
+    ab(serialize_benchmark, model_class, models)
+
+
+@pytest.mark.parametrize("rs, ab, models, model_class, key_prefix", parameters)
+def test_deserialize(rs, ab, models, model_class, key_prefix):
+    serialized_models = [model_class.serialize_partially(model.dict()) for model in models]
+    ab(deserialize_benchmark, model_class, serialized_models)
+
+
+@pytest.mark.parametrize("json_backend", ["json", "orjson", "ujson"])
+@pytest.mark.parametrize("rs, ab, models, model_class, key_prefix", parameters[:2])
+def test_serialize_json_backends(rs, ab, models, model_class, key_prefix, json_backend):
+    model_class._json_backend = json_backend
+    model_class.build_serialization_plan()
+    try:
+        ab(serialize_benchmark, model_class, models)
+    finally:
+        model_class._json_backend = None
+        model_class.build_serialization_plan()
+
+
+def hydrate_benchmark(model_class, records):
+    for record in records:
+        model_class._from_record(dict(record))
+
+
+@pytest.mark.parametrize("trusted_reads", [False, True])
+@pytest.mark.parametrize("rs, ab, models, model_class, key_prefix", parameters)
+def test_hydrate(rs, ab, models, model_class, key_prefix, trusted_reads):
+    # rows come back from redis as text
+    records = [
+        model_class.deserialize_partially(
+            {field: str(value) for field, value in model_class.serialize_partially(model.dict()).items()}
+        )
+        for model in models
+    ]
+    model_class._trusted_reads = trusted_reads
+    try:
+        ab(hydrate_benchmark, model_class, records)
+    finally:
+        model_class._trusted_reads = False
@@ -7,5 +7,7 @@ from .config import RedisConfig  # noqa: F401
 from .model import Model  # noqa: F401
 from .model import AutoModel  # noqa: F401
 from .store import Store  # noqa: F401
+from .store import ClusterStore  # noqa: F401
+from .store import ShardedStore  # noqa: F401
 
-__all__ = ["RedisConfig", "Model", "AutoModel", "Store"]
+__all__ = ["RedisConfig", "Model", "AutoModel", "Store", "ClusterStore", "ShardedStore"]
@@ -1,6 +1,5 @@
 """Module containing the main base classes"""
 
-import json
 from datetime import date
 from datetime import datetime
 from typing import Any
@@ -12,8 +11,11 @@ from typing import Union
 from pydantic import BaseModel
 from pydantic_aioredis.config import RedisConfig
 from redis import asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster
 
-from .types import JSON_DUMP_SHAPES
+from .codec import build_json_codecs
+from .codec import build_msgpack_codecs
+from .codec import SerializationPlan
 from .types import STR_DUMP_SHAPES
 
 
@@ -24,8 +26,14 @@ class _AbstractStore(BaseModel):
 
     name: str
     redis_config: RedisConfig
-    redis_store: aioredis.Redis = None
+    redis_store: Union[aioredis.Redis, RedisCluster] = None
     life_span_in_seconds: int = None
+    json_backend: str = "json"
+    coalesce_window: Optional[float] = None
+    hash_tags: Optional[str] = None
+    index_shards: int = 1
+    replica_stores: List[aioredis.Redis] = []
+    read_policy: str = "round_robin"
 
     class Config:
         """Pydantic schema config for _AbstractStore"""
@@ -43,6 +51,11 @@ class _AbstractModel(BaseModel):
     _primary_key_field: str
     _table_name: Optional[str] = None
     _auto_sync: bool = True
+    _json_backend: Optional[str] = None
+    _codec: str = "json"
+    _compression: Optional[str] = None
+    _compression_threshold: int = 1024
+    _compressed_fields: List[str] = []
 
     @classmethod
     def json_object_hook(cls, obj: dict):
@@ -68,6 +81,7 @@ class _AbstractModel(BaseModel):
     def serialize_partially(cls, data: Dict[str, Any]):
         """Converts data types that are not compatible with Redis into json strings
         by looping through the models fields and inspecting its types.
+        Models using the msgpack codec have all of their fields packed into bytes instead.
 
             str, float, int - will be stored in redis as a string field
             None - will be converted to the string "None"
@@ -76,20 +90,10 @@ class _AbstractModel(BaseModel):
         The json dumper uses class.json_default as its default serializer.
         Users can override json_default with a custom json serializer if they chose to.
         Users can override serialze paritally and deserialze partially
+
+        The per field work is decided once per model by its serialization plan, see get_serialization_plan
         """
-        columns = data.keys()
-        for field in cls.__fields__:
-            # if we're updating a few columns, we might not have all fields, skip ones we dont have
-            if field not in columns:
-                continue
-            if cls.__fields__[field].type_ not in [str, float, int]:
-                data[field] = json.dumps(data[field], default=cls.json_default)
-            if getattr(cls.__fields__[field], "shape", None) in JSON_DUMP_SHAPES:
-                data[field] = json.dumps(data[field], default=cls.json_default)
-            if getattr(cls.__fields__[field], "allow_none", False):
-                if data[field] is None:
-                    data[field] = "None"
-        return data
+        return cls.get_serialization_plan().serialize(data)
 
     @classmethod
     def deserialize_partially(cls, data: Dict[bytes, Any]):
@@ -97,19 +101,45 @@ class _AbstractModel(BaseModel):
 
         Users can override serialze paritally and deserialze partially
         """
-        columns = data.keys()
-        for field in cls.__fields__:
-            # if we're selecting a few columns, we might not have all fields, skip ones we dont have
-            if field not in columns:
-                continue
-            if cls.__fields__[field].type_ not in [str, float, int]:
-                data[field] = json.loads(data[field], object_hook=cls.json_object_hook)
-            if getattr(cls.__fields__[field], "shape", None) in JSON_DUMP_SHAPES:
-                data[field] = json.loads(data[field], object_hook=cls.json_object_hook)
-            if getattr(cls.__fields__[field], "allow_none", False):
-                if data[field] == "None":
-                    data[field] = None
-        return data
+        return cls.get_serialization_plan().deserialize(data)
+
+    @classmethod
+    def get_serialization_plan(cls) -> SerializationPlan:
+        """Gets the serialization plan of this model, building it if the model has not been registered to a store"""
+        # look in this class only, a subclass can have different fields than the model it inherits the plan from
+        plan = cls.__dict__.get("_serialization_plan")
+        if plan is None:
+            plan = cls.build_serialization_plan()
+        return plan
+
+    @classmethod
+    def build_serialization_plan(cls) -> SerializationPlan:
+        """(Re)builds the serialization plan of this model from its fields, Store.register_model calls this"""
+        json_backend = cls._json_backend
+        if json_backend is None:
+            store = getattr(cls, "_store", None)
+            json_backend = store.json_backend if store is not None else "json"
+        # the object hook costs a call for every decoded json object, only use it when it does something
+        custom_default = cls.json_default.__func__ is not _AbstractModel.json_default.__func__
+        custom_object_hook = cls.json_object_hook.__func__ is not _AbstractModel.json_object_hook.__func__
+        dumps, loads = build_json_codecs(
+            json_backend,
+            default=cls.json_default,
+            object_hook=cls.json_object_hook if custom_object_hook else None,
+            custom_default=custom_default,
+        )
+        packb, unpackb = build_msgpack_codecs(default=cls.json_default) if cls._codec == "msgpack" else (None, None)
+        cls._serialization_plan = SerializationPlan(
+            cls,
+            dumps,
+            loads,
+            packb=packb,
+            unpackb=unpackb,
+            compression=cls._compression,
+            compression_threshold=cls._compression_threshold,
+            compressed_fields=cls._compressed_fields,
+        )
+        return cls._serialization_plan
 
     @classmethod
     def get_primary_key_field(cls):
@@ -0,0 +1,108 @@
+"""Module containing the in-process cache of model instances"""
+
+from collections import namedtuple
+from collections import OrderedDict
+from time import monotonic
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "size", "max_size"])
+
+
+class RecordCache:
+    """
+    A least recently used cache of model instances by redis key, with an optional time to live
+
+    Instances are copied on the way out, so callers can change what they get without changing the cache.
+
+    Reads that started before an invalidation can't fill the cache: get the generation before reading redis and pass
+    it to set, which ignores it if anything was invalidated since.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Gets a copy of the instance cached for key, None if there is none or it expired"""
+        entry = self._lookup(key)
+        return None if entry is None else entry[1].copy(deep=True)
+
+    def set(self, key: str, instance: Any, generation: int) -> None:
+        """Caches a copy of instance for key, unless something was invalidated since generation"""
+        self._store(key, instance.copy(deep=True), generation)
+
+    def _lookup(self, key: str) -> Optional[Tuple[Optional[float], Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at = entry[0]
+        if expires_at is not None and expires_at <= monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _store(self, key: str, value: Any, generation: int) -> None:
+        if generation != self.generation:
+            return
+        expires_at = None if self.ttl is None else monotonic() + self.ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys: str) -> None:
+        """Drops the instances cached for keys"""
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def invalidate_all(self) -> None:
+        """Drops every cached instance, keeping the counters"""
+        self.generation += 1
+        self._entries.clear()
+
+    def clear(self) -> None:
+        """Drops every cached instance and resets the counters"""
+        self.generation += 1
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        """The hit, miss and eviction counters and the size of the cache"""
+        return CacheInfo(self.hits, self.misses, self.evictions, len(self._entries), self.max_size)
+
+
+class MissCache(RecordCache):
+    """
+    A least recently used cache of the redis keys of rows that don't exist, each one kept for ttl seconds
+
+    Invalidating works like it does for RecordCache, so a read that started before a row was written can't record it
+    as missing.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        super().__init__(max_size, ttl)
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key) is not None
+
+    def add(self, keys: List[str], generation: int) -> None:
+        """Records that the rows at keys don't exist, unless something was invalidated since generation"""
+        for key in keys:
+            self._store(key, True, generation)
@@ -0,0 +1,70 @@
+"""Module containing the write coalescer used to merge concurrent writes to the same rows"""
+
+import asyncio
+from typing import Any
+from typing import Dict
+from typing import FrozenSet
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+class WriteCoalescer:
+    """
+    Merges writes to the same rows that happen within a short window
+
+    save() and insert() hand their instances to the coalescer instead of writing them. After window seconds, or on
+    the next turn of the event loop when window is 0, every pending write is sent together: one row write per
+    primary key, with one pipeline per model. Every caller whose write was part of it is resumed when it is done.
+    Each model is written on its own, so if the write of one model fails only the callers with rows of that model get
+    the error, and the other models in the window are still written.
+    """
+
+    def __init__(self, window: float = 0):
+        self.window = window
+        # pending writes by model and primary key, each one an instance and if it has to write the whole row
+        self._pending: Dict[type, Dict[Any, List[Tuple[Any, bool]]]] = {}
+        # each waiting caller, with the models of the instances it handed over
+        self._waiters: List[Tuple[asyncio.Future, FrozenSet[type]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._pending.values())
+
+    async def submit(self, instances: List[Any], full: bool = False) -> None:
+        """Waits until instances are written together with the other writes in the window, full writes whole rows"""
+        loop = asyncio.get_running_loop()
+        for instance in instances:
+            model_class = type(instance)
+            primary_key = getattr(instance, model_class._primary_key_field)
+            self._pending.setdefault(model_class, {}).setdefault(primary_key, []).append((instance, full))
+        waiter = loop.create_future()
+        self._waiters.append((waiter, frozenset(type(instance) for instance in instances)))
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        await waiter
+
+    async def flush(self) -> None:
+        """Waits until every pending write is sent"""
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.window)
+            pending, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, []
+            errors: Dict[type, Exception] = {}
+            for model_class, rows in pending.items():
+                try:
+                    await model_class._write_coalesced(list(rows.values()))
+                except Exception as exc:  # noqa: BLE001 - handed to the callers with rows of this model
+                    errors[model_class] = exc
+            for waiter, model_classes in waiters:
+                if waiter.done():
+                    continue
+                failed = [errors[model_class] for model_class in model_classes if model_class in errors]
+                if len(failed) > 0:
+                    waiter.set_exception(failed[0])
+                else:
+                    waiter.set_result(None)
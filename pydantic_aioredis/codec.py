@@ -0,0 +1,496 @@
+"""Module containing the per model serialization plans"""
+
+import json
+import struct
+import zlib
+from base64 import b64decode
+from base64 import b64encode
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from decimal import Decimal
+from enum import Enum
+from importlib import import_module
+from ipaddress import IPv4Address
+from ipaddress import IPv4Network
+from ipaddress import IPv6Address
+from ipaddress import IPv6Network
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+from uuid import UUID
+
+from pydantic import BaseModel
+from pydantic import ValidationError
+from pydantic.fields import ModelField
+from pydantic.fields import SHAPE_SINGLETON
+
+from .types import JSON_DUMP_SHAPES
+
+FieldCodec = Callable[[Any], Any]
+
+# CODECS are the formats a model's values can be stored in, set with _codec
+# json stores text and works with any connection, msgpack stores compact binary and needs a store that doesn't
+# decode responses
+CODECS = ("json", "msgpack")
+
+# JSON_BACKENDS are the json libraries that can be used to encode fields, json is the standard library
+JSON_BACKENDS = ("json", "orjson", "ujson")
+
+# COMPRESSIONS are the algorithms large values can be compressed with, set with _compression
+COMPRESSIONS = ("zlib", "lz4")
+
+# compressed values start with the marker followed by a tag for the algorithm. Values are never stored starting with
+# the marker uncompressed, so reading them back is never ambiguous
+_MARKER = "\x1f"
+_COMPRESSION_TAGS = {"zlib": "z", "lz4": "l"}
+
+# msgpack extension type codes for the types msgpack does not handle itself
+EXT_DATE = 1
+EXT_DATETIME = 2
+EXT_UUID = 3
+EXT_IPV4_ADDRESS = 4
+EXT_IPV6_ADDRESS = 5
+EXT_IPV4_NETWORK = 6
+EXT_IPV6_NETWORK = 7
+EXT_DECIMAL = 8
+
+_EPOCH = datetime(1970, 1, 1)
+# the utc offset stored for naive datetimes, real offsets are always less than a day
+_NAIVE = -(2**31)
+_DATETIME = struct.Struct(">qi")
+_DATE = struct.Struct(">i")
+
+# how the values of simple field types are built from what the codecs decode, for trusted reads
+_TRUSTED_PARSERS: Dict[type, FieldCodec] = {
+    int: int,
+    float: float,
+    Decimal: Decimal,
+    date: date.fromisoformat,
+    datetime: datetime.fromisoformat,
+    UUID: UUID,
+}
+
+
+def build_json_codecs(
+    backend: str,
+    default: FieldCodec,
+    object_hook: Optional[FieldCodec] = None,
+    custom_default: bool = False,
+) -> Tuple[FieldCodec, FieldCodec]:
+    """Builds the dumps and loads functions of a json backend
+
+    default is called for objects the backend can not serialize. orjson serializes datetimes natively, when
+    custom_default is set they are passed to default instead.
+    object_hook is called with every decoded json object, None skips that work for backends that do not support it
+    natively.
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unknown json backend {backend}, use one of {', '.join(JSON_BACKENDS)}")
+
+    if backend == "json":
+        # json.dumps and json.loads build a new encoder/decoder on every call when given hooks, build them once instead
+        return json.JSONEncoder(default=default).encode, json.JSONDecoder(object_hook=object_hook).decode
+
+    try:
+        module = import_module(backend)
+    except ImportError as exc:
+        raise ImportError(f"The {backend} json backend needs {backend} installed: pip install {backend}") from exc
+
+    if backend == "orjson":
+        option = module.OPT_NON_STR_KEYS
+        if custom_default:
+            option |= module.OPT_PASSTHROUGH_DATETIME
+
+        def dumps(value: Any) -> str:
+            return module.dumps(value, default=default, option=option).decode("utf-8")
+
+    else:
+
+        def dumps(value: Any) -> str:
+            return module.dumps(value, default=default, escape_forward_slashes=False)
+
+    loads = module.loads
+    if object_hook is not None:
+
+        def loads(value: str) -> Any:
+            return _apply_object_hook(module.loads(value), object_hook)
+
+    return dumps, loads
+
+
+def _apply_object_hook(value: Any, object_hook: FieldCodec) -> Any:
+    """Calls object_hook on every dict in a decoded json value, innermost first, the same as json.loads does"""
+    if isinstance(value, dict):
+        return object_hook({key: _apply_object_hook(item, object_hook) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_apply_object_hook(item, object_hook) for item in value]
+    return value
+
+
+def build_msgpack_codecs(default: FieldCodec) -> Tuple[FieldCodec, FieldCodec]:
+    """Builds the packb and unpackb functions of the msgpack codec
+
+    dates, datetimes, UUIDs, ip addresses and networks and Decimals are packed as compact extension types.
+    default is called for objects msgpack can not pack, its result is packed instead.
+    """
+    try:
+        msgpack = import_module("msgpack")
+    except ImportError as exc:
+        raise ImportError("The msgpack codec needs msgpack installed: pip install msgpack") from exc
+
+    def pack_default(obj: Any) -> Any:
+        if isinstance(obj, datetime):
+            offset = obj.utcoffset()
+            micros = (obj.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+            offset_seconds = _NAIVE if offset is None else int(offset.total_seconds())
+            return msgpack.ExtType(EXT_DATETIME, _DATETIME.pack(micros, offset_seconds))
+        if isinstance(obj, date):
+            return msgpack.ExtType(EXT_DATE, _DATE.pack(obj.toordinal()))
+        if isinstance(obj, UUID):
+            return msgpack.ExtType(EXT_UUID, obj.bytes)
+        if isinstance(obj, IPv4Address):
+            return msgpack.ExtType(EXT_IPV4_ADDRESS, obj.packed)
+        if isinstance(obj, IPv6Address):
+            return msgpack.ExtType(EXT_IPV6_ADDRESS, obj.packed)
+        if isinstance(obj, IPv4Network):
+            return msgpack.ExtType(EXT_IPV4_NETWORK, obj.network_address.packed + bytes([obj.prefixlen]))
+        if isinstance(obj, IPv6Network):
+            return msgpack.ExtType(EXT_IPV6_NETWORK, obj.network_address.packed + bytes([obj.prefixlen]))
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(EXT_DECIMAL, str(obj).encode("ascii"))
+        if isinstance(obj, Enum):
+            return obj.value
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        return default(obj)
+
+    def ext_hook(code: int, data: bytes) -> Any:
+        if code == EXT_DATETIME:
+            micros, offset_seconds = _DATETIME.unpack(data)
+            value = _EPOCH + timedelta(microseconds=micros)
+            if offset_seconds == _NAIVE:
+                return value
+            return value.replace(tzinfo=timezone(timedelta(seconds=offset_seconds)))
+        if code == EXT_DATE:
+            return date.fromordinal(_DATE.unpack(data)[0])
+        if code == EXT_UUID:
+            return UUID(bytes=data)
+        if code == EXT_IPV4_ADDRESS:
+            return IPv4Address(data)
+        if code == EXT_IPV6_ADDRESS:
+            return IPv6Address(data)
+        if code == EXT_IPV4_NETWORK:
+            return IPv4Network((data[:4], data[4]))
+        if code == EXT_IPV6_NETWORK:
+            return IPv6Network((data[:16], data[16]))
+        if code == EXT_DECIMAL:
+            return Decimal(data.decode("ascii"))
+        return msgpack.ExtType(code, data)
+
+    packer = msgpack.Packer(default=pack_default, use_bin_type=True)
+
+    def unpackb(value: bytes) -> Any:
+        return msgpack.unpackb(value, ext_hook=ext_hook, raw=False, strict_map_key=False)
+
+    return packer.pack, unpackb
+
+
+def _compression_functions(compression: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """Gets the compress and decompress functions of a compression algorithm"""
+    if compression == "zlib":
+        return zlib.compress, zlib.decompress
+    try:
+        frame = import_module("lz4.frame")
+    except ImportError as exc:
+        raise ImportError("lz4 compression needs lz4 installed: pip install lz4") from exc
+    return frame.compress, frame.decompress
+
+
+def build_compression_codecs(compression: str, threshold: int, binary: bool) -> Tuple[FieldCodec, FieldCodec]:
+    """Builds the functions that compress and decompress encoded values
+
+    Values shorter than threshold, and values that don't get smaller, are stored as they are. Compressed values are
+    marked so they can be told apart, text values are base64 encoded so they can be stored on connections that decode
+    responses. Values marked with any of the COMPRESSIONS are decompressed, whichever one compress uses.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression}, use one of {', '.join(COMPRESSIONS)}")
+    compress_bytes, _ = _compression_functions(compression)
+    decompressors: Dict[str, Callable[[bytes], bytes]] = {}
+
+    def decompress_bytes(tag: str, value: bytes) -> bytes:
+        if tag not in decompressors:
+            algorithm = next(name for name, name_tag in _COMPRESSION_TAGS.items() if name_tag == tag)
+            decompressors[tag] = _compression_functions(algorithm)[1]
+        return decompressors[tag](value)
+
+    if binary:
+        marker = b"\x1f"
+        prefix = marker + _COMPRESSION_TAGS[compression].encode("ascii")
+
+        def compress(value: bytes) -> bytes:
+            if len(value) < threshold and not value.startswith(marker):
+                return value
+            compressed = prefix + compress_bytes(value)
+            if len(compressed) >= len(value) and not value.startswith(marker):
+                return value
+            return compressed
+
+        def decompress(value: bytes) -> bytes:
+            if not value.startswith(marker):
+                return value
+            return decompress_bytes(value[1:2].decode("ascii"), value[2:])
+
+        return compress, decompress
+
+    prefix = _MARKER + _COMPRESSION_TAGS[compression]
+
+    def compress(value: str) -> str:
+        if len(value) < threshold and not value.startswith(_MARKER):
+            return value
+        compressed = prefix + b64encode(compress_bytes(value.encode("utf-8"))).decode("ascii")
+        if len(compressed) >= len(value) and not value.startswith(_MARKER):
+            return value
+        return compressed
+
+    def decompress(value: str) -> str:
+        if not value.startswith(_MARKER):
+            return value
+        return decompress_bytes(value[1], b64decode(value[2:])).decode("utf-8")
+
+    return compress, decompress
+
+
+class SerializationPlan:
+    """
+    The encoder and decoder for each field of a model
+
+    Deciding how a field is stored depends only on the model's field definitions, so it is done once per model
+    when the plan is built instead of once per field per record. Fields that are stored as they are have no
+    encoder or decoder.
+
+    With the json codec, fields are stored as text made with dumps and loads. With the msgpack codec, given packb
+    and unpackb, every field is packed. Either way, index keys are made from the json text of values.
+
+    Given a compression, encoded values of compressed_fields (every field when it's empty) that are at least
+    compression_threshold long are compressed, and whole records are compressed for blob storage. Numbers are
+    never compressed.
+
+    converters turn decoded values into the field's type without validating them, for models with _trusted_reads.
+    required are the fields a record needs to be built that way.
+
+    compressed are the fields whose encoders compress long values.
+
+    mutable are the fields whose values can be changed in place, e.g. lists, dicts and nested models, without setting
+    the field.
+    """
+
+    __slots__ = (
+        "encoders",
+        "decoders",
+        "index_encoders",
+        "encode_record",
+        "decode_record",
+        "binary",
+        "converters",
+        "required",
+        "mutable",
+        "compressed",
+    )
+
+    def __init__(
+        self,
+        model_class: type,
+        dumps: FieldCodec,
+        loads: FieldCodec,
+        packb: Optional[FieldCodec] = None,
+        unpackb: Optional[FieldCodec] = None,
+        compression: Optional[str] = None,
+        compression_threshold: int = 1024,
+        compressed_fields: Optional[Iterable[str]] = None,
+    ):
+        self.encoders: Dict[str, FieldCodec] = {}
+        self.decoders: Dict[str, FieldCodec] = {}
+        for name, field in model_class.__fields__.items():
+            encoder, decoder = _build_field_codecs(field, dumps, loads)
+            if encoder is not None:
+                self.encoders[name] = encoder
+            if decoder is not None:
+                self.decoders[name] = decoder
+        self.index_encoders = self.encoders
+        self.converters = {
+            name: _build_trusted_converter(model_class, name, field) for name, field in model_class.__fields__.items()
+        }
+        self.required = frozenset(name for name, field in model_class.__fields__.items() if field.required)
+        self.mutable = frozenset(name for name, field in model_class.__fields__.items() if _is_mutable(field))
+        self.compressed = frozenset()
+        self.binary = packb is not None
+        # whole records, for models stored as blobs
+        self.encode_record = dumps
+        self.decode_record = loads
+        if self.binary:
+            self.encoders = {name: packb for name in model_class.__fields__}
+            self.decoders = {name: unpackb for name in model_class.__fields__}
+            self.encode_record = packb
+            self.decode_record = unpackb
+        if compression is not None:
+            self._add_compression(model_class, compression, compression_threshold, compressed_fields)
+
+    def _add_compression(
+        self, model_class: type, compression: str, threshold: int, compressed_fields: Optional[Iterable[str]]
+    ) -> None:
+        """Wraps the encoders and decoders of compressed fields, and the record codecs, with compression"""
+        compress, decompress = build_compression_codecs(compression, threshold, self.binary)
+        encoders = dict(self.encoders)
+        decoders = dict(self.decoders)
+        compressed = set()
+        for name in compressed_fields or model_class.__fields__:
+            field = model_class.__fields__[name]
+            is_number = field.type_ in [int, float] and getattr(field, "shape", None) not in JSON_DUMP_SHAPES
+            if is_number and not self.binary:
+                # numbers are stored as they are, they are never long enough to be worth compressing
+                continue
+            encoders[name] = _chain(encoders.get(name), compress)
+            decoders[name] = _chain(decompress, decoders.get(name))
+            compressed.add(name)
+        self.encoders = encoders
+        self.decoders = decoders
+        self.compressed = frozenset(compressed)
+        self.encode_record = _chain(self.encode_record, compress)
+        self.decode_record = _chain(decompress, self.decode_record)
+
+    def serialize(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Encodes the fields in data in place, fields that are not part of the model are left as they are"""
+        encoders = self.encoders
+        for field, value in data.items():
+            encoder = encoders.get(field)
+            if encoder is not None:
+                data[field] = encoder(value)
+        return data
+
+    def index_value(self, field: str, value: Any) -> str:
+        """Encodes the value of field as text for its index key"""
+        encoder = self.index_encoders.get(field)
+        return str(value if encoder is None else encoder(value))
+
+    def deserialize(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Decodes the fields in data in place, fields that are not part of the model are left as they are"""
+        decoders = self.decoders
+        for field, value in data.items():
+            decoder = decoders.get(field)
+            if decoder is not None:
+                data[field] = decoder(value)
+        return data
+
+
+def _build_field_codecs(
+    field: ModelField, dumps: FieldCodec, loads: FieldCodec
+) -> Tuple[Optional[FieldCodec], Optional[FieldCodec]]:
+    """Builds the encoder and decoder for a single field
+
+    str, float, int - are stored in redis as they are
+    None - is stored as the string "None"
+    More complex data types and containers are json dumped, exactly once
+    """
+    is_container = getattr(field, "shape", None) in JSON_DUMP_SHAPES
+    allow_none = getattr(field, "allow_none", False)
+
+    if field.type_ in [str, float, int] and not is_container:
+        if not allow_none:
+            return None, None
+        return _encode_none, _decode_none
+
+    decoder = loads
+    if is_container:
+
+        def decoder(value: str) -> Any:
+            value = loads(value)
+            # older versions json dumped containers of complex data types twice, a container never decodes to a
+            # str so one that does is one of those values and needs a second pass
+            if isinstance(value, str):
+                value = loads(value)
+            return value
+
+    if allow_none:
+        decode = decoder
+
+        def decoder(value: str) -> Any:
+            value = decode(value)
+            return None if value == "None" else value
+
+    return dumps, decoder
+
+
+def _is_mutable(field: ModelField) -> bool:
+    """If the value of field can be changed in place: containers, nested models, and anything typed Any"""
+    if field.shape != SHAPE_SINGLETON:
+        return True
+    if field.sub_fields:
+        # a union is mutable if any of its types is
+        return any(_is_mutable(sub_field) for sub_field in field.sub_fields)
+    outer_type = field.outer_type_
+    if outer_type is Any:
+        return True
+    return isinstance(outer_type, type) and issubclass(outer_type, (BaseModel, dict, list, set, bytearray))
+
+
+def _build_trusted_converter(model_class: type, name: str, field: ModelField) -> FieldCodec:
+    """
+    Builds the converter of a single field for trusted reads
+
+    Values that already have the field's type are kept, values of simple types are parsed from text, and anything
+    else, e.g. containers, nested models and unions, is validated by the field as usual.
+    """
+    target = field.type_
+    allow_none = getattr(field, "allow_none", False)
+    is_container = getattr(field, "shape", None) in JSON_DUMP_SHAPES or bool(field.sub_fields)
+    parse = None if is_container else _TRUSTED_PARSERS.get(target)
+    if is_container or (parse is None and target not in (str, bool)):
+        # no value is ever kept as it is, they are all validated
+        target = None
+
+    def validate(value: Any) -> Any:
+        value, errors = field.validate(value, {}, loc=name, cls=model_class)
+        if errors:
+            raise ValidationError([errors], model_class)
+        return value
+
+    def convert(value: Any) -> Any:
+        if type(value) is target:
+            return value
+        if value is None and allow_none:
+            return None
+        if parse is not None:
+            try:
+                return parse(value)
+            except (TypeError, ValueError):
+                pass
+        return validate(value)
+
+    return convert
+
+
+def _chain(first: Optional[FieldCodec], second: Optional[FieldCodec]) -> FieldCodec:
+    """Returns a codec that calls first and then second, either can be None to skip it"""
+    if first is None:
+        return second
+    if second is None:
+        return first
+
+    def chained(value: Any) -> Any:
+        return second(first(value))
+
+    return chained
+
+
+def _encode_none(value: Any) -> Any:
+    return "None" if value is None else value
+
+
+def _decode_none(value: Any) -> Any:
+    return None if value == "None" else value
@@ -1,6 +1,8 @@
 """Module containing the main config classes"""
 
+from typing import List
 from typing import Optional
+from typing import Tuple
 
 from pydantic import BaseModel
 
@@ -14,6 +16,13 @@ class RedisConfig(BaseModel):
     password: Optional[str] = None
     ssl: bool = False
     encoding: Optional[str] = "utf-8"
+    # models using the msgpack codec store binary values, they need a connection that does not decode responses
+    decode_responses: bool = True
+    # read only replicas of this server as (host, port), they share its db, password and ssl. See Store read_policy
+    replicas: List[Tuple[str, int]] = []
+    # sentinels as (host, port) that know the primary and replicas of sentinel_service, used instead of host and port
+    sentinels: List[Tuple[str, int]] = []
+    sentinel_service: Optional[str] = None
 
     @property
     def redis_url(self) -> str:
@@ -23,6 +32,10 @@ class RedisConfig(BaseModel):
             return f"{proto}://{self.host}:{self.port}/{self.db}"
         return f"{proto}://:{self.password}@{self.host}:{self.port}/{self.db}"
 
+    def replica_url(self, host: str, port: int) -> str:
+        """Returns a redis url to connect to the replica at host and port"""
+        return self.copy(update={"host": host, "port": port}).redis_url
+
     class Config:
         """Pydantic schema config"""
 
@@ -0,0 +1,80 @@
+"""Module containing the lazy rows returned by select(lazy=True)"""
+
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Set
+
+from pydantic import ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
+
+
+class LazyRecord:
+    """
+    A row read from redis that validates its fields when they are read, instead of all of them up front
+
+    Reading a field validates that field only, including its validators, and the value is kept for the next read.
+    Fields of models with _trusted_reads are only parsed, like the models are.
+    dict() validates the fields it returns. Root validators, and field validators that look at the values of other
+    fields, only run with to_model(), which builds the model from every field and returns the same instance each time.
+
+    Lazy rows are read only, use to_model() to change and save a row.
+    """
+
+    __slots__ = ("_model_class", "_raw", "_values", "_model")
+
+    def __init__(self, model_class: type, raw: Dict[str, Any]):
+        object.__setattr__(self, "_model_class", model_class)
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_values", {})
+        object.__setattr__(self, "_model", None)
+
+    @property
+    def raw(self) -> Dict[str, Any]:
+        """The row as it was decoded from redis, before validation"""
+        return self._raw
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in self._model_class.__fields__:
+            raise AttributeError(f"{self._model_class.__name__} has no field {name}")
+        return self._field(name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise TypeError(f"Lazy {self._model_class.__name__} rows are read only, change to_model() instead")
+
+    def _field(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+        field = self._model_class.__fields__[name]
+        if name in self._raw and self._model_class._trusted_reads:
+            value = self._model_class.get_serialization_plan().converters[name](self._raw[name])
+        elif name in self._raw:
+            value, errors = field.validate(self._raw[name], dict(self._values), loc=name, cls=self._model_class)
+            if errors:
+                raise ValidationError([errors], self._model_class)
+        elif field.required:
+            raise ValidationError([ErrorWrapper(MissingError(), loc=name)], self._model_class)
+        else:
+            value = field.get_default()
+        self._values[name] = value
+        return value
+
+    def dict(self, include: Optional[Set[str]] = None, exclude: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """The validated values of the fields in include, every field by default, except the ones in exclude"""
+        names = self._model_class.__fields__ if include is None else include
+        return {name: self._field(name) for name in names if exclude is None or name not in exclude}
+
+    def to_model(self) -> Any:
+        """The model with every field validated, built the first time it is asked for"""
+        if self._model is None:
+            object.__setattr__(self, "_model", self._model_class._from_record(self._raw))
+        return self._model
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, LazyRecord):
+            other = other.to_model()
+        return self.to_model() == other
+
+    def __repr__(self) -> str:
+        return f"Lazy{self._model_class.__name__}({self._raw!r})"
@@ -0,0 +1,51 @@
+"""Module containing the batch loader used by Model.get"""
+
+import asyncio
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+
+class BatchLoader:
+    """
+    Collects the keys loaded in the same turn of the event loop and loads them with one call to load_many
+
+    load_many gets the distinct keys in the order they were asked for, and returns a result for each of them in the
+    same order. Every caller is resumed with the result for its key, or with the error if load_many failed.
+    """
+
+    def __init__(self, load_many: Callable[[List[Any]], Awaitable[List[Any]]]):
+        self.load_many = load_many
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+
+    async def load(self, key: Any) -> Any:
+        """Loads key together with every other key loaded in this turn of the event loop"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, future))
+        if len(self._pending) == 1:
+            # runs after every coroutine that is ready now had its turn
+            loop.call_soon(self._dispatch, loop)
+        return await future
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        pending, self._pending = self._pending, []
+        loop.create_task(self._load(pending))
+
+    async def _load(self, pending: List[Tuple[Any, asyncio.Future]]) -> None:
+        keys: Dict[Any, int] = {}
+        for key, _ in pending:
+            keys.setdefault(key, len(keys))
+        try:
+            results = await self.load_many(list(keys))
+        except Exception as exc:  # noqa: BLE001 - handed to every caller of the batch
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for key, future in pending:
+            if not future.done():
+                future.set_result(results[keys[key]])
@@ -1,17 +1,56 @@
 """Module containing the model classes"""
 
 import asyncio
+import heapq
 from contextlib import asynccontextmanager
+from copy import copy
 from functools import lru_cache
-from sys import version_info
+from time import monotonic
 from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Set
 from typing import Tuple
+from typing import Type
 from typing import Union
+from zlib import crc32
 
+from pydantic import BaseModel
+from pydantic import create_model
+from pydantic import PrivateAttr
+from pydantic import ValidationError
+from pydantic import validator
 from pydantic_aioredis.abstract import _AbstractModel
-from pydantic_aioredis.utils import bytes_to_string, NestedAsyncIO
+from pydantic_aioredis.cache import CacheInfo
+from pydantic_aioredis.cache import MissCache
+from pydantic_aioredis.cache import RecordCache
+from pydantic_aioredis.lazy import LazyRecord
+from pydantic_aioredis.loader import BatchLoader
+
+from pydantic_aioredis.utils import bytes_to_string, decode_cursor, encode_cursor, to_score
+from redis.exceptions import ResponseError
+from redis.exceptions import WatchError
+
+# writes the changed fields of a row only if the row still exists, so a partial save never leaves a partial row behind
+# KEYS are the row key and the keys to expire with it, ARGV is the life span (empty for none) and the fields and values
+_SAVE_CHANGED_FIELDS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if #ARGV > 1 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+end
+if ARGV[1] ~= '' then
+    for _, key in ipairs(KEYS) do
+        redis.call('EXPIRE', key, ARGV[1])
+    end
+end
+return 1
+"""
 
 
 class Model(_AbstractModel):
@@ -24,6 +63,24 @@ class Model(_AbstractModel):
     _redis_prefix -- If set, will be added to the beginning of the keys we store in redis
     _redis_separator -- Defaults to :, used to separate prefix, table_name, and primary_key
     _table_name -- Defaults to the model's name, can set a custom name in redis
+    _codec -- Defaults to json, the format values are stored in. msgpack stores compact binary values
+    _compression -- Defaults to None, set to zlib or lz4 to compress long values, see COMPRESSIONS
+    _compression_threshold -- Defaults to 1024, values shorter than this are not compressed
+    _compressed_fields -- The fields to compress, defaults to every field
+    _storage -- Defaults to hash, each row is stored as a redis hash with a field per model field.
+        blob stores each row as a single serialized string instead, see STORAGE_MODES
+    _indexes -- A list of fields to keep secondary indexes for, these fields can be queried with select(where=...)
+    _sorted_indexes -- A list of numeric, date or datetime fields to keep sorted indexes for, these fields can be
+        used to order and filter with select(order_by=..., min=..., max=...)
+    _cache_size -- Defaults to None, set it to keep up to that many rows in an in-process cache for select and get
+    _cache_ttl -- Defaults to None, the number of seconds rows are cached for. None keeps them until they are evicted
+    _negative_cache_ttl -- Defaults to None, set it to remember for that many seconds that rows don't exist, so select
+        and get of missing ids don't read redis again
+    _negative_cache_size -- Defaults to 10000, the number of missing rows remembered
+    _trusted_reads -- Defaults to False, set it to build rows read from redis without validating them, only parsing
+        simple types such as numbers and dates. Only for models whose rows are written by this library
+    _read_your_writes -- Defaults to None, set it to read from the primary instead of replicas for that many seconds
+        after this process writes rows of this model, so reads see the writes before they reach the replicas
 
 
     If your model was named ThisModel, the primary key was "key", and prefix and
@@ -33,6 +90,17 @@ class Model(_AbstractModel):
 
     _auto_sync = False
     _auto_save = False
+    _storage: str = "hash"
+    _indexes: List[str] = []
+    _sorted_indexes: List[str] = []
+    _cache_size: Optional[int] = None
+    _cache_ttl: Optional[float] = None
+    _negative_cache_ttl: Optional[float] = None
+    _negative_cache_size: int = 10000
+    _trusted_reads: bool = False
+    _read_your_writes: Optional[float] = None
+    # the fields changed since this instance was last saved or selected, None if it never was
+    _dirty_fields: Optional[Set[str]] = PrivateAttr(default=None)
 
     def __init__(self, **data: Any) -> None:
         auto_save = data.pop("auto_save") if "auto_save" in data.keys() else getattr(self, "_auto_save", False)
@@ -52,24 +120,30 @@ class Model(_AbstractModel):
 
         """
         super().__setattr__(name, value)
+        if self._dirty_fields is not None and name in self.__fields__:
+            # copies share private attributes, so the set is replaced rather than changed in place
+            object.__setattr__(self, "_dirty_fields", self._dirty_fields | {name})
         if self._auto_sync and getattr(self, "_store", None) is not None:
             self.__save_from_sync()
 
+    def copy(
+        self,
+        *,
+        include: Optional[Any] = None,
+        exclude: Optional[Any] = None,
+        update: Optional[Dict[str, Any]] = None,
+        deep: bool = False,
+    ):
+        """Copies this instance, the fields in update are changed fields of the copy like fields that were set"""
+        copied = super().copy(include=include, exclude=exclude, update=update, deep=deep)
+        if copied._dirty_fields is not None and update:
+            # pydantic sets update without __setattr__
+            object.__setattr__(copied, "_dirty_fields", copied._dirty_fields | (update.keys() & self.__fields__.keys()))
+        return copied
+
     def __save_from_sync(self):
-        """Calls the async save coroutine from a sync context, used with _auto_save and _auto_sync"""
-        if version_info.minor < 10:  # pragma: no cover
-            # less than 3.10.0
-            io_loop = asyncio.get_event_loop()
-        else:  # pragma: no cover
-            # equal or greater than 3.10.0
-            try:
-                io_loop = asyncio.get_running_loop()
-                # https://github.com/erdewit/nest_asyncio
-                # Use nest_asyncio so we can call the async save
-            except RuntimeError:
-                io_loop = asyncio.new_event_loop()
-        with NestedAsyncIO():
-            io_loop.run_until_complete(self.save())
+        """Queues this instance on its store's write-behind queue, used with _auto_save and _auto_sync"""
+        self._store.write_behind.enqueue(self)
 
     @asynccontextmanager
     async def update(self):
@@ -118,7 +192,6 @@ class Model(_AbstractModel):
         return cls.__name__.lower() if cls._table_name is None else cls._table_name
 
     @classmethod
-    @lru_cache(1)
     def __get_primary_key(cls, primary_key_value: Any):
         """
         Uses _table_name, _table_refix, and _redis_separator from the model to build our primary key.
@@ -129,22 +202,310 @@ class Model(_AbstractModel):
 
         The key is contructed as {_prefix}{_redis_separator}{_table_name}{_redis_separator}{primary_key_value}
         So a model named ThisModel with a primary key of id, by default would result in a key of thismodel:id
+
+        On a ClusterStore, the table or the primary key value is wrapped in a hash tag, see ClusterStore
         """
+        if cls._get_hash_tags() == "record":
+            primary_key_value = f"{{{primary_key_value}}}"
+        return f"{cls._get_table_key()}{cls._get_separator()}{primary_key_value}"
 
-        return f"{cls._get_prefix()}{cls._get_tablename()}{cls._get_separator()}{primary_key_value}"
+    @classmethod
+    def _get_hash_tags(cls) -> Optional[str]:
+        """How the store places this model's keys in cluster slots, None unless it's a ClusterStore"""
+        store = getattr(cls, "_store", None)
+        return None if store is None else store.hash_tags
+
+    @classmethod
+    def _get_table_key(cls) -> str:
+        """The prefix and table name every key of this model starts with, a hash tag if the table is in one slot"""
+        table_key = f"{cls._get_prefix()}{cls._get_tablename()}"
+        return f"{{{table_key}}}" if cls._get_hash_tags() == "table" else table_key
+
+    @classmethod
+    def get_key_prefix(cls) -> str:
+        """Returns the start of the keys of every row of this model, the table name followed by the separator"""
+        return f"{cls._get_table_key()}{cls._get_separator()}"
 
     @classmethod
     def get_table_index_key(cls):
         """Returns the key in which the primary keys of the given table have been saved"""
-        return f"{cls._get_prefix()}{cls._get_tablename()}{cls._get_separator()}__index"
+        return f"{cls._get_table_key()}{cls._get_separator()}__index"
+
+    @classmethod
+    def get_table_index_keys(cls) -> List[str]:
+        """Returns the keys of the shards of the table index, only get_table_index_key unless the store shards it"""
+        shards = cls._store.index_shards
+        if shards == 1:
+            return [cls.get_table_index_key()]
+        return [f"{cls.get_table_index_key()}{cls._get_separator()}{shard}" for shard in range(shards)]
+
+    @classmethod
+    def _get_table_index_key_of(cls, key: str) -> str:
+        """The key of the shard of the table index that holds the row at key"""
+        shards = cls._store.index_shards
+        if shards == 1:
+            return cls.get_table_index_key()
+        return f"{cls.get_table_index_key()}{cls._get_separator()}{crc32(key.encode()) % shards}"
+
+    @classmethod
+    def _group_by_table_index_key(cls, keys: List[str]) -> Dict[str, List[str]]:
+        """The row keys in each shard of the table index"""
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            groups.setdefault(cls._get_table_index_key_of(key), []).append(key)
+        return groups
+
+    @classmethod
+    def _rows_span_slots(cls) -> bool:
+        """If the store spreads rows over cluster slots, so commands can't take the keys of several rows at once"""
+        return cls._get_hash_tags() == "record"
+
+    @classmethod
+    def _reader(cls, shard: Any) -> Any:
+        """The client to read this model's rows on the store shard with, see Store.reader and _read_your_writes"""
+        written_at = cls.__dict__.get("_written_at")
+        if cls._read_your_writes is not None and written_at is not None:
+            if monotonic() - written_at < cls._read_your_writes:
+                return shard.redis_store
+        return shard.reader()
+
+    @classmethod
+    def _mark_written(cls) -> None:
+        """Starts the _read_your_writes window of this model, each model has its own"""
+        cls._written_at = monotonic()
+
+    @classmethod
+    def _group_by_shard(cls, keys: List[str]) -> List[Tuple[Any, List[int]]]:
+        """The stores the rows at keys are kept in, each with the positions in keys of its rows, see ShardedStore"""
+        shards = cls._store.shards
+        if len(shards) == 1:
+            return [(shards[0], list(range(len(keys))))]
+        groups: Dict[int, Tuple[Any, List[int]]] = {}
+        for position, key in enumerate(keys):
+            shard = cls._store.shard_of(key)
+            groups.setdefault(id(shard), (shard, []))[1].append(position)
+        return list(groups.values())
+
+    @classmethod
+    async def _map_shards(cls, keys: List[str], call: Callable[[Any, List[str]], Awaitable[List[Any]]]) -> List[Any]:
+        """Calls call with each store and the keys of its rows, all at once, and returns the results in keys order"""
+        groups = cls._group_by_shard(keys)
+        if len(groups) == 1:
+            return await call(groups[0][0], keys)
+        responses = await asyncio.gather(
+            *(call(shard, [keys[position] for position in positions]) for shard, positions in groups)
+        )
+        results: List[Any] = [None] * len(keys)
+        for (_, positions), response in zip(groups, responses):
+            for position, result in zip(positions, response):
+                results[position] = result
+        return results
+
+    @classmethod
+    def get_table_sorted_index_key(cls):
+        """Returns the key of the sorted set that keeps the primary keys of the given table in order"""
+        return f"{cls._get_table_key()}{cls._get_separator()}__sorted_index"
+
+    @classmethod
+    def get_field_index_key(cls, field: str, value: str) -> str:
+        """Returns the key of the set holding the primary keys of the rows where field has the serialized value"""
+        separator = cls._get_separator()
+        return f"{cls._get_table_key()}{separator}__index{separator}{field}{separator}{value}"
+
+    @classmethod
+    def get_field_sorted_index_key(cls, field: str) -> str:
+        """Returns the key of the sorted set holding the primary keys of the rows scored by the value of field"""
+        separator = cls._get_separator()
+        return f"{cls._get_table_key()}{separator}__sorted_index{separator}{field}"
+
+    @classmethod
+    def _get_indexes(cls) -> List[str]:
+        return list(getattr(cls, "_indexes", []))
+
+    @classmethod
+    def _get_sorted_indexes(cls) -> List[str]:
+        return list(getattr(cls, "_sorted_indexes", []))
+
+    @classmethod
+    def _score_value(cls, field: str, value: Any) -> float:
+        """Validates a value for field and converts it into a score in the field's sorted index"""
+        value, errors = cls.__fields__[field].validate(value, {}, loc=field, cls=cls)
+        if errors:
+            raise ValidationError([errors], cls)
+        return to_score(value)
+
+    @classmethod
+    def _index_value(cls, field: str, value: Any) -> str:
+        """Validates and serializes a value for field the same way insert does, to find its index key"""
+        value, errors = cls.__fields__[field].validate(value, {}, loc=field, cls=cls)
+        if errors:
+            raise ValidationError([errors], cls)
+        return cls.get_serialization_plan().index_value(field, value)
+
+    @classmethod
+    async def _get_indexed_values(cls, keys: List[str]) -> List[Optional[List[Optional[str]]]]:
+        """Gets the currently stored values of the indexed fields for each key, so stale index entries can be removed"""
+        indexes = cls._get_indexes()
+        if len(indexes) == 0 or len(keys) == 0:
+            return [None] * len(keys)
+        if cls._storage == "blob":
+            return [
+                [cls._index_value(field, record[field]) if field in record else None for field in indexes]
+                if record
+                else None
+                for record in await cls._read_records(keys, primary=True)
+            ]
+
+        async def read(shard: Any, shard_keys: List[str]) -> List[Any]:
+            async with shard.pipeline() as pipeline:
+                for key in shard_keys:
+                    pipeline.hmget(name=key, keys=indexes)
+                return await pipeline.execute()
+
+        response = await cls._map_shards(keys, read)
+        plan = cls.get_serialization_plan()
+        if plan.binary:
+            return [
+                [
+                    None if value is None else plan.index_value(field, plan.decoders[field](value))
+                    for field, value in zip(indexes, values)
+                ]
+                for values in response
+            ]
+
+        def index_value(field: str, value: Any) -> Optional[str]:
+            if value is None:
+                return None
+            value = bytes_to_string(value)
+            if field in plan.compressed:
+                # index keys are made from the value before it was compressed
+                return plan.index_value(field, plan.decoders[field](value))
+            return value
+
+        return [[index_value(field, value) for field, value in zip(indexes, values)] for values in response]
+
+    @classmethod
+    def _where_to_index_keys(cls, where: Dict[str, Any]) -> List[str]:
+        """Turn a where clause of indexed field values into the keys of the field indexes"""
+        indexes = cls._get_indexes()
+        index_keys = []
+        for field, value in where.items():
+            if field not in indexes:
+                raise ValueError(f"{cls.__name__}.{field} is not indexed, add it to _indexes to use it in where")
+            index_keys.append(cls.get_field_index_key(field, cls._index_value(field, value)))
+        return index_keys
+
+    @classmethod
+    async def _intersect(cls, shard: Any, index_keys: List[str]) -> Set[str]:
+        """The primary keys in every one of the sets at index_keys, on the store shard"""
+        if len(index_keys) > 1 and cls._rows_span_slots():
+            # the sets are in different cluster slots, so they are intersected here
+            async with shard.pipeline(client=cls._reader(shard)) as pipeline:
+                for index_key in index_keys:
+                    pipeline.smembers(index_key)
+                members = await pipeline.execute()
+            keys = set(members[0]).intersection(*members[1:])
+        else:
+            keys = set(await cls._reader(shard).sinter(index_keys))
+        return {bytes_to_string(key) for key in keys}
+
+    @classmethod
+    async def _where_to_primary_keys(
+        cls, where: Dict[str, Any], ids: Optional[Union[Any, List[Any]]] = None
+    ) -> List[str]:
+        """Turn a where clause of indexed field values into primary key values, using the field indexes"""
+        index_keys = cls._where_to_index_keys(where)
+        # each shard indexes its own rows
+        keys = set().union(*await asyncio.gather(*(cls._intersect(shard, index_keys) for shard in cls._store.shards)))
+        if ids is not None:
+            id_keys, _ = await cls._ids_to_primary_keys(ids)
+            keys.intersection_update(id_keys)
+        return sorted(keys)
+
+    @classmethod
+    def _order_by_to_scores(
+        cls, order_by: str, min: Optional[Any] = None, max: Optional[Any] = None
+    ) -> Tuple[str, bool, Union[float, str], Union[float, str]]:
+        """Turn an order_by and range into the sorted field, if it is descending, and the range of scores"""
+        descending = order_by.startswith("-")
+        field = order_by[1:] if descending else order_by
+        if field not in cls._get_sorted_indexes():
+            raise ValueError(f"{cls.__name__}.{field} is not sorted, add it to _sorted_indexes to use it in order_by")
+        min_score = "-inf" if min is None else cls._score_value(field, min)
+        max_score = "+inf" if max is None else cls._score_value(field, max)
+        return field, descending, min_score, max_score
 
     @classmethod
-    async def _ids_to_primary_keys(cls, ids: Optional[Union[Any, List[Any]]] = None) -> Tuple[List[Optional[str]], str]:
-        """Turn passed in ids into primary key values"""
+    async def _range_to_primary_keys(
+        cls,
+        order_by: str,
+        min: Optional[Any] = None,
+        max: Optional[Any] = None,
+        skip: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """Turn a range of a sorted index into primary key values, in the order of the index"""
+        field, descending, min_score, max_score = cls._order_by_to_scores(order_by, min, max)
+        shards = cls._store.shards
+        if len(shards) > 1:
+            # every shard has to be read up to the end of the page, the pages are merged and cut here
+            if limit is not None:
+                limit = limit + (skip or 0)
+            ranges = await asyncio.gather(
+                *(
+                    cls._read_range(shard, field, descending, min_score, max_score, None, limit, True)
+                    for shard in shards
+                )
+            )
+            # redis orders rows with the same score by their key
+            merged = heapq.merge(*ranges, key=lambda item: (item[1], item[0]), reverse=descending)
+            return [key for key, _ in merged][skip:limit]
+        return await cls._read_range(shards[0], field, descending, min_score, max_score, skip, limit)
+
+    @classmethod
+    async def _read_range(
+        cls,
+        shard: Any,
+        field: str,
+        descending: bool,
+        min_score: Union[float, str],
+        max_score: Union[float, str],
+        skip: Optional[int] = None,
+        limit: Optional[int] = None,
+        withscores: bool = False,
+    ) -> List[Any]:
+        """The primary keys in a range of the sorted index of field on the store shard, with their scores if asked"""
+        # redis wants both an offset and a count to page a range, a negative count means all of them
+        start = skip if skip is not None else (0 if limit is not None else None)
+        num = limit if limit is not None else (-1 if skip is not None else None)
+        if descending:
+            keys = await cls._reader(shard).zrevrangebyscore(
+                cls.get_field_sorted_index_key(field), max_score, min_score, start=start, num=num, withscores=withscores
+            )
+        else:
+            keys = await cls._reader(shard).zrangebyscore(
+                cls.get_field_sorted_index_key(field), min_score, max_score, start=start, num=num, withscores=withscores
+            )
+        if withscores:
+            return [(bytes_to_string(key), score) for key, score in keys]
+        return [bytes_to_string(key) for key in keys]
+
+    @classmethod
+    async def _ids_to_primary_keys(
+        cls, ids: Optional[Union[Any, List[Any]]] = None, primary: bool = False
+    ) -> Tuple[List[Optional[str]], str]:
+        """Turn passed in ids into primary key values, reading the table index from the primary if primary"""
         table_index_key = cls.get_table_index_key()
         if ids is None:
-            keys_generator = cls._store.redis_store.sscan_iter(name=table_index_key)
-            keys = [key async for key in keys_generator]
+
+            async def scan(shard: Any) -> List[str]:
+                return [
+                    bytes_to_string(key)
+                    for index_key in cls.get_table_index_keys()
+                    async for key in (shard.redis_store if primary else cls._reader(shard)).sscan_iter(name=index_key)
+                ]
+
+            keys = [key for shard_keys in await asyncio.gather(*map(scan, cls._store.shards)) for key in shard_keys]
         else:
             if not isinstance(ids, list):
                 ids = [ids]
@@ -157,49 +518,356 @@ class Model(_AbstractModel):
         cls,
         data: Union[List[_AbstractModel], _AbstractModel],
         life_span_seconds: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        transaction: Optional[bool] = None,
+        concurrency: int = 1,
     ):
         """
         Inserts a given row or sets of rows into the table
+
+        By default every row is written in a single MULTI/EXEC pipeline. For large inserts, chunk_size splits the rows
+        into pipelines of at most that many rows, so the client never buffers more than one chunk of commands per
+        pipeline and redis is never blocked for the whole insert.
+            chunk_size: Optional[int] - the maximum number of rows per pipeline
+            transaction: Optional[bool] - wrap each pipeline in MULTI/EXEC, True by default, rows in different chunks
+                are never atomic together
+            concurrency: int - the maximum number of chunks in flight at once
+
+        Returns the responses of every pipeline, in the order of the rows. When the store coalesces writes (see
+        Store coalesce_window), inserts without a chunk_size, life_span_seconds or transaction are written together
+        with the other writes in the window, in a transaction, and None is returned. Pass any of them to write the
+        rows in their own pipelines and get the responses.
         """
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        data_list = [data] if not isinstance(data, list) else data
+        coalescer = cls._store.coalescer
+        if coalescer is not None and chunk_size is None and life_span_seconds is None and transaction is None:
+            await coalescer.submit(data_list, full=True)
+            return None
+        transaction = True if transaction is None else transaction
         life_span = life_span_seconds if life_span_seconds is not None else cls._store.life_span_in_seconds
-        async with cls._store.redis_store.pipeline(transaction=True) as pipeline:
-            data_list = []
+        if chunk_size is None or len(data_list) <= chunk_size:
+            return await cls._insert_chunk(data_list, life_span, transaction)
 
-            data_list = [data] if not isinstance(data, list) else data
+        semaphore = asyncio.Semaphore(concurrency)
 
-            for record in data_list:
-                primary_key_value = getattr(record, cls._primary_key_field)
-                name = cls.__get_primary_key(primary_key_value=primary_key_value)
-                mapping = cls.serialize_partially(record.dict())
-                pipeline.hset(name=name, mapping=mapping)
+        async def insert_chunk(chunk: List[_AbstractModel]) -> List[Any]:
+            async with semaphore:
+                return await cls._insert_chunk(chunk, life_span, transaction)
 
-                if life_span is not None:
-                    pipeline.expire(name=name, time=life_span)
+        responses = await asyncio.gather(
+            *(insert_chunk(data_list[start : start + chunk_size]) for start in range(0, len(data_list), chunk_size))
+        )
+        return [result for response in responses for result in response]
+
+    @classmethod
+    async def _insert_chunk(
+        cls, data_list: List[_AbstractModel], life_span: Optional[int], transaction: bool = True
+    ) -> List[Any]:
+        """
+        Writes rows and their index entries in a single pipeline, one for each shard on a ShardedStore
+
+        The values the rows have now are read first, to remove the rows from the indexes of values that changed. In a
+        transaction the rows are WATCHed while they are read, and everything is read and written again if another
+        client writes one of them before EXEC, so concurrent writes can't leave a row in the index of an old value. A
+        ClusterStore has no transactions, there the read and the write are separate.
+        """
+        names = [
+            cls.__get_primary_key(primary_key_value=getattr(record, cls._primary_key_field)) for record in data_list
+        ]
+        snapshots = [record._dirty_fields for record in data_list]
+        plan = cls.get_serialization_plan()
+        watch = transaction and len(cls._get_indexes()) > 0 and cls._get_hash_tags() is None
+
+        def queue(pipeline: Any, positions: List[int], old_indexed_values: List[Any]) -> None:
+            for position, old_values in zip(positions, old_indexed_values):
+                record, name = data_list[position], names[position]
+                data = record.dict()
+                index_values = [plan.index_value(field, data[field]) for field in cls._get_indexes()]
+                if cls._storage == "blob":
+                    # a blob is a single value, so it is set and expired with one command
+                    pipeline.set(name=name, value=plan.encode_record(data), ex=life_span)
+                else:
+                    mapping = cls.serialize_partially(data)
+                    pipeline.hset(name=name, mapping=mapping)
+                    if life_span is not None:
+                        pipeline.expire(name=name, time=life_span)
                 # save the primary key in an index
-                table_index_key = cls.get_table_index_key()
+                table_index_key = cls._get_table_index_key_of(name)
                 pipeline.sadd(table_index_key, name)
+                # and in the sorted index, all scores are 0 so members are ordered lexicographically
+                table_sorted_index_key = cls.get_table_sorted_index_key()
+                pipeline.zadd(table_sorted_index_key, {name: 0})
                 if life_span is not None:
                     pipeline.expire(table_index_key, time=life_span)
-            response = await pipeline.execute()
+                    pipeline.expire(table_sorted_index_key, time=life_span)
+                # and in the set for the value of each indexed field
+                for index, (field, value) in enumerate(zip(cls._get_indexes(), index_values)):
+                    if old_values is not None and old_values[index] not in (None, value):
+                        pipeline.srem(cls.get_field_index_key(field, old_values[index]), name)
+                    field_index_key = cls.get_field_index_key(field, value)
+                    pipeline.sadd(field_index_key, name)
+                    if life_span is not None:
+                        pipeline.expire(field_index_key, time=life_span)
+                # and in the sorted index of each sorted field, scored by its value
+                for field in cls._get_sorted_indexes():
+                    field_sorted_index_key = cls.get_field_sorted_index_key(field)
+                    value = getattr(record, field)
+                    if value is None:
+                        pipeline.zrem(field_sorted_index_key, name)
+                        continue
+                    pipeline.zadd(field_sorted_index_key, {name: to_score(value)})
+                    if life_span is not None:
+                        pipeline.expire(field_sorted_index_key, time=life_span)
+
+        async def write(shard: Any, positions: List[int]) -> List[Any]:
+            shard_names = [names[position] for position in positions]
+            async with shard.pipeline(transaction=transaction) as pipeline:
+                if not watch:
+                    queue(pipeline, positions, await cls._get_indexed_values(shard_names))
+                    return await pipeline.execute()
+                while True:
+                    await pipeline.watch(*shard_names)
+                    old_indexed_values = await cls._get_indexed_values(shard_names)
+                    pipeline.multi()
+                    queue(pipeline, positions, old_indexed_values)
+                    try:
+                        return await pipeline.execute()
+                    except WatchError:
+                        # one of the rows was written since it was read, its index entries may have changed
+                        continue
 
+        # each shard gets its own pipeline, with the rows it keeps
+        responses = await asyncio.gather(*(write(shard, positions) for shard, positions in cls._group_by_shard(names)))
+        response = [result for shard_response in responses for result in shard_response]
+        cls._mark_written()
+
+        cls._invalidate_cache(names)
+        for record, snapshot in zip(data_list, snapshots):
+            record._mark_saved(snapshot)
         return response
 
     async def save(self):
-        await self.insert(self)
+        """
+        Saves this row
+
+        Rows that were selected or saved before only write the fields that changed since, the whole row is written
+        if it is new, was deleted or expired in the meantime, is stored as a blob, or an indexed field or the primary
+        key changed.
+        """
+        coalescer = self._store.coalescer
+        if coalescer is not None:
+            await coalescer.submit([self])
+        elif self._needs_full_save():
+            await self.insert(self)
+        else:
+            await self._save_changed_fields([[self]])
+
+    @classmethod
+    async def _save_many(cls, instances: List["Model"]) -> None:
+        """
+        Saves instances in as few round trips as possible, used by WriteBehindQueue
+
+        Instances are saved in order. Runs of instances that write whole rows are inserted with one pipeline, runs of
+        instances that only write their changed fields are saved with another.
+        """
+        start = 0
+        while start < len(instances):
+            full = instances[start]._needs_full_save()
+            end = start + 1
+            while end < len(instances) and instances[end]._needs_full_save() == full:
+                end += 1
+            if full:
+                await cls.insert(instances[start:end])
+            else:
+                await cls._save_changed_fields([[instance] for instance in instances[start:end]])
+            start = end
+
+    @classmethod
+    async def _save_changed_fields(cls, rows: List[List["Model"]]) -> None:
+        """
+        Saves the changed fields of rows in one pipeline per shard, rows that no longer exist are inserted whole
+
+        Each row is a list of instances with the same primary key, their changes are merged into one write with the
+        later instances winning.
+        """
+        snapshots = [[instance._dirty_fields for instance in instances] for instances in rows]
+        calls = []
+        for instances in rows:
+            mapping = {}
+            for instance in instances:
+                mapping.update(instance._changed_fields_mapping())
+            calls.append(instances[-1]._changed_fields_call(mapping))
+        row_keys = [keys[0] for keys, _ in calls]
+        life_span = cls._store.life_span_in_seconds
+
+        async def write(shard: Any, row_positions: List[int]) -> List[Any]:
+            # where the result of the script is for each row, other commands can come between them
+            positions = []
+            async with shard.pipeline(transaction=False) as pipeline:
+                for row_position in row_positions:
+                    keys, arguments = calls[row_position]
+                    positions.append(len(pipeline))
+                    if cls._rows_span_slots():
+                        # a script can only use keys in one cluster slot, the indexes are expired next to it
+                        await shard.queue_script(pipeline, _SAVE_CHANGED_FIELDS_SCRIPT, keys[:1], arguments)
+                        if life_span is not None:
+                            for key in keys[1:]:
+                                pipeline.expire(key, time=life_span)
+                    else:
+                        await shard.queue_script(pipeline, _SAVE_CHANGED_FIELDS_SCRIPT, keys, arguments)
+                response = await pipeline.execute()
+            return [response[position] for position in positions]
+
+        saved = [None] * len(rows)
+        groups = cls._group_by_shard(row_keys)
+        for (_, row_positions), shard_saved in zip(
+            groups, await asyncio.gather(*(write(shard, row_positions) for shard, row_positions in groups))
+        ):
+            for row_position, row_saved in zip(row_positions, shard_saved):
+                saved[row_position] = row_saved
+        cls._mark_written()
+        cls._invalidate_cache(row_keys)
+        missing = []
+        for instances, row_snapshots, row_saved in zip(rows, snapshots, saved):
+            if row_saved:
+                for instance, snapshot in zip(instances, row_snapshots):
+                    instance._mark_saved(snapshot)
+            else:
+                missing.extend(instances)
+        # rows that disappeared are rare, insert their instances one by one so later ones overwrite earlier ones
+        for instance in missing:
+            await cls._insert_chunk([instance], cls._store.life_span_in_seconds)
+
+    @classmethod
+    async def _write_coalesced(cls, rows: List[List[Tuple["Model", bool]]]) -> None:
+        """
+        Writes the writes WriteCoalescer collected, each row a list of instances with the same primary key and if
+        they were inserted
+
+        A whole row write replaces everything before it, so only the last one of each row is written. The changed
+        fields of the instances after it are merged into one write.
+        """
+        full = []
+        changed = []
+        written = []
+        for writes in rows:
+            last_full = None
+            for index, (instance, inserted) in enumerate(writes):
+                if inserted or instance._needs_full_save():
+                    last_full = index
+            if last_full is not None:
+                full.append(writes[last_full][0])
+            instances = []
+            for instance, _ in writes[last_full + 1 if last_full is not None else 0 :]:
+                if all(instance is not other for other in instances):
+                    instances.append(instance)
+            if len(instances) > 0:
+                changed.append(instances)
+            # the instances that were replaced by a later write are saved as well
+            for instance, _ in writes[: last_full if last_full is not None else 0]:
+                written.append((instance, instance._dirty_fields))
+        if len(full) > 0:
+            await cls._insert_chunk(full, cls._store.life_span_in_seconds)
+        if len(changed) > 0:
+            await cls._save_changed_fields(changed)
+        for instance, snapshot in written:
+            instance._mark_saved(snapshot)
+
+    def _needs_full_save(self) -> bool:
+        """If saving this instance has to write the whole row, rather than only the fields that changed"""
+        if self._dirty_fields is None or self._storage == "blob":
+            return True
+        changed = self._get_changed_fields()
+        if self._primary_key_field in changed:
+            return True
+        return any(field in changed for field in self._get_indexes() + self._get_sorted_indexes())
+
+    def _get_changed_fields(self) -> Set[str]:
+        """
+        The fields of this instance that may have changed since it was last saved or selected
+
+        Fields can only be seen changing when they are set, so mutable fields (see SerializationPlan) are always
+        counted as changed, their values could have been changed in place.
+        """
+        return self._dirty_fields | self.get_serialization_plan().mutable
+
+    def _changed_fields_mapping(self) -> Dict[str, Any]:
+        """The serialized values of the fields of this instance that changed"""
+        return type(self).serialize_partially(self.dict(include=self._get_changed_fields()))
+
+    def _changed_fields_call(self, mapping: Optional[Dict[str, Any]] = None) -> Tuple[List[str], List[Any]]:
+        """The keys and arguments of _SAVE_CHANGED_FIELDS_SCRIPT that save mapping, by default the changed fields"""
+        cls = type(self)
+        life_span = cls._store.life_span_in_seconds
+        if mapping is None:
+            mapping = self._changed_fields_mapping()
+        arguments = ["" if life_span is None else life_span]
+        for field, value in mapping.items():
+            arguments.extend((field, value))
+        row_key = cls.__get_primary_key(primary_key_value=getattr(self, cls._primary_key_field))
+        keys = [row_key, cls._get_table_index_key_of(row_key), cls.get_table_sorted_index_key()]
+        if life_span is not None:
+            # the indexes the row is in expire with it, indexed fields didn't change so they are the current ones
+            plan = cls.get_serialization_plan()
+            keys.extend(
+                cls.get_field_index_key(field, plan.index_value(field, getattr(self, field)))
+                for field in cls._get_indexes()
+            )
+            keys.extend(cls.get_field_sorted_index_key(field) for field in cls._get_sorted_indexes())
+        return keys, arguments
+
+    def _mark_saved(self, snapshot: Optional[Set[str]] = None) -> None:
+        """
+        Marks this instance as matching what is stored in redis, from now on only changes are saved
+
+        snapshot is the set of changed fields when the save started. Setting a field replaces the set, so if it is
+        not the current one the instance changed while it was being saved and those changes still need saving.
+        """
+        if self._dirty_fields is snapshot:
+            object.__setattr__(self, "_dirty_fields", set())
 
     @classmethod
     async def delete(cls, ids: Optional[Union[Any, List[Any]]] = None) -> Optional[List[int]]:
         """
         deletes a given row or sets of rows in the table
         """
-        keys, table_index_key = await cls._ids_to_primary_keys(ids)
+        # automatic saves still in the queue would otherwise bring deleted rows back
+        await cls._store.flush(cls)
+        keys, _ = await cls._ids_to_primary_keys(ids, primary=True)
         if len(keys) == 0:
             return None
-        async with cls._store.redis_store.pipeline(transaction=True) as pipeline:
-            pipeline.delete(*keys)
-            # remove the primary keys from the index
-            pipeline.srem(table_index_key, *keys)
-            response = await pipeline.execute()
+        indexed_values = await cls._get_indexed_values(keys)
+
+        async def remove(shard: Any, positions: List[int]) -> List[Any]:
+            shard_keys = [keys[position] for position in positions]
+            async with shard.pipeline(transaction=True) as pipeline:
+                if cls._rows_span_slots():
+                    for key in shard_keys:
+                        pipeline.delete(key)
+                else:
+                    pipeline.delete(*shard_keys)
+                # remove the primary keys from the index
+                for table_index_key, members in cls._group_by_table_index_key(shard_keys).items():
+                    pipeline.srem(table_index_key, *members)
+                pipeline.zrem(cls.get_table_sorted_index_key(), *shard_keys)
+                for position in positions:
+                    if indexed_values[position] is None:
+                        continue
+                    for field, value in zip(cls._get_indexes(), indexed_values[position]):
+                        if value is not None:
+                            pipeline.srem(cls.get_field_index_key(field, value), keys[position])
+                for field in cls._get_sorted_indexes():
+                    pipeline.zrem(cls.get_field_sorted_index_key(field), *shard_keys)
+                return await pipeline.execute()
+
+        responses = await asyncio.gather(*(remove(shard, positions) for shard, positions in cls._group_by_shard(keys)))
+        response = [result for shard_response in responses for result in shard_response]
+        cls._mark_written()
+        cls._invalidate_cache(keys)
         return response
 
     @classmethod
@@ -209,6 +877,12 @@ class Model(_AbstractModel):
         ids: Optional[List[Any]] = None,
         skip: Optional[int] = None,
         limit: Optional[int] = None,
+        where: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        min: Optional[Any] = None,
+        max: Optional[Any] = None,
+        lazy: bool = False,
+        typed: bool = False,
     ) -> Optional[List[Any]]:
         """
         Selects given rows or sets of rows in the table
@@ -216,19 +890,51 @@ class Model(_AbstractModel):
         Pagination is accomplished by using the below variables
             skip: Optional[int]
             limit: Optional[int]
+
+        Rows can be filtered by the values of indexed fields (see _indexes) with where, a dict of field name to value.
+        Rows have to match all of the values in where.
+
+        Rows can be ordered by a sorted field (see _sorted_indexes) with order_by, prefix it with - for descending order.
+        min and max limit the rows to the ones where that field is within the range, both ends are inclusive.
+        Ordered selects read only the requested part of the sorted index, including skip and limit, on a ShardedStore
+        every shard is read up to skip + limit.
+
+        With lazy, rows are returned as LazyRecords that validate each field when it is first read, which is cheaper
+        when only some of the fields are used. Lazy selects don't use the cache.
+
+        With typed, selected columns are returned as instances of a model with only those fields, see
+        get_projection_model, instead of dicts.
+
+        Automatic saves still queued on the store are written first, see Store.flush.
         """
-        all_keys, _ = await cls._ids_to_primary_keys(ids)
-        if limit is not None and skip is not None:
-            limit = limit + skip
-        keys = all_keys[skip:limit]
-        async with cls._store.redis_store.pipeline() as pipeline:
-            for key in keys:
-                if columns is None:
-                    pipeline.hgetall(name=key)
-                else:
-                    pipeline.hmget(name=key, keys=columns)
+        cls._check_result_mode(columns, lazy, typed)
+        await cls._store.flush(cls)
+        if order_by is not None:
+            if where or ids is not None:
+                raise ValueError("order_by can not be combined with where or ids")
+            keys = await cls._range_to_primary_keys(order_by, min, max, skip, limit)
+        else:
+            if min is not None or max is not None:
+                raise ValueError("min and max need an order_by")
+            if where:
+                all_keys = await cls._where_to_primary_keys(where, ids)
+            else:
+                all_keys, _ = await cls._ids_to_primary_keys(ids)
+            if limit is not None and skip is not None:
+                limit = limit + skip
+            keys = all_keys[skip:limit]
+        if columns is None and not lazy and cls._get_cache() is not None:
+            instances = await cls._fetch_instances(keys)
+            if where or order_by is not None:
+                instances = [instance for instance in instances if instance is not None]
+            if len(instances) == 0 or instances[0] is None:
+                return None
+            return [instance for instance in instances if instance is not None]
 
-            response = await pipeline.execute()
+        response = await cls._fetch_records(keys, columns)
+        if where or order_by is not None:
+            # index entries can outlive rows that expired
+            response = [record for record in response if record != {}]
 
         if len(response) == 0:
             return None
@@ -236,17 +942,532 @@ class Model(_AbstractModel):
         if response[0] == {}:
             return None
 
-        if isinstance(response, list) and columns is None:
-            result = [cls(**cls.deserialize_partially(record)) for record in response if record != {}]
-        else:
-            result = [
+        return cls._hydrate_records(response, columns, lazy, typed)
+
+    @classmethod
+    async def select_page(
+        cls,
+        after: Optional[str] = None,
+        limit: int = 100,
+        columns: Optional[List[str]] = None,
+        lazy: bool = False,
+        typed: bool = False,
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Selects a page of rows in the table, ordered by their primary key
+
+        Pages are read from the table's sorted index, so each page costs O(log N + limit)
+        no matter how many rows are in the table.
+            after: Optional[str] - the continuation token returned with the previous page, None for the first page
+            limit: int - the maximum number of rows in the page
+            lazy: bool - return LazyRecords, see select
+            typed: bool - return the columns as models, see select
+
+        Returns the rows and the continuation token for the next page. The token is None on the last page.
+        """
+        cls._check_result_mode(columns, lazy, typed)
+        await cls._store.flush(cls)
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        min_key = "-" if after is None else f"({decode_cursor(after)}"
+
+        async def read(shard: Any) -> List[str]:
+            # ask for one extra key to find out if there is a next page
+            keys = await cls._reader(shard).zrangebylex(
+                cls.get_table_sorted_index_key(), min_key, "+", start=0, num=limit + 1
+            )
+            return [bytes_to_string(key) for key in keys]
+
+        # the pages of every shard are merged, utf-8 strings sort like the bytes redis sorts
+        keys = list(heapq.merge(*await asyncio.gather(*map(read, cls._store.shards))))[: limit + 1]
+        next_cursor = encode_cursor(keys[limit - 1]) if len(keys) > limit else None
+        keys = keys[:limit]
+        response = await cls._fetch_records(keys, columns)
+        # rows that have expired out from under the index are skipped
+        response = [record for record in response if record != {}]
+        return cls._hydrate_records(response, columns, lazy, typed), next_cursor
+
+    @classmethod
+    async def get(cls, id: Any) -> Optional[Any]:
+        """
+        Selects the row with the primary key id, None if there is no such row
+
+        Gets issued in the same turn of the event loop, e.g. by concurrent requests, are batched and read in a single
+        round trip. Each caller gets its own instance, even when several ask for the same row.
+        """
+        cache = cls._get_cache()
+        if cache is not None:
+            key = cls.__get_primary_key(primary_key_value=id)
+            instance = cache.get(key)
+            if instance is not None:
+                return instance
+            generation = cache.generation
+        record = await cls._get_loader().load(id)
+        if record is None:
+            return None
+        instance = cls._hydrate_records([record])[0]
+        if cache is not None:
+            cache.set(key, instance, generation)
+        return instance
+
+    @classmethod
+    async def count(
+        cls,
+        where: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        min: Optional[Any] = None,
+        max: Optional[Any] = None,
+    ) -> int:
+        """
+        Counts the rows in the table, or the ones select would return with the same where, or order_by, min and max
+
+        Counts come from the indexes without reading any rows: SCARD of the table or field index, SINTERCARD of the
+        field indexes for a where with several fields, and ZCOUNT of the sorted index for a range. Like select, rows
+        that expired while their index entries didn't may still be counted.
+        """
+        await cls._store.flush(cls)
+        if order_by is not None:
+            if where:
+                raise ValueError("order_by can not be combined with where")
+            field, _, min_score, max_score = cls._order_by_to_scores(order_by, min, max)
+            sorted_index_key = cls.get_field_sorted_index_key(field)
+        elif min is not None or max is not None:
+            raise ValueError("min and max need an order_by")
+        index_keys = cls._where_to_index_keys(where) if where else None
+
+        async def count_on(shard: Any) -> int:
+            redis_store = cls._reader(shard)
+            if order_by is not None:
+                return await redis_store.zcount(sorted_index_key, min_score, max_score)
+            if index_keys is None:
+                table_index_keys = cls.get_table_index_keys()
+                if len(table_index_keys) == 1:
+                    return await redis_store.scard(table_index_keys[0])
+                async with shard.pipeline(client=redis_store) as pipeline:
+                    for table_index_key in table_index_keys:
+                        pipeline.scard(table_index_key)
+                    return sum(await pipeline.execute())
+            if len(index_keys) == 1:
+                return await redis_store.scard(index_keys[0])
+            if cls._rows_span_slots():
+                return len(await cls._intersect(shard, index_keys))
+            try:
+                return await redis_store.sintercard(len(index_keys), index_keys)
+            except ResponseError:
+                # SINTERCARD needs redis 7
+                return len(await redis_store.sinter(index_keys))
+
+        # each shard counts its own rows
+        return sum(await asyncio.gather(*map(count_on, cls._store.shards)))
+
+    @classmethod
+    async def exists(cls, ids: Union[Any, List[Any]]) -> Union[bool, List[bool]]:
+        """
+        Checks if the rows with the primary keys ids exist, without reading them
+
+        Returns a bool for a single id, or a list of them in the same order for a list of ids. The rows are checked
+        with EXISTS in a single pipeline, one for each shard on a ShardedStore.
+        """
+        await cls._store.flush(cls)
+        id_list = ids if isinstance(ids, list) else [ids]
+        keys = [cls.__get_primary_key(primary_key_value=primary_key_value) for primary_key_value in id_list]
+
+        async def check(shard: Any, shard_keys: List[str]) -> List[Any]:
+            async with shard.pipeline(transaction=False, client=cls._reader(shard)) as pipeline:
+                for key in shard_keys:
+                    pipeline.exists(key)
+                return await pipeline.execute()
+
+        response = [bool(exists) for exists in await cls._map_shards(keys, check)]
+        return response if isinstance(ids, list) else response[0]
+
+    @classmethod
+    def _get_loader(cls) -> BatchLoader:
+        """Gets the loader that batches this model's gets, each model has its own"""
+        loader = cls.__dict__.get("_loader")
+        if loader is None:
+            loader = BatchLoader(cls._load_many)
+            cls._loader = loader
+        return loader
+
+    @classmethod
+    async def _load_many(cls, ids: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Reads the rows with the primary keys ids in one pipeline, for the batch loader"""
+        await cls._store.flush(cls)
+        keys = [cls.__get_primary_key(primary_key_value=primary_key_value) for primary_key_value in ids]
+        return [None if record == {} else record for record in await cls._fetch_records(keys)]
+
+    @classmethod
+    async def iter_select(
+        cls,
+        batch_size: int = 100,
+        columns: Optional[List[str]] = None,
+        lazy: bool = False,
+        typed: bool = False,
+    ) -> AsyncIterator[Any]:
+        """
+        Iterates over every row in the table, fetching batch_size rows at a time
+
+        The table index is walked with SSCAN, and each batch is fetched in its own pipeline and hydrated before the next
+        one is read, so memory use does not grow with the size of the table.
+            batch_size: int - the number of rows fetched per round trip
+            columns: Optional[List[str]] - the columns to return, rows are yielded as dicts when they are given
+            lazy: bool - yield LazyRecords, see select
+            typed: bool - yield the columns as models, see select
+
+        Rows come in no particular order. Like SSCAN, rows added or removed while iterating may or may not be
+        returned, and a row can be returned more than once if the index is resized while iterating.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        cls._check_result_mode(columns, lazy, typed)
+        await cls._store.flush(cls)
+        # the table index of each shard is walked in turn
+        scans = [
+            (shard, table_index_key) for shard in cls._store.shards for table_index_key in cls.get_table_index_keys()
+        ]
+        for shard, table_index_key in scans:
+            # a cursor only means something to the server that returned it, so a scan stays on one replica
+            reader = cls._reader(shard)
+            cursor = 0
+            while True:
+                cursor, keys = await reader.sscan(name=table_index_key, cursor=cursor, count=batch_size)
+                keys = [bytes_to_string(key) for key in keys]
+                # count is only a hint to redis, a single SSCAN can return more keys than that
+                for start in range(0, len(keys), batch_size):
+                    response = await cls._fetch_records(keys[start : start + batch_size], columns)
+                    for record in cls._hydrate_records(response, columns, lazy, typed):
+                        yield record
+                if int(cursor) == 0:
+                    break
+
+    @classmethod
+    async def rebuild_indexes(cls, batch_size: int = 100) -> int:
+        """
+        Adds every row of the table to the table's sorted index and to the indexes of _indexes and _sorted_indexes
+
+        Rows are only added to an index when they are written, so rows that were written before the model had an index,
+        or by a version of pydantic-aioredis without it, are missing from it until they are saved again. This walks the
+        table index with SSCAN on the primary, batch_size rows at a time, and adds each row to every index. Entries
+        that are already there are left alone. A row whose indexed fields change while it is read can be left in the
+        index of its old value too, so run it before the table is written to again.
+
+        Returns the number of rows that were indexed.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        await cls._store.flush(cls)
+        life_span = cls._store.life_span_in_seconds
+        plan = cls.get_serialization_plan()
+        indexed = 0
+
+        async def index(shard: Any, keys: List[str]) -> int:
+            records = await cls._read_records(keys, primary=True)
+            rows = [(key, cls._from_record(record).dict()) for key, record in zip(keys, records) if record != {}]
+            if len(rows) == 0:
+                return 0
+            index_keys = [cls.get_table_sorted_index_key()]
+            async with shard.pipeline(transaction=False) as pipeline:
+                pipeline.zadd(cls.get_table_sorted_index_key(), {key: 0 for key, _ in rows})
+                for key, data in rows:
+                    for field in cls._get_indexes():
+                        field_index_key = cls.get_field_index_key(field, plan.index_value(field, data[field]))
+                        pipeline.sadd(field_index_key, key)
+                        index_keys.append(field_index_key)
+                for field in cls._get_sorted_indexes():
+                    scores = {key: to_score(data[field]) for key, data in rows if data[field] is not None}
+                    if len(scores) > 0:
+                        pipeline.zadd(cls.get_field_sorted_index_key(field), scores)
+                        index_keys.append(cls.get_field_sorted_index_key(field))
+                if life_span is not None:
+                    for index_key in dict.fromkeys(index_keys):
+                        pipeline.expire(index_key, time=life_span)
+                await pipeline.execute()
+            return len(rows)
+
+        for shard in cls._store.shards:
+            for table_index_key in cls.get_table_index_keys():
+                cursor = 0
+                while True:
+                    cursor, keys = await shard.redis_store.sscan(name=table_index_key, cursor=cursor, count=batch_size)
+                    keys = [bytes_to_string(key) for key in keys]
+                    for start in range(0, len(keys), batch_size):
+                        indexed += await index(shard, keys[start : start + batch_size])
+                    if int(cursor) == 0:
+                        break
+        cls._mark_written()
+        return indexed
+
+    @classmethod
+    def _get_cache(cls) -> Optional[RecordCache]:
+        """Gets this model's cache, None if it has no _cache_size. Each model has its own"""
+        if cls._cache_size is None:
+            return None
+        cache = cls.__dict__.get("_cache")
+        if cache is None:
+            cache = RecordCache(max_size=cls._cache_size, ttl=cls._cache_ttl)
+            cls._cache = cache
+        return cache
+
+    @classmethod
+    def _get_negative_cache(cls) -> Optional[MissCache]:
+        """Gets this model's cache of missing rows, None if it has no _negative_cache_ttl. Each model has its own"""
+        if cls._negative_cache_ttl is None:
+            return None
+        misses = cls.__dict__.get("_negative_cache")
+        if misses is None:
+            misses = MissCache(max_size=cls._negative_cache_size, ttl=cls._negative_cache_ttl)
+            cls._negative_cache = misses
+        return misses
+
+    @classmethod
+    def cache_info(cls) -> Optional[CacheInfo]:
+        """The hits, misses, evictions and size of this model's cache, None if it has no _cache_size"""
+        cache = cls._get_cache()
+        return None if cache is None else cache.info()
+
+    @classmethod
+    def negative_cache_info(cls) -> Optional[CacheInfo]:
+        """
+        The hits, misses, evictions and size of this model's cache of missing rows, None if it has no
+        _negative_cache_ttl. Hits are reads of rows known to be missing that skipped redis
+        """
+        misses = cls._get_negative_cache()
+        return None if misses is None else misses.info()
+
+    @classmethod
+    def cache_clear(cls) -> None:
+        """Drops every row in this model's caches and resets their counters"""
+        for cache in (cls._get_cache(), cls._get_negative_cache()):
+            if cache is not None:
+                cache.clear()
+
+    @classmethod
+    def _invalidate_cache(cls, keys: Optional[List[str]]) -> None:
+        """Drops the rows at keys from this model's caches, every row if keys is None"""
+        for cache in (cls._get_cache(), cls._get_negative_cache()):
+            if cache is None:
+                continue
+            if keys is None:
+                cache.invalidate_all()
+            else:
+                cache.invalidate(*keys)
+
+    @classmethod
+    async def _fetch_instances(cls, keys: List[str]) -> List[Optional[Any]]:
+        """Gets the instances stored at keys from the cache, reading the ones it doesn't have from redis"""
+        cache = cls._get_cache()
+        instances = [cache.get(key) for key in keys]
+        missing = [index for index, instance in enumerate(instances) if instance is None]
+        if len(missing) == 0:
+            return instances
+        generation = cache.generation
+        response = await cls._fetch_records([keys[index] for index in missing])
+        for index, record in zip(missing, response):
+            if record == {}:
+                continue
+            instance = cls._hydrate_records([record])[0]
+            cache.set(keys[index], instance, generation)
+            instances[index] = instance
+        return instances
+
+    @classmethod
+    async def _fetch_records(cls, keys: List[str], columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Fetches and decodes the rows stored at keys in a single round trip, optionally only the given columns
+
+        Rows that do not exist are returned as empty dicts. Rows known to be missing (see _negative_cache_ttl) are
+        not read again
+        """
+        misses = cls._get_negative_cache()
+        if misses is None:
+            return await cls._read_records(keys, columns)
+        known = [key in misses for key in keys]
+        generation = misses.generation
+        unknown = [key for key, missing in zip(keys, known) if not missing]
+        response = iter(await cls._read_records(unknown, columns) if len(unknown) > 0 else [])
+        records = [{} if missing else next(response) for missing in known]
+        if columns is None:
+            # a projection of a row can be empty while the row exists
+            misses.add(
+                [key for key, missing, record in zip(keys, known, records) if not missing and record == {}], generation
+            )
+        return records
+
+    @classmethod
+    async def _read_records(
+        cls, keys: List[str], columns: Optional[List[str]] = None, primary: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Reads and decodes the rows stored at keys in a single round trip to each shard, for _fetch_records
+
+        Rows are read from a replica if the store has them, or from the primary if primary
+        """
+        plan = cls.get_serialization_plan()
+        # json is text, connections that don't decode responses hand it over as bytes
+        to_text = bytes_to_string if not plan.binary and not cls._store.decode_responses else None
+        if cls._storage == "blob":
+
+            async def read_blobs(shard: Any, shard_keys: List[str]) -> List[Any]:
+                if len(shard_keys) == 0:
+                    return []
+                client = shard.redis_store if primary else cls._reader(shard)
+                if cls._rows_span_slots():
+                    async with shard.pipeline(client=client) as pipeline:
+                        for key in shard_keys:
+                            pipeline.get(key)
+                        return await pipeline.execute()
+                return await client.mget(shard_keys)
+
+            response = await cls._map_shards(keys, read_blobs)
+            if to_text is not None:
+                response = [to_text(value) for value in response]
+            records = [{} if value is None else plan.decode_record(value) for value in response]
+            if columns is None:
+                return records
+            # projecting a blob happens client side
+            return [{field: record.get(field) for field in columns} if record else {} for record in records]
+
+        async def read_hashes(shard: Any, shard_keys: List[str]) -> List[Any]:
+            async with shard.pipeline(client=shard.redis_store if primary else cls._reader(shard)) as pipeline:
+                for key in shard_keys:
+                    if columns is None:
+                        pipeline.hgetall(name=key)
+                    else:
+                        pipeline.hmget(name=key, keys=columns)
+                return await pipeline.execute()
+
+        response = await cls._map_shards(keys, read_hashes)
+
+        if columns is None:
+            if cls._store.decode_responses:
+                return [cls.deserialize_partially(record) for record in response]
+            return [
                 cls.deserialize_partially(
-                    {field: bytes_to_string(record[index]) for index, field in enumerate(columns)}
+                    {
+                        bytes_to_string(field): value if to_text is None else to_text(value)
+                        for field, value in record.items()
+                    }
                 )
                 for record in response
-                if record != {}
             ]
-        return result
+        records = []
+        for record in response:
+            if all(value is None for value in record):
+                records.append({})
+                continue
+            # columns the row doesn't have are None, there is nothing to decode
+            projected = dict.fromkeys(columns)
+            projected.update(
+                cls.deserialize_partially(
+                    {
+                        column: value if to_text is None else to_text(value)
+                        for column, value in zip(columns, record)
+                        if value is not None
+                    }
+                )
+            )
+            records.append(projected)
+        return records
+
+    @staticmethod
+    def _check_result_mode(columns: Optional[List[str]], lazy: bool, typed: bool) -> None:
+        if lazy and columns is not None:
+            raise ValueError("lazy can not be combined with columns")
+        if typed and columns is None:
+            raise ValueError("typed needs columns")
+
+    @classmethod
+    def _hydrate_records(
+        cls,
+        response: List[Dict[str, Any]],
+        columns: Optional[List[str]] = None,
+        lazy: bool = False,
+        typed: bool = False,
+    ) -> List[Any]:
+        """
+        Turns the rows from _fetch_records into models, or LazyRecords if lazy, or leaves them as dicts if columns
+        were selected, or into projection models if they are typed
+        """
+        if typed:
+            return [cls._project(columns, record) for record in response if record != {}]
+        if lazy:
+            return [LazyRecord(cls, record) for record in response if record != {}]
+        if columns is None:
+            return [cls._from_record(record) for record in response if record != {}]
+        return [record for record in response if record != {}]
+
+    @classmethod
+    def get_projection_model(cls, columns: List[str]) -> Type[BaseModel]:
+        """
+        Gets the pydantic model of the columns of this model, e.g. to use as a response model
+
+        It has the given fields only, with their types, defaults and validators. Root validators don't run, they
+        may need fields that aren't there. Each model and list of columns has one projection model, built the first
+        time it's asked for.
+        """
+        projections = cls.__dict__.get("_projections")
+        if projections is None:
+            projections = {}
+            cls._projections = projections
+        key = tuple(columns)
+        projection = projections.get(key)
+        if projection is not None:
+            return projection
+        for column in columns:
+            if column not in cls.__fields__:
+                raise ValueError(f"{column} is not a field of {cls.__name__}")
+        validators = {
+            f"_validate_{column}_{index}": validator(
+                column,
+                pre=class_validator.pre,
+                each_item=class_validator.each_item,
+                always=class_validator.always,
+                check_fields=False,
+                allow_reuse=True,
+            )(class_validator.func)
+            for column in columns
+            for index, class_validator in enumerate(cls.__validators__.get(column, []))
+        }
+        projection = create_model(
+            f"{cls.__name__}Projection_{'_'.join(columns)}",
+            __config__=cls.__config__,
+            __module__=cls.__module__,
+            __validators__=validators,
+            **{
+                column: (cls.__fields__[column].annotation, copy(cls.__fields__[column].field_info))
+                for column in columns
+            },
+        )
+        projections[key] = projection
+        return projection
+
+    @classmethod
+    def _project(cls, columns: List[str], record: Dict[str, Any]) -> BaseModel:
+        """Builds the projection model of columns from a row read with those columns"""
+        projection = cls.get_projection_model(columns)
+        # columns the row doesn't have get their defaults
+        record = {column: value for column, value in record.items() if value is not None}
+        if cls._trusted_reads and cls.get_serialization_plan().required.intersection(columns).issubset(record):
+            converters = cls.get_serialization_plan().converters
+            return projection.construct(**{column: converters[column](value) for column, value in record.items()})
+        return projection(**record)
+
+    @classmethod
+    def _from_record(cls, record: Dict[str, Any]) -> Any:
+        """Builds a model from a row read from redis, without validating it if the model has _trusted_reads"""
+        if cls._trusted_reads:
+            plan = cls.get_serialization_plan()
+            if plan.required.issubset(record):
+                converters = plan.converters
+                instance = cls.construct(
+                    **{name: converters[name](value) for name, value in record.items() if name in converters}
+                )
+                instance._mark_saved(instance._dirty_fields)
+                return instance
+        instance = cls(**record)
+        instance._mark_saved(instance._dirty_fields)
+        return instance
 
 
 class AutoModel(Model):
@@ -0,0 +1,61 @@
+"""Module containing the routing of reads to replicas"""
+
+import asyncio
+from time import monotonic
+from typing import Any
+from typing import List
+from typing import Optional
+
+
+class ReadRouter:
+    """
+    Picks the replica each read is sent to, with a policy from READ_POLICIES
+
+    round_robin sends reads to each replica in turn. least_latency sends them to the replica with the lowest average
+    round trip time. Round trips are measured with PING in the background, at most every probe_interval seconds and
+    only while there are reads. Reads go round robin until the first measurement, and replicas that didn't answer the
+    last PING are left out until they do.
+    """
+
+    def __init__(self, replicas: List[Any], policy: str, probe_interval: float = 5.0):
+        self.replicas = replicas
+        self.policy = policy
+        self.probe_interval = probe_interval
+        # the moving average of the round trip time to each replica, None until it answers a PING
+        self.latencies: List[Optional[float]] = [None] * len(replicas)
+        self._next = 0
+        self._probed_at: Optional[float] = None
+        self._probe: Optional[asyncio.Task] = None
+
+    def pick(self) -> Any:
+        """The replica to send the next read to"""
+        if self.policy == "least_latency":
+            self._schedule_probe()
+            measured = [(latency, index) for index, latency in enumerate(self.latencies) if latency is not None]
+            if len(measured) > 0:
+                return self.replicas[min(measured)[1]]
+        replica = self.replicas[self._next % len(self.replicas)]
+        self._next += 1
+        return replica
+
+    def _schedule_probe(self) -> None:
+        now = monotonic()
+        if self._probe is not None and (not self._probe.done() or now - self._probed_at < self.probe_interval):
+            return
+        self._probed_at = now
+        self._probe = asyncio.get_running_loop().create_task(self.probe())
+
+    async def probe(self) -> None:
+        """Measures the round trip time to every replica at once"""
+        await asyncio.gather(*(self._ping(index, replica) for index, replica in enumerate(self.replicas)))
+
+    async def _ping(self, index: int, replica: Any) -> None:
+        started = monotonic()
+        try:
+            await replica.ping()
+        except Exception:  # noqa: BLE001 - an unreachable replica is left out, whatever the error
+            self.latencies[index] = None
+            return
+        latency = monotonic() - started
+        previous = self.latencies[index]
+        self.latencies[index] = latency if previous is None else 0.8 * previous + 0.2 * latency
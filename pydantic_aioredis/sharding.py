@@ -0,0 +1,37 @@
+"""Module containing the consistent hashing used by ShardedStore"""
+
+from bisect import bisect
+from hashlib import blake2b
+from typing import List
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing of keys to nodes
+
+    Each node is placed at points points on a ring of 64 bit hashes, hashed from its name, and a key belongs to the
+    node of the first point after the hash of the key. Adding or removing a node only moves the keys next to its points,
+    about 1/len(nodes) of them, and the order the nodes are given in doesn't matter.
+    """
+
+    def __init__(self, nodes: List[str], points: int = 160):
+        if len(nodes) == 0:
+            raise ValueError("A hash ring needs at least one node")
+        if len(set(nodes)) != len(nodes):
+            raise ValueError("The nodes of a hash ring must have different names")
+        if points < 1:
+            raise ValueError("points must be at least 1")
+        self.nodes = nodes
+        ring = sorted((_hash(f"{node}-{point}"), index) for index, node in enumerate(nodes) for point in range(points))
+        self._hashes = [point for point, _ in ring]
+        self._indexes = [index for _, index in ring]
+
+    def index_of(self, key: str) -> int:
+        """The index in nodes of the node key belongs to"""
+        if len(self.nodes) == 1:
+            return 0
+        return self._indexes[bisect(self._hashes, _hash(key)) % len(self._hashes)]
@@ -1,13 +1,32 @@
 """Module containing the store classes"""
 
+import asyncio
 from typing import Any
+from typing import AsyncIterable
 from typing import Dict
+from typing import List
 from typing import Optional
 
+from pydantic import PrivateAttr
+from pydantic.fields import SHAPE_SINGLETON
 from pydantic_aioredis.abstract import _AbstractStore
+from pydantic_aioredis.coalesce import WriteCoalescer
+from pydantic_aioredis.codec import CODECS
+from pydantic_aioredis.codec import COMPRESSIONS
+from pydantic_aioredis.codec import JSON_BACKENDS
 from pydantic_aioredis.config import RedisConfig
 from pydantic_aioredis.model import Model
+from pydantic_aioredis.routing import ReadRouter
+from pydantic_aioredis.sharding import HashRing
+from pydantic_aioredis.types import HASH_TAG_MODES
+from pydantic_aioredis.types import READ_POLICIES
+from pydantic_aioredis.types import SCORE_TYPES
+from pydantic_aioredis.types import STORAGE_MODES
+from pydantic_aioredis.tracking import RedisInvalidations
+from pydantic_aioredis.write_behind import WriteBehindQueue
 from redis import asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.sentinel import Sentinel
 
 
 class Store(_AbstractStore):
@@ -16,6 +35,13 @@ class Store(_AbstractStore):
     """
 
     models: Dict[str, type(Model)] = {}
+    _write_behind: WriteBehindQueue = PrivateAttr(default_factory=WriteBehindQueue)
+    _coalescer: Optional[WriteCoalescer] = PrivateAttr(default=None)
+    _invalidations: Any = PrivateAttr(default=None)
+    _tracking_task: Optional[asyncio.Task] = PrivateAttr(default=None)
+    _scripts: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _sentinel: Optional[Sentinel] = PrivateAttr(default=None)
+    _router: Optional[ReadRouter] = PrivateAttr(default=None)
 
     def __init__(
         self,
@@ -23,29 +49,423 @@ class Store(_AbstractStore):
         redis_config: RedisConfig,
         redis_store: Optional[aioredis.Redis] = None,
         life_span_in_seconds: Optional[int] = None,
+        json_backend: str = "json",
+        coalesce_window: Optional[float] = None,
+        read_policy: str = "round_robin",
         **data: Any,
     ):
+        if json_backend not in JSON_BACKENDS:
+            raise ValueError(f"Unknown json backend {json_backend}, use one of {', '.join(JSON_BACKENDS)}")
+        if coalesce_window is not None and coalesce_window < 0:
+            raise ValueError("coalesce_window can not be negative")
+        if read_policy not in READ_POLICIES:
+            raise ValueError(f"Unknown read_policy {read_policy}, use one of {', '.join(READ_POLICIES)}")
+        if redis_config.sentinels and redis_config.sentinel_service is None:
+            raise ValueError("sentinels need the sentinel_service of the primary to read and write")
+        if redis_config.sentinels and redis_config.replicas:
+            raise ValueError("replicas can not be combined with sentinels, the sentinels know the replicas")
         super().__init__(
             name=name,
             redis_config=redis_config,
             redis_store=redis_store,
             life_span_in_seconds=life_span_in_seconds,
+            json_backend=json_backend,
+            coalesce_window=coalesce_window,
+            read_policy=read_policy,
             **data,
         )
-        self.redis_store = aioredis.from_url(
+        if coalesce_window is not None:
+            self._coalescer = WriteCoalescer(window=coalesce_window)
+        self.redis_store = self._connect()
+        self.replica_stores = self._connect_replicas()
+
+    def _connect(self) -> aioredis.Redis:
+        """Makes the client for redis_config, no connection is made until it's used"""
+        if self.redis_config.sentinels:
+            # the sentinels are asked where the primary is when connecting, and again after a failover
+            self._sentinel = Sentinel(self.redis_config.sentinels, **self._connection_kwargs())
+            return self._sentinel.master_for(self.redis_config.sentinel_service)
+        return aioredis.from_url(
             self.redis_config.redis_url,
             encoding=self.redis_config.encoding,
-            decode_responses=True,
+            decode_responses=self.redis_config.decode_responses,
         )
 
+    def _connect_replicas(self) -> List[aioredis.Redis]:
+        """Makes the clients of the replicas in redis_config, reads are sent to them, see reader"""
+        if self._sentinel is not None:
+            # a client of every replica the sentinels know, in turn, or of the primary if there are none
+            return [self._sentinel.slave_for(self.redis_config.sentinel_service)]
+        return [
+            aioredis.from_url(
+                self.redis_config.replica_url(host, port),
+                encoding=self.redis_config.encoding,
+                decode_responses=self.redis_config.decode_responses,
+            )
+            for host, port in self.redis_config.replicas
+        ]
+
+    def _connection_kwargs(self) -> Dict[str, Any]:
+        return {
+            "db": self.redis_config.db,
+            "password": self.redis_config.password,
+            "ssl": self.redis_config.ssl,
+            "encoding": self.redis_config.encoding,
+            "decode_responses": self.redis_config.decode_responses,
+        }
+
+    @property
+    def decode_responses(self) -> bool:
+        """If the redis connection decodes responses into strings"""
+        return bool(self.redis_store.get_encoder().decode_responses)
+
+    def pipeline(self, transaction: bool = True, client: Optional[aioredis.Redis] = None) -> Any:
+        """A pipeline of client, the store's connection by default, wrapped in MULTI/EXEC if transaction"""
+        return (self.redis_store if client is None else client).pipeline(transaction=transaction)
+
+    def reader(self) -> aioredis.Redis:
+        """
+        The client to send a read to, one of the replica_stores picked with read_policy (see READ_POLICIES), the
+        store's connection if there are none
+
+        Replicas are behind the primary by however long replication takes, see _read_your_writes on Model.
+        """
+        if len(self.replica_stores) == 0:
+            return self.redis_store
+        if self._router is None:
+            self._router = ReadRouter(self.replica_stores, self.read_policy)
+        return self._router.pick()
+
+    async def queue_script(self, pipeline: Any, script: str, keys: List[str], args: List[Any]) -> None:
+        """Queues a lua script on pipeline, by its sha once redis has it"""
+        registered = self._scripts.get(script)
+        if registered is None:
+            registered = self.redis_store.register_script(script)
+            self._scripts[script] = registered
+        await registered(keys=keys, args=args, client=pipeline)
+
+    @property
+    def shards(self) -> List["Store"]:
+        """The stores the rows are kept in, a store keeps its rows itself"""
+        return [self]
+
+    def shard_of(self, key: str) -> "Store":
+        """The store the row at key is kept in"""
+        return self
+
+    @property
+    def write_behind(self) -> WriteBehindQueue:
+        """The queue that _auto_save and _auto_sync save instances with"""
+        return self._write_behind
+
+    @property
+    def coalescer(self) -> Optional[WriteCoalescer]:
+        """The coalescer that merges writes to the same rows, None unless the store has a coalesce_window"""
+        return self._coalescer
+
+    async def flush(self, model_class: Optional[type] = None) -> None:
+        """
+        Waits until every instance queued by _auto_save and _auto_sync is saved
+
+        Automatic saves happen in the background, await this where the changes have to be in redis, e.g. before
+        answering a request. Raises the first error from saving in the background, if there was one, or only an error
+        from saving model_class if it is given.
+        """
+        await self._write_behind.flush(model_class)
+        if self._coalescer is not None:
+            await self._coalescer.flush()
+
+    async def close(self) -> None:
+        """
+        Saves everything that is queued and stops client tracking, await it before the event loop stops
+
+        Instances queued by _auto_save and _auto_sync are only saved while the event loop runs, e.g. asyncio.run
+        cancels the queue when it returns and the saves wait for the next flush. Raises like flush.
+        """
+        try:
+            await self.flush()
+        finally:
+            await self.stop_client_tracking()
+
+    async def start_client_tracking(self, invalidations: Optional[AsyncIterable[Optional[List[str]]]] = None) -> None:
+        """
+        Keeps the caches of this store's models (see _cache_size and _negative_cache_ttl) in sync with writes made by
+        any client
+
+        By default, redis client tracking in broadcasting mode reports every change to the rows of the models with a
+        cache that are registered now, and the rows are dropped from the caches. Register models before starting.
+
+        invalidations can be any async iterable of lists of changed keys, None meaning every key, e.g. to test with
+        a fake. It is closed by stop_client_tracking if it has a close method.
+
+        If the invalidations stop, e.g. because the connection was lost, the caches are emptied, since they can't
+        be trusted anymore, and tracking stops.
+        """
+        await self.stop_client_tracking()
+        if invalidations is None:
+            prefixes = [model.get_key_prefix() for model in self._cached_models()]
+            invalidations = RedisInvalidations(self.redis_store, prefixes)
+            await invalidations.start()
+        self._invalidations = invalidations
+        self._tracking_task = asyncio.get_running_loop().create_task(self._track(invalidations))
+
+    async def stop_client_tracking(self) -> None:
+        """Stops keeping the caches in sync, the caches are emptied"""
+        if self._tracking_task is not None:
+            self._tracking_task.cancel()
+            try:
+                await self._tracking_task
+            except (asyncio.CancelledError, Exception):  # noqa: BLE001 - tracking is over either way
+                pass
+            self._tracking_task = None
+            self._invalidate_caches()
+        if self._invalidations is not None:
+            close = getattr(self._invalidations, "close", None)
+            self._invalidations = None
+            if close is not None:
+                await close()
+
+    @property
+    def client_tracking(self) -> bool:
+        """If the caches are being kept in sync with client tracking"""
+        return self._tracking_task is not None and not self._tracking_task.done()
+
+    def _cached_models(self) -> List[Any]:
+        """Every registered model with a cache of rows or of missing rows"""
+        return [
+            model
+            for model in self.models.values()
+            if model._get_cache() is not None or model._get_negative_cache() is not None
+        ]
+
+    def _invalidate_caches(self) -> None:
+        for model in self._cached_models():
+            model._invalidate_cache(None)
+
+    async def _track(self, invalidations: AsyncIterable[Optional[List[str]]]) -> None:
+        models = [(model.get_key_prefix(), model) for model in self._cached_models()]
+        try:
+            async for keys in invalidations:
+                for prefix, model in models:
+                    if keys is None:
+                        model._invalidate_cache(None)
+                        continue
+                    matching = [key for key in keys if key.startswith(prefix)]
+                    if len(matching) > 0:
+                        model._invalidate_cache(matching)
+        finally:
+            # without invalidations, cached rows may be stale
+            self._invalidate_caches()
+
     def register_model(self, model_class: type(Model)):
         """Registers the model to this store"""
         if not isinstance(model_class.get_primary_key_field(), str):
             raise NotImplementedError(f"{model_class.__name__} should have a _primary_key_field")
 
+        if model_class._codec not in CODECS:
+            raise ValueError(f"{model_class.__name__} has an unknown _codec, use one of {', '.join(CODECS)}")
+        if model_class._codec == "msgpack" and self.decode_responses:
+            raise ValueError(
+                f"{model_class.__name__} uses the msgpack codec, it needs a RedisConfig with decode_responses=False"
+            )
+        if model_class._compression is not None and model_class._compression not in COMPRESSIONS:
+            raise ValueError(
+                f"{model_class.__name__} has an unknown _compression, use one of {', '.join(COMPRESSIONS)}"
+            )
+        for field in model_class._compressed_fields:
+            if field not in model_class.__fields__:
+                raise ValueError(f"{model_class.__name__} can not compress {field}, it is not a field")
+        if model_class._cache_size is not None and model_class._cache_size < 1:
+            raise ValueError(f"{model_class.__name__} has a _cache_size less than 1")
+        if model_class._cache_ttl is not None and model_class._cache_ttl <= 0:
+            raise ValueError(f"{model_class.__name__} has a _cache_ttl that is not positive")
+        if model_class._negative_cache_ttl is not None and model_class._negative_cache_ttl <= 0:
+            raise ValueError(f"{model_class.__name__} has a _negative_cache_ttl that is not positive")
+        if model_class._negative_cache_size < 1:
+            raise ValueError(f"{model_class.__name__} has a _negative_cache_size less than 1")
+        if model_class._read_your_writes is not None and model_class._read_your_writes <= 0:
+            raise ValueError(f"{model_class.__name__} has a _read_your_writes that is not positive")
+        if model_class._storage not in STORAGE_MODES:
+            raise ValueError(f"{model_class.__name__} has an unknown _storage, use one of {', '.join(STORAGE_MODES)}")
+
+        for field in model_class._get_indexes():
+            if field not in model_class.__fields__:
+                raise ValueError(f"{model_class.__name__} can not index {field}, it is not a field")
+        for field in model_class._get_sorted_indexes():
+            if field not in model_class.__fields__:
+                raise ValueError(f"{model_class.__name__} can not sort {field}, it is not a field")
+            field_type = model_class.__fields__[field].type_
+            sortable = isinstance(field_type, type) and issubclass(field_type, SCORE_TYPES)
+            if model_class.__fields__[field].shape != SHAPE_SINGLETON or not sortable:
+                raise ValueError(f"{model_class.__name__} can not sort {field}, it is not a number, date or datetime")
+
         model_class._store = self
+        model_class.build_serialization_plan()
+        # rows cached from another store are not this store's rows
+        model_class.cache_clear()
         self.models[model_class.__name__.lower()] = model_class
 
     def model(self, name: str) -> Model:
         """Gets a model by name: case insensitive"""
         return self.models[name.lower()]
+
+
+class ClusterStore(Store):
+    """
+    A store on a redis cluster
+
+    Keys are placed in cluster slots with hash tags, chosen with hash_tags (see HASH_TAG_MODES):
+        table -- every key of a table, its rows and indexes, is in one slot, named {prefix}{table}. Everything works
+            like it does on a single node, and tables are spread over the cluster.
+        record -- the primary key value of each row is its hash tag, so the rows of a table are spread over the
+            cluster. The table index is split into index_shards sets, 16 by default, and queries that combine
+            several field indexes intersect them in the client.
+
+    Pipelines are split by node by the cluster client, and are never MULTI/EXEC transactions: writes to several
+    rows are not atomic. Client tracking needs a source of invalidations to be passed in.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_config: RedisConfig,
+        redis_store: Optional[RedisCluster] = None,
+        life_span_in_seconds: Optional[int] = None,
+        json_backend: str = "json",
+        coalesce_window: Optional[float] = None,
+        hash_tags: str = "table",
+        index_shards: Optional[int] = None,
+        **data: Any,
+    ):
+        if hash_tags not in HASH_TAG_MODES:
+            raise ValueError(f"Unknown hash_tags {hash_tags}, use one of {', '.join(HASH_TAG_MODES)}")
+        if index_shards is None:
+            index_shards = 16 if hash_tags == "record" else 1
+        if index_shards < 1:
+            raise ValueError("index_shards must be at least 1")
+        if hash_tags == "table" and index_shards != 1:
+            raise ValueError("index_shards needs hash_tags='record', the keys of a table are all in one slot")
+        if redis_config.db != 0:
+            raise ValueError("redis cluster only has db 0")
+        if redis_config.replicas or redis_config.sentinels:
+            raise ValueError(
+                "A ClusterStore finds the nodes of the cluster itself, it can't have replicas or sentinels"
+            )
+        super().__init__(
+            name=name,
+            redis_config=redis_config,
+            redis_store=redis_store,
+            life_span_in_seconds=life_span_in_seconds,
+            json_backend=json_backend,
+            coalesce_window=coalesce_window,
+            hash_tags=hash_tags,
+            index_shards=index_shards,
+            **data,
+        )
+
+    def _connect(self) -> RedisCluster:
+        return RedisCluster.from_url(
+            self.redis_config.redis_url,
+            encoding=self.redis_config.encoding,
+            decode_responses=self.redis_config.decode_responses,
+        )
+
+    def pipeline(self, transaction: bool = True, client: Optional[RedisCluster] = None) -> Any:
+        """A pipeline of the cluster, split by node when it's executed. It is never a transaction"""
+        return self.redis_store.pipeline()
+
+    async def queue_script(self, pipeline: Any, script: str, keys: List[str], args: List[Any]) -> None:
+        """Queues a lua script on pipeline, with EVAL since the nodes may not have it yet"""
+        pipeline.eval(script, len(keys), *keys, *args)
+
+    async def start_client_tracking(self, invalidations: Optional[AsyncIterable[Optional[List[str]]]] = None) -> None:
+        """See Store.start_client_tracking, invalidations have to be given since each node tracks its own keys"""
+        if invalidations is None:
+            raise ValueError("A ClusterStore can not track keys by itself, pass the invalidations of every node")
+        await super().start_client_tracking(invalidations)
+
+
+class ShardedStore(Store):
+    """
+    A store that spreads the rows of its models over several independent redis servers
+
+    Each row is kept on one of the servers in redis_configs, chosen by consistent hashing of its key (see HashRing),
+    together with its entries in the indexes. Reading or writing rows by primary key only talks to the servers that
+    have them, one pipeline per server, and selects, counts, deletes and index scans are sent to every server at once
+    and their results merged. Adding a server moves about 1/len(redis_configs) of the rows, which are not moved for
+    you. Each server can have its own replicas, reads are routed to them with read_policy like they are by Store.
+
+    Each server has its own MULTI/EXEC, writes to rows on different servers are not atomic together. Client tracking
+    needs a source of invalidations to be passed in.
+    """
+
+    redis_configs: List[RedisConfig] = []
+    ring_points: int = 160
+    _shards: List[Store] = PrivateAttr(default_factory=list)
+    _ring: Optional[HashRing] = PrivateAttr(default=None)
+
+    def __init__(
+        self,
+        name: str,
+        redis_configs: List[RedisConfig],
+        life_span_in_seconds: Optional[int] = None,
+        json_backend: str = "json",
+        coalesce_window: Optional[float] = None,
+        read_policy: str = "round_robin",
+        ring_points: int = 160,
+        **data: Any,
+    ):
+        if len(redis_configs) == 0:
+            raise ValueError("A ShardedStore needs at least one RedisConfig")
+        if len({config.decode_responses for config in redis_configs}) > 1:
+            raise ValueError("Every RedisConfig of a ShardedStore needs the same decode_responses")
+        # the servers are known by their address, so the order of redis_configs doesn't matter
+        ring = HashRing([f"{config.host}:{config.port}/{config.db}" for config in redis_configs], ring_points)
+        super().__init__(
+            name=name,
+            redis_config=redis_configs[0],
+            life_span_in_seconds=life_span_in_seconds,
+            json_backend=json_backend,
+            coalesce_window=coalesce_window,
+            redis_configs=redis_configs,
+            read_policy=read_policy,
+            ring_points=ring_points,
+            **data,
+        )
+        self._ring = ring
+        self._shards = [
+            Store(
+                name=f"{name}-{node}",
+                redis_config=config,
+                life_span_in_seconds=life_span_in_seconds,
+                json_backend=json_backend,
+                read_policy=read_policy,
+            )
+            for node, config in zip(ring.nodes, redis_configs)
+        ]
+
+    def _connect(self) -> None:
+        """A sharded store has no connection of its own, each of its shards has one"""
+        return None
+
+    def _connect_replicas(self) -> List[aioredis.Redis]:
+        """The replicas of each server are its shard's, see shards"""
+        return []
+
+    @property
+    def decode_responses(self) -> bool:
+        return self._shards[0].decode_responses
+
+    @property
+    def shards(self) -> List[Store]:
+        """The stores of each redis server, in the order of redis_configs"""
+        return self._shards
+
+    def shard_of(self, key: str) -> Store:
+        return self._shards[self._ring.index_of(key)]
+
+    async def start_client_tracking(self, invalidations: Optional[AsyncIterable[Optional[List[str]]]] = None) -> None:
+        """See Store.start_client_tracking, invalidations have to be given since each server tracks its own keys"""
+        if invalidations is None:
+            raise ValueError("A ShardedStore can not track keys by itself, pass the invalidations of every server")
+        await super().start_client_tracking(invalidations)
@@ -0,0 +1,83 @@
+"""Module containing the source of key invalidations for client side caching with redis client tracking"""
+
+from typing import Any
+from typing import AsyncIterator
+from typing import List
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from .utils import bytes_to_string
+
+# the channel redis publishes invalidations on when tracking is redirected to another connection
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+class RedisInvalidations:
+    """
+    The keys redis reports as changed, using client tracking in broadcasting mode
+
+    start() subscribes a connection to INVALIDATE_CHANNEL, and turns tracking on for a second connection with its
+    invalidations redirected to the first one. Redis then reports every key starting with one of prefixes that is
+    changed, deleted or expires, by any client. Redirecting works with RESP2 and RESP3 connections alike.
+
+    Iterating yields the lists of keys that changed, or None when every key was invalidated, e.g. by FLUSHDB.
+    Both connections are held until close().
+    """
+
+    def __init__(self, redis_store: aioredis.Redis, prefixes: List[str]):
+        self.redis_store = redis_store
+        self.prefixes = prefixes
+        self._pubsub = None
+        self._tracking_connection = None
+
+    async def start(self) -> None:
+        """Subscribes to invalidations and turns tracking on"""
+        self._pubsub = self.redis_store.pubsub()
+        await self._pubsub.connect()
+        connection = self._pubsub.connection
+        await connection.send_command("CLIENT", "ID")
+        client_id = await connection.read_response()
+        await self._pubsub.subscribe(INVALIDATE_CHANNEL)
+
+        arguments = ["CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST"]
+        for prefix in self.prefixes:
+            arguments.extend(("PREFIX", prefix))
+        # tracking lasts as long as the connection that turned it on, so it is kept out of the pool
+        # older versions of redis need the name of a command to get a connection
+        self._tracking_connection = await self.redis_store.connection_pool.get_connection("CLIENT")
+        await self._tracking_connection.send_command(*arguments)
+        await self._tracking_connection.read_response()
+
+    def __aiter__(self) -> AsyncIterator[Optional[List[str]]]:
+        return self._invalidations()
+
+    async def _invalidations(self) -> AsyncIterator[Optional[List[str]]]:
+        async for message in self._pubsub.listen():
+            keys = self.parse_message(message)
+            if keys is not False:
+                yield keys
+
+    @staticmethod
+    def parse_message(message: Any) -> Any:
+        """The keys invalidated by a pubsub message, None for all of them, False if it isn't an invalidation"""
+        if message is None or message.get("type") != "message":
+            return False
+        data = message.get("data")
+        if data is None:
+            return None
+        if isinstance(data, (str, bytes)):
+            return [bytes_to_string(data)]
+        return [bytes_to_string(key) for key in data]
+
+    async def close(self) -> None:
+        """Turns tracking off and closes both connections"""
+        if self._tracking_connection is not None:
+            await self._tracking_connection.disconnect()
+            await self.redis_store.connection_pool.release(self._tracking_connection)
+            self._tracking_connection = None
+        if self._pubsub is not None:
+            # aclose was added in redis 5.0.1, close is the same on earlier versions
+            close = getattr(self._pubsub, "aclose", None) or self._pubsub.close
+            await close()
+            self._pubsub = None
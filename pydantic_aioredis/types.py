@@ -1,3 +1,6 @@
+from datetime import date
+from datetime import datetime
+from decimal import Decimal
 from enum import Enum
 from ipaddress import IPv4Address
 from ipaddress import IPv4Network
@@ -32,3 +35,18 @@ JSON_DUMP_SHAPES = (
 # STR_DUMP_SHAPES are object types that are serialized to strings using str(obj)
 # They are stored in redis as strings and rely on pydantic to deserialize them
 STR_DUMP_SHAPES = (IPv4Address, IPv4Network, IPv6Address, IPv6Network, UUID)
+
+# SCORE_TYPES are field types that can be converted into sorted set scores for _sorted_indexes
+SCORE_TYPES = (int, float, bool, Decimal, date, datetime)
+
+# STORAGE_MODES are the ways a model's rows can be stored in redis, set with _storage
+# hash stores each row as a redis hash, blob stores each row as a single serialized string
+STORAGE_MODES = ("hash", "blob")
+
+# HASH_TAG_MODES are the ways a ClusterStore places keys in cluster slots, set with hash_tags
+# table keeps every key of a table in one slot, record spreads the rows over the cluster with a sharded table index
+HASH_TAG_MODES = ("table", "record")
+
+# READ_POLICIES are the ways a Store picks the replica each read goes to, set with read_policy
+# round_robin uses each replica in turn, least_latency the one that answered PING the fastest lately
+READ_POLICIES = ("round_robin", "least_latency")
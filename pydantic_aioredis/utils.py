@@ -2,11 +2,16 @@
 
 import asyncio
 import asyncio.events as events
+import base64
+import binascii
 import os
 import sys
 import threading
 from contextlib import contextmanager, suppress
+from datetime import date, datetime, timezone
+from decimal import Decimal
 from heapq import heappop
+from typing import Any
 
 
 def bytes_to_string(data: bytes):
@@ -14,6 +19,35 @@ def bytes_to_string(data: bytes):
     return str(data, "utf-8") if isinstance(data, bytes) else data
 
 
+def to_score(value: Any) -> float:
+    """Converts a number, date or datetime into a sorted set score
+
+    dates and datetimes become POSIX timestamps, naive datetimes and dates are treated as UTC
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp()
+    if isinstance(value, (int, float, Decimal)):
+        return float(value)
+    raise TypeError("Type %s can not be used as a score" % type(value))
+
+
+def encode_cursor(key: str) -> str:
+    """Encodes a redis key into an opaque, url safe continuation token"""
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Decodes a continuation token made by encode_cursor back into a redis key"""
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError) as exc:
+        raise ValueError(f"Invalid cursor {cursor!r}") from exc
+
+
 class NestedAsyncIO:
     __slots__ = [
         "_loop",
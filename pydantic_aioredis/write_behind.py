@@ -0,0 +1,101 @@
+"""Module containing the write-behind queue used for automatic saving"""
+
+import asyncio
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+class WriteBehindQueue:
+    """
+    Saves model instances in the background, used with _auto_save and _auto_sync
+
+    Instances are queued instead of saved right away, so setting a field doesn't wait for a round trip. Changes to an
+    instance that is already queued are written with it, so an instance is written once however many fields were set.
+    Instances are queued by model and primary key, when another instance of the same row is queued before it is
+    written, only the newest one is saved. Queued instances are saved in batches of up to batch_size instances, with
+    one pipeline per model per batch.
+
+    Errors from saving in the background are kept by model, and raised by the next flush() of that model or of every
+    model. If saving is cancelled, e.g. because the event loop stopped, the instances that weren't saved stay queued
+    and are saved by the next flush().
+    """
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        # queued instances by model and primary key, dicts keep their order so rows are saved in the order they were
+        # first queued
+        self._pending: Dict[Tuple[type, Any], Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        # the first error from saving each model in the background
+        self._errors: Dict[type, BaseException] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, instance: Any) -> None:
+        """Queues instance to be saved. Without a running event loop, it is saved right away on a new one"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(instance.save())
+            finally:
+                loop.close()
+            return
+
+        model_class = type(instance)
+        self._pending[(model_class, getattr(instance, model_class._primary_key_field))] = instance
+        self._start(loop)
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._drain())
+
+    async def flush(self, model_class: Optional[type] = None) -> None:
+        """
+        Waits until every queued instance is saved, and raises the first error from saving in the background
+
+        With model_class, only an error from saving that model is raised, errors of other models are kept for their
+        own flush.
+        """
+        while self._pending or (self._task is not None and not self._task.done()):
+            # saving may have been cancelled with instances still queued, then it is started again
+            self._start(asyncio.get_running_loop())
+            task = self._task
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+        if model_class is None:
+            if self._errors:
+                error = next(iter(self._errors.values()))
+                self._errors = {}
+                raise error
+        elif model_class in self._errors:
+            raise self._errors.pop(model_class)
+
+    async def _drain(self) -> None:
+        # let the current callback finish, so the fields it sets are saved together
+        await asyncio.sleep(0)
+        while self._pending:
+            keys = list(self._pending)[: self.batch_size]
+            unsaved = {key: self._pending.pop(key) for key in keys}
+            by_model: Dict[type, List[Tuple[Any, Any]]] = {}
+            for key, instance in unsaved.items():
+                by_model.setdefault(key[0], []).append((key, instance))
+            for model_class, items in by_model.items():
+                try:
+                    await model_class._save_many([instance for _, instance in items])
+                except asyncio.CancelledError:
+                    # queued again in front, unless a newer instance of the row was queued since
+                    self._pending = {**unsaved, **self._pending}
+                    raise
+                except Exception as exc:  # noqa: BLE001 - raised again by flush
+                    self._errors.setdefault(model_class, exc)
+                for key, _ in items:
+                    del unsaved[key]
@@ -11,9 +11,16 @@ class Model(FastAPIModel):
     name: str
 
 
+class RememberedModel(FastAPIModel):
+    _primary_key_field = "name"
+    _negative_cache_ttl = 60
+    name: str
+
+
 @pytest_asyncio.fixture()
 async def test_app(redis_store):
     redis_store.register_model(Model)
+    redis_store.register_model(RememberedModel)
 
     app = FastAPI()
 
@@ -21,6 +28,10 @@ async def test_app(redis_store):
     async def get_endpoint():
         return await Model.select_or_404()
 
+    @app.get("/remembered/{name}", response_model=List[RememberedModel])
+    async def get_remembered_endpoint(name: str):
+        return await RememberedModel.select_or_404(ids=[name])
+
     yield redis_store, app
     await redis_store.redis_store.close()
 
@@ -42,3 +53,16 @@ async def test_select_or_404_200(test_app):
     assert response.status_code == 200
     assert len(response.json()) == 1
     assert response.json()[0]["name"] == "test"
+
+
+async def test_select_or_404_remembers_missing(test_app):
+    """Repeated 404s for the same id don't read redis, until the row is inserted"""
+    async with AsyncClient(app=test_app[1], base_url="http://test") as client:
+        assert (await client.get("/remembered/missing")).status_code == 404
+        assert (await client.get("/remembered/missing")).status_code == 404
+        assert RememberedModel.negative_cache_info().hits == 1
+        await RememberedModel.insert(RememberedModel(name="missing"))
+        response = await client.get("/remembered/missing")
+
+    assert response.status_code == 200
+    assert response.json() == [{"name": "missing"}]
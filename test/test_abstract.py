@@ -75,3 +75,20 @@ def test_serialize_partially(
     assert isinstance(serialized.get(model_field), expected_type)
     if equality_expected:
         assert serialized.get(model_field) == value
+
+
+class SubclassedModel(SimpleModel):
+    test_extra: List[int]
+
+
+def test_serialization_plan_is_per_model():
+    """Each model gets its own plan, built once and reused"""
+    plan = SimpleModel.get_serialization_plan()
+    assert SimpleModel.get_serialization_plan() is plan
+    assert SubclassedModel.get_serialization_plan() is not plan
+    assert "test_extra" in SubclassedModel.get_serialization_plan().encoders
+    assert "test_extra" not in plan.encoders
+    # str, int and float are stored as they are and have nothing to do
+    assert "test_str" not in plan.encoders
+    assert "test_int" not in plan.decoders
+    assert SimpleModel.build_serialization_plan() is not plan
@@ -28,6 +28,7 @@ async def redis_store():
     store.redis_store = FakeRedis(decode_responses=True)
     store.register_model(Book)
     yield store
+    await store.close()
     await store.redis_store.flushall()
 
 
@@ -53,11 +54,31 @@ async def test_auto_sync(redis_store):
     )
     key = f"book:{getattr(book, type(book)._primary_key_field)}"
 
+    await redis_store.flush()
     book_in_redis = await redis_store.redis_store.hgetall(name=key)
     book_deser = Book(**Book.deserialize_partially(book_in_redis))
     assert book == book_deser
 
     book.in_stock = True
+    await redis_store.flush()
     book_in_redis = await redis_store.redis_store.hgetall(name=key)
     book_deser = Book(**Book.deserialize_partially(book_in_redis))
     assert book_deser.in_stock
+
+
+async def test_auto_sync_writes_changed_field(redis_store):
+    """Auto sync only writes the field that was set"""
+    book = Book(
+        title="Great Expectations",
+        author="Charles Dickens",
+        published_on=date(year=1220, month=4, day=4),
+    )
+    key = "book:Great Expectations"
+    await redis_store.flush()
+    await redis_store.redis_store.hset(key, "author", "changed elsewhere")
+
+    book.in_stock = False
+    await redis_store.flush()
+    book_in_redis = await redis_store.redis_store.hgetall(name=key)
+    assert book_in_redis["in_stock"] == "false"
+    assert book_in_redis["author"] == "changed elsewhere"
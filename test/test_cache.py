@@ -0,0 +1,216 @@
+"""Tests for the in-process cache of models"""
+
+from datetime import date
+from typing import List
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis.cache import CacheInfo
+from pydantic_aioredis.cache import MissCache
+from pydantic_aioredis.cache import RecordCache
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _cache_size = 2
+    title: str
+    author: str
+    published_on: date
+    editions: List[str] = []
+
+
+class RareBook(Model):
+    _primary_key_field: str = "title"
+    _negative_cache_ttl = 60
+    _negative_cache_size = 2
+    title: str
+    author: str = "Unknown"
+
+
+class UncachedBook(Model):
+    _primary_key_field: str = "title"
+    title: str
+
+
+books = [
+    Book(title="Oliver Twist", author="Charles Dickens", published_on=date(1215, 4, 4), editions=["first"]),
+    Book(title="Great Expectations", author="Charles Dickens", published_on=date(1220, 4, 4)),
+    Book(title="Wuthering Heights", author="Jane Austen", published_on=date(1600, 4, 4)),
+]
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store and adds the book model to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(RareBook)
+    store.register_model(UncachedBook)
+    await Book.insert(books)
+    yield store
+    await store.redis_store.flushall()
+
+
+async def test_hits_skip_redis(redis_store):
+    """Cached rows are served without reading redis"""
+    assert await Book.select(ids=["Oliver Twist"]) == [books[0]]
+    assert Book.cache_info() == CacheInfo(hits=0, misses=1, evictions=0, size=1, max_size=2)
+    # change the row behind the cache's back, the cached row is still returned
+    await redis_store.redis_store.hset("book:Oliver Twist", "author", "Somebody Else")
+    assert await Book.select(ids=["Oliver Twist"]) == [books[0]]
+    assert await Book.get("Oliver Twist") == books[0]
+    assert Book.cache_info().hits == 2
+
+
+async def test_copies_are_returned(redis_store):
+    """Changing a row that came from the cache doesn't change the cache"""
+    first = await Book.get("Oliver Twist")
+    first.editions.append("second")
+    assert (await Book.get("Oliver Twist")).editions == ["first"]
+
+
+async def test_lru_eviction(redis_store):
+    """The least recently used row is evicted when the cache is full"""
+    await Book.select(ids=["Oliver Twist", "Great Expectations"])
+    await Book.get("Oliver Twist")
+    await Book.get("Wuthering Heights")
+    info = Book.cache_info()
+    assert info.evictions == 1
+    assert info.size == 2
+    await Book.get("Oliver Twist")
+    assert Book.cache_info().hits == 2
+    await Book.get("Great Expectations")
+    assert Book.cache_info().misses == 4
+
+
+async def test_ttl(redis_store, monkeypatch):
+    """Rows expire from the cache after _cache_ttl seconds"""
+    now = [1000.0]
+    monkeypatch.setattr("pydantic_aioredis.cache.monotonic", lambda: now[0])
+    cache = RecordCache(max_size=10, ttl=5)
+    cache.set("key", books[0], cache.generation)
+    assert cache.get("key") == books[0]
+    now[0] += 5
+    assert cache.get("key") is None
+    assert cache.info() == CacheInfo(hits=1, misses=1, evictions=0, size=0, max_size=10)
+
+
+async def test_writes_invalidate(redis_store):
+    """insert, save and delete drop the rows they write from the cache"""
+    book = await Book.get("Oliver Twist")
+    book.author = "Someone"
+    await book.save()
+    assert (await Book.get("Oliver Twist")).author == "Someone"
+
+    await Book.insert(books[0])
+    assert (await Book.get("Oliver Twist")).author == books[0].author
+
+    await Book.delete(ids=["Oliver Twist"])
+    assert await Book.get("Oliver Twist") is None
+    assert await Book.select(ids=["Oliver Twist"]) is None
+
+
+async def test_reads_started_before_invalidation_are_not_cached():
+    """A read that raced with a write doesn't fill the cache with what it read"""
+    cache = RecordCache(max_size=10)
+    generation = cache.generation
+    cache.invalidate("key")
+    cache.set("key", books[0], generation)
+    assert len(cache) == 0
+
+
+async def test_select_whole_table(redis_store):
+    """Selecting the whole table uses the cache for the rows it has"""
+    await Book.get("Oliver Twist")
+    result = await Book.select()
+    assert sorted(result, key=lambda book: book.title) == sorted(books, key=lambda book: book.title)
+    assert Book.cache_info().hits == 1
+    assert await Book.select(columns=["title"], ids=["Oliver Twist"]) == [{"title": "Oliver Twist"}]
+
+
+async def test_uncached_models(redis_store):
+    """Models without a _cache_size don't cache"""
+    assert UncachedBook.cache_info() is None
+    assert UncachedBook.negative_cache_info() is None
+    UncachedBook.cache_clear()
+
+
+@pytest.mark.parametrize("attributes", [{"_cache_size": 0}, {"_cache_ttl": 0}])
+def test_register_bad_cache(redis_store, attributes):
+    """Bad cache settings are caught when the model is registered"""
+    with pytest.raises(ValueError, match=r"_cache"):
+        redis_store.register_model(type("BadBook", (Book,), attributes))
+
+
+@pytest.fixture()
+def reads(monkeypatch):
+    """Records the keys read from redis"""
+    reads = []
+    read_records = RareBook._read_records
+
+    async def recording_read_records(keys, columns=None):
+        reads.append(keys)
+        return await read_records(keys, columns)
+
+    monkeypatch.setattr(RareBook, "_read_records", recording_read_records)
+    return reads
+
+
+async def test_missing_rows_are_remembered(redis_store, reads):
+    """Rows that don't exist are read from redis once"""
+    assert await RareBook.select(ids=["Dracula"]) is None
+    assert await RareBook.get("Dracula") is None
+    assert await RareBook.select(ids=["Dracula"]) is None
+    assert reads == [["rarebook:Dracula"]]
+    assert RareBook.negative_cache_info() == CacheInfo(hits=2, misses=1, evictions=0, size=1, max_size=2)
+
+    await RareBook.insert(RareBook(title="Carmilla"))
+    reads.clear()
+    assert await RareBook.select(ids=["Carmilla", "Dracula"]) == [RareBook(title="Carmilla")]
+    assert reads == [["rarebook:Carmilla"]]
+
+
+async def test_inserts_invalidate_missing_rows(redis_store):
+    """Rows inserted in this process are found right away"""
+    assert await RareBook.get("Dracula") is None
+    await RareBook.insert(RareBook(title="Dracula"))
+    assert await RareBook.get("Dracula") == RareBook(title="Dracula")
+    assert RareBook.negative_cache_info().size == 0
+
+
+async def test_projections_are_not_remembered(redis_store, reads):
+    """Selecting columns of a row that doesn't exist doesn't record it as missing"""
+    assert await RareBook.select(columns=["author"], ids=["Dracula"]) is None
+    assert RareBook.negative_cache_info().size == 0
+
+
+async def test_missing_rows_expire(monkeypatch):
+    """Missing rows are forgotten after _negative_cache_ttl seconds"""
+    now = [1000.0]
+    monkeypatch.setattr("pydantic_aioredis.cache.monotonic", lambda: now[0])
+    misses = MissCache(max_size=10, ttl=5)
+    misses.add(["key"], misses.generation)
+    assert "key" in misses
+    now[0] += 5
+    assert "key" not in misses
+
+    generation = misses.generation
+    misses.invalidate("key")
+    misses.add(["key"], generation)
+    assert len(misses) == 0
+
+
+@pytest.mark.parametrize("attributes", [{"_negative_cache_ttl": 0}, {"_negative_cache_size": 0}])
+def test_register_bad_negative_cache(redis_store, attributes):
+    """Bad negative cache settings are caught when the model is registered"""
+    with pytest.raises(ValueError, match=r"_negative_cache"):
+        redis_store.register_model(type("BadBook", (RareBook,), attributes))
@@ -0,0 +1,175 @@
+"""Tests for storing models on a redis cluster"""
+
+from datetime import date
+from typing import Optional
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis import ClusterStore
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from redis.asyncio.client import Pipeline
+from redis.crc import key_slot
+from redis.exceptions import RedisClusterException
+from redis.exceptions import ResponseError
+
+
+def keys_of(args):
+    """The keys of the multi key commands pydantic-aioredis sends"""
+    command = str(args[0]).upper()
+    if command in ("DEL", "UNLINK", "MGET", "SINTER", "EXISTS"):
+        return args[1:]
+    if command == "SINTERCARD":
+        return args[2 : 2 + int(args[1])]
+    if command in ("EVAL", "EVALSHA"):
+        return args[3 : 3 + int(args[2])]
+    return args[1:2]
+
+
+def check_slots(args):
+    """Fails commands whose keys are in different slots, like a cluster does"""
+    slots = {key_slot(key.encode() if isinstance(key, str) else key) for key in keys_of(args)}
+    if len(slots) > 1:
+        raise ResponseError("CROSSSLOT Keys in request don't hash to the same slot")
+
+
+class SlotCheckingPipeline(Pipeline):
+    def pipeline_execute_command(self, *args, **options):
+        check_slots(args)
+        return super().pipeline_execute_command(*args, **options)
+
+
+class FakeCluster(FakeRedis):
+    """A single fake node that enforces the rules of a cluster"""
+
+    def pipeline(self, transaction=None, shard_hint=None):
+        if transaction:
+            raise RedisClusterException("transaction is deprecated in cluster mode")
+        return SlotCheckingPipeline(self.connection_pool, self.response_callbacks, False, None)
+
+    async def execute_command(self, *args, **options):
+        check_slots(args)
+        return await super().execute_command(*args, **options)
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _indexes = ["author", "in_stock"]
+    _sorted_indexes = ["published_on"]
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+    series: Optional[str] = None
+
+
+class BlobBook(Book):
+    _storage = "blob"
+
+
+books = [
+    Book(title="Oliver Twist", author="Charles Dickens", published_on=date(1838, 4, 4), in_stock=False),
+    Book(title="Great Expectations", author="Charles Dickens", published_on=date(1861, 4, 4)),
+    Book(title="Jane Eyre", author="Charlotte Bronte", published_on=date(1847, 10, 16), in_stock=False),
+    Book(title="Wuthering Heights", author="Emily Bronte", published_on=date(1847, 12, 1)),
+]
+
+
+@pytest_asyncio.fixture(params=["table", "record"])
+async def cluster_store(request):
+    """Sets up a cluster store on a fake cluster and adds the book models to it"""
+    store = ClusterStore(
+        name="sample",
+        redis_config=RedisConfig(port=1024),  # nosec
+        life_span_in_seconds=3600,
+        hash_tags=request.param,
+        index_shards=4 if request.param == "record" else None,
+    )
+    store.redis_store = FakeCluster(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(BlobBook)
+    yield store
+    await store.redis_store.flushall()
+
+
+@pytest.mark.parametrize("model_class", [Book, BlobBook])
+async def test_queries(cluster_store, model_class):
+    """Every query works without crossing slots"""
+    await model_class.insert([model_class(**book.dict()) for book in books])
+    assert sorted(book.title for book in await model_class.select()) == sorted(book.title for book in books)
+    assert await model_class.select(ids=["Jane Eyre"]) == [model_class(**books[2].dict())]
+    assert await model_class.get("Oliver Twist") == model_class(**books[0].dict())
+    charles = await model_class.select(where={"author": "Charles Dickens", "in_stock": True})
+    assert [book.title for book in charles] == ["Great Expectations"]
+    ordered = await model_class.select(order_by="-published_on", max=date(1850, 1, 1))
+    assert [book.title for book in ordered] == ["Wuthering Heights", "Jane Eyre", "Oliver Twist"]
+    page, _ = await model_class.select_page(limit=2)
+    assert [book.title for book in page] == ["Great Expectations", "Jane Eyre"]
+    assert sorted([book.title async for book in model_class.iter_select(batch_size=1)]) == sorted(
+        book.title for book in books
+    )
+    assert await model_class.count() == 4
+    assert await model_class.count(where={"author": "Charles Dickens", "in_stock": False}) == 1
+    assert await model_class.exists(["Jane Eyre", "Dracula"]) == [True, False]
+
+
+async def test_writes(cluster_store):
+    """Saves and deletes work without crossing slots or using transactions"""
+    await Book.insert(books)
+    book = await Book.get("Oliver Twist")
+    book.series = "Dickens"
+    await book.save()
+    assert (await Book.get("Oliver Twist")).series == "Dickens"
+    book.author = "Someone Else"
+    await book.save()
+    assert [found.title for found in await Book.select(where={"author": "Someone Else"})] == ["Oliver Twist"]
+    await Book.delete(ids=["Oliver Twist", "Jane Eyre"])
+    assert await Book.count() == 2
+    assert await Book.count(where={"in_stock": False}) == 0
+    assert await Book.exists("Oliver Twist") is False
+
+
+async def test_key_layout(cluster_store):
+    """Tables are in one slot with table hash tags, rows are spread over slots with record hash tags"""
+    await Book.insert(books)
+    keys = await cluster_store.redis_store.keys("*")
+    row_slots = {key_slot(f"book:{{{book.title}}}".encode()) for book in books}
+    if cluster_store.hash_tags == "table":
+        assert {key_slot(key.encode()) for key in keys} == {key_slot(b"book")}
+        assert "{book}:Oliver Twist" in keys
+        assert Book.get_table_index_keys() == ["{book}:__index"]
+    else:
+        assert "book:{Oliver Twist}" in keys
+        assert {key_slot(key.encode()) for key in keys if key.startswith("book:{")} == row_slots
+        assert Book.get_table_index_keys() == [f"book:__index:{shard}" for shard in range(4)]
+        assert sum([await cluster_store.redis_store.scard(key) for key in Book.get_table_index_keys()]) == 4
+
+
+async def test_client_tracking_needs_invalidations(cluster_store):
+    """A cluster store can't track keys by itself"""
+    with pytest.raises(ValueError, match="invalidations"):
+        await cluster_store.start_client_tracking()
+
+
+@pytest.mark.parametrize(
+    "arguments, message",
+    [
+        ({"hash_tags": "slot"}, "hash_tags"),
+        ({"hash_tags": "record", "index_shards": 0}, "index_shards"),
+        ({"hash_tags": "table", "index_shards": 4}, "index_shards"),
+        ({"redis_config": RedisConfig(db=1)}, "db 0"),
+    ],
+)
+def test_bad_arguments(arguments, message):
+    """Bad cluster settings are caught when the store is made"""
+    with pytest.raises(ValueError, match=message):
+        ClusterStore(**{"name": "sample", "redis_config": RedisConfig(), **arguments})
+
+
+def test_connects_to_a_cluster():
+    """Cluster stores use the cluster client"""
+    store = ClusterStore(name="sample", redis_config=RedisConfig(port=7000, decode_responses=False))
+    assert type(store.redis_store).__name__ == "RedisCluster"
+    assert store.decode_responses is False
+    assert store.index_shards == 1
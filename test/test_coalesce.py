@@ -0,0 +1,160 @@
+"""Tests for coalescing concurrent writes to the same rows"""
+
+import asyncio
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _indexes = ["author"]
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+    copies: int = 0
+
+
+class Author(Model):
+    _primary_key_field: str = "name"
+    name: str
+    born_on: date
+
+
+@pytest_asyncio.fixture(params=[0, 0.01])
+async def redis_store(request):
+    """Sets up a redis store that coalesces writes and adds the book model to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+        coalesce_window=request.param,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(Author)
+    yield store
+    await store.redis_store.flushall()
+
+
+def new_book(**data) -> Book:
+    return Book(**{"title": "Oliver Twist", "author": "Charles Dickens", "published_on": date(1215, 4, 4), **data})
+
+
+@pytest.fixture()
+def writes(monkeypatch):
+    """Records the rows written by each coalesced write"""
+    writes = []
+    write_coalesced = Book._write_coalesced
+
+    async def recording_write_coalesced(rows):
+        writes.append(rows)
+        await write_coalesced(rows)
+
+    monkeypatch.setattr(Book, "_write_coalesced", recording_write_coalesced)
+    return writes
+
+
+async def test_concurrent_saves_are_merged(redis_store, writes):
+    """Saves of the same row in the window are written once, with every change"""
+    await Book.insert(new_book())
+    first, second = (await Book.select(ids=["Oliver Twist"])) * 2
+    second = second.copy()
+    writes.clear()
+
+    async def save(instance, **changes):
+        for field, value in changes.items():
+            setattr(instance, field, value)
+        await instance.save()
+
+    await asyncio.gather(save(first, copies=3), save(second, in_stock=False), save(first, copies=4))
+    assert len(writes) == 1
+    assert len(writes[0]) == 1
+    stored = await redis_store.redis_store.hgetall("book:Oliver Twist")
+    assert stored["copies"] == "4"
+    assert stored["in_stock"] == "false"
+    assert first._dirty_fields == set()
+    assert second._dirty_fields == set()
+
+
+async def test_concurrent_inserts_are_merged(redis_store, writes):
+    """Inserts of the same row in the window write the last one"""
+    books = [new_book(copies=copies) for copies in range(5)] + [new_book(title="Jane Eyre")]
+    responses = await asyncio.gather(*(Book.insert(book) for book in books))
+    assert responses == [None] * len(books)
+    assert len(writes) == 1
+    result = await Book.select()
+    assert sorted(result, key=lambda book: book.title) == [books[-1], books[-2]]
+
+
+async def test_inserts_with_arguments_are_not_coalesced(redis_store, writes):
+    """Inserts given a transaction, chunk_size or life_span_seconds are written on their own"""
+    responses = await asyncio.gather(
+        Book.insert(new_book(), transaction=False),
+        Book.insert(new_book(title="Jane Eyre"), chunk_size=10),
+        Book.insert(new_book(title="Emma"), life_span_seconds=60),
+    )
+    assert writes == []
+    assert all(isinstance(response, list) for response in responses)
+    assert len(await Book.select()) == 3
+
+
+async def test_changes_after_insert(redis_store):
+    """Changed fields saved after an insert of the same row in the window are kept"""
+    await Book.insert(new_book())
+    selected = (await Book.select(ids=["Oliver Twist"]))[0]
+    selected.copies = 7
+    await asyncio.gather(Book.insert(new_book(author="Charlotte Bronte")), selected.save())
+    result = (await Book.select(ids=["Oliver Twist"]))[0]
+    assert result.copies == 7
+    assert result.author == "Charlotte Bronte"
+    assert await Book.select(where={"author": "Charlotte Bronte"}) == [result]
+
+
+async def test_saves_of_deleted_rows(redis_store):
+    """Changed fields of rows that no longer exist are written as whole rows"""
+    await Book.insert(new_book())
+    selected = (await Book.select(ids=["Oliver Twist"]))[0]
+    await Book.delete(ids=["Oliver Twist"])
+    selected.copies = 2
+    await selected.save()
+    assert await Book.select(ids=["Oliver Twist"]) == [selected]
+
+
+async def test_errors_reach_every_caller(redis_store, monkeypatch):
+    """Every caller in the window gets the error of a failed write"""
+
+    async def failing_write_coalesced(rows):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(Book, "_write_coalesced", failing_write_coalesced)
+    results = await asyncio.gather(
+        Book.insert(new_book()), Book.insert(new_book(title="Jane Eyre")), return_exceptions=True
+    )
+    assert [str(result) for result in results] == ["redis went away"] * 2
+
+
+async def test_errors_reach_only_callers_of_the_failed_model(redis_store, monkeypatch):
+    """A failed write of one model doesn't stop the writes of the other models in the window"""
+
+    async def failing_write_coalesced(rows):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(Book, "_write_coalesced", failing_write_coalesced)
+    author = Author(name="Charles Dickens", born_on=date(1812, 2, 7))
+    results = await asyncio.gather(Book.insert(new_book()), Author.insert(author), return_exceptions=True)
+    assert str(results[0]) == "redis went away"
+    assert results[1] is None
+    assert await Author.select() == [author]
+
+
+def test_negative_coalesce_window():
+    """The coalesce window can't be negative"""
+    with pytest.raises(ValueError, match=r"coalesce_window"):
+        Store(name="sample", redis_config=RedisConfig(), coalesce_window=-1)
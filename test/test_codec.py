@@ -0,0 +1,196 @@
+"""Tests for the serialization plans and json backends in codec.py"""
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from decimal import Decimal
+from enum import Enum
+from ipaddress import IPv4Address
+from ipaddress import IPv4Network
+from ipaddress import IPv6Address
+from ipaddress import IPv6Network
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis.codec import build_json_codecs
+from pydantic_aioredis.codec import build_msgpack_codecs
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+
+class Color(str, Enum):
+    red = "red"
+    blue = "blue"
+
+
+class EveryType(Model):
+    _primary_key_field: str = "key"
+    key: str
+    number: int
+    flag: bool
+    day: date
+    moment: datetime
+    uuid: UUID
+    network: IPv4Network
+    color: Color
+    tags: List[str]
+    days: List[date]
+    counts: Dict[int, int]
+    nested: Dict[str, List[float]]
+    optional: Optional[List[str]]
+
+
+def every_type():
+    return EveryType(
+        key="key",
+        number=3,
+        flag=True,
+        day=date(2020, 1, 2),
+        moment=datetime(2020, 1, 2, 3, 4, 5, 6),
+        uuid=uuid4(),
+        network=IPv4Network("10.0.0.0/24"),
+        color=Color.blue,
+        tags=["a/b", "ü"],
+        days=[date(2020, 1, 2)],
+        counts={1: 2},
+        nested={"a": [1.5, 2.0]},
+        optional=None,
+    )
+
+
+@pytest_asyncio.fixture(params=["json", "orjson", "ujson"])
+async def redis_store(request):
+    """Sets up a redis store using each of the json backends"""
+    pytest.importorskip(request.param)
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+        json_backend=request.param,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    yield store
+    await store.redis_store.flushall()
+
+
+async def test_json_backend_round_trip(redis_store):
+    """Every json backend reads back what it stored"""
+    redis_store.register_model(EveryType)
+    instance = every_type()
+    await EveryType.insert(instance)
+    assert (await EveryType.select())[0] == instance
+
+
+async def test_json_backend_hooks(redis_store):
+    """json_default and json_object_hook overrides are used by every json backend"""
+
+    class Point:
+        def __init__(self, x: int, y: int):
+            self.x = x
+            self.y = y
+
+        def __eq__(self, other):
+            return (self.x, self.y) == (other.x, other.y)
+
+    class HookModel(Model):
+        _primary_key_field: str = "key"
+        key: str
+        points: List[Any]
+        moment: datetime
+
+        @classmethod
+        def json_default(cls, obj: Any) -> Any:
+            if isinstance(obj, Point):
+                return {"x": obj.x, "y": obj.y}
+            if isinstance(obj, datetime):
+                return obj.strftime("%Y/%m/%d")
+            return super().json_default(obj)
+
+        @classmethod
+        def json_object_hook(cls, obj: dict):
+            if set(obj.keys()) == {"x", "y"}:
+                return Point(**obj)
+            return obj
+
+    redis_store.register_model(HookModel)
+    instance = HookModel(key="key", points=[Point(1, 2)], moment=datetime(2020, 1, 2))
+    await HookModel.insert(instance)
+    stored = await redis_store.redis_store.hget("hookmodel:key", "moment")
+    assert stored == '"2020/01/02"'
+    from_redis = await HookModel.select(columns=["points"])
+    assert from_redis[0]["points"] == [Point(1, 2)]
+
+
+async def test_model_json_backend_overrides_store(redis_store):
+    """A model's _json_backend wins over the store's json_backend"""
+
+    class StdlibModel(Model):
+        _primary_key_field: str = "key"
+        _json_backend = "json"
+        key: str
+        tags: Dict[str, int]
+
+    redis_store.register_model(StdlibModel)
+    await StdlibModel.insert(StdlibModel(key="key", tags={"a": 1}))
+    # only the standard library puts a space after the colon
+    assert await redis_store.redis_store.hget("stdlibmodel:key", "tags") == '{"a": 1}'
+
+
+def test_unknown_json_backend():
+    """Unknown json backends are refused"""
+    with pytest.raises(ValueError, match=r"Unknown json backend"):
+        build_json_codecs("notjson", default=str)
+    with pytest.raises(ValueError, match=r"Unknown json backend"):
+        Store(name="sample", redis_config=RedisConfig(), json_backend="notjson")
+
+
+def test_missing_json_backend(mocker):
+    """Backends that are not installed raise an ImportError explaining what to install"""
+    mocker.patch("pydantic_aioredis.codec.import_module", side_effect=ImportError)
+    with pytest.raises(ImportError, match=r"pip install orjson"):
+        build_json_codecs("orjson", default=str)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        date(2020, 1, 2),
+        datetime(2020, 1, 2, 3, 4, 5, 6),
+        datetime(1900, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+        uuid4(),
+        IPv4Address("10.0.0.1"),
+        IPv6Address("::1"),
+        IPv4Network("10.0.0.0/24"),
+        IPv6Network("2001:db8::/32"),
+        Decimal("1.10"),
+        [date(2020, 1, 2), {"a": uuid4()}],
+    ],
+)
+def test_msgpack_extension_types(value):
+    """Types msgpack doesn't know about are packed as extension types and unpacked to the same value"""
+    pytest.importorskip("msgpack")
+    packb, unpackb = build_msgpack_codecs(default=EveryType.json_default)
+    unpacked = unpackb(packb(value))
+    assert unpacked == value
+    assert type(unpacked) is type(value)
+    if isinstance(value, datetime):
+        assert unpacked.utcoffset() == value.utcoffset()
+
+
+def test_msgpack_fallbacks():
+    """Enums and sets are packed as their values, other types go to default"""
+    pytest.importorskip("msgpack")
+    packb, unpackb = build_msgpack_codecs(default=EveryType.json_default)
+    assert unpackb(packb(Color.red)) == "red"
+    assert unpackb(packb({1})) == [1]
+    with pytest.raises(TypeError):
+        packb(object())
@@ -0,0 +1,197 @@
+"""Tests for compressing large values"""
+
+from typing import List
+from typing import Optional
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis.codec import build_compression_codecs
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+LONG_TEXT = "It was the best of times, it was the worst of times. " * 100
+
+
+class Article(Model):
+    _primary_key_field: str = "slug"
+    _compression = "zlib"
+    _compressed_fields = ["body", "tags"]
+    _indexes = ["tags"]
+    slug: str
+    body: str
+    tags: List[str] = []
+    summary: Optional[str] = None
+    views: int = 0
+
+
+class BlobArticle(Article):
+    _storage = "blob"
+
+
+class Lz4Article(Article):
+    _compression = "lz4"
+
+
+class MsgpackArticle(Article):
+    _codec = "msgpack"
+
+
+articles = [
+    dict(slug="long", body=LONG_TEXT, tags=["tale"] * 500, summary="\x1fnot compressed", views=3),
+    dict(slug="short", body="short", tags=["tale"]),
+]
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    yield store
+    await store.redis_store.flushall()
+
+
+@pytest_asyncio.fixture()
+async def binary_redis_store():
+    """Sets up a redis store that does not decode responses"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1, decode_responses=False),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=False)
+    yield store
+    await store.redis_store.flushall()
+
+
+@pytest.mark.parametrize("binary", [False, True])
+@pytest.mark.parametrize("compression", ["zlib", "lz4"])
+def test_compression_codecs(compression, binary):
+    """Long values are compressed, short and incompressible values are stored as they are"""
+    pytest.importorskip(compression)
+    compress, decompress = build_compression_codecs(compression, threshold=64, binary=binary)
+    long_value, short_value, marked_value = LONG_TEXT, "short", "\x1fshort"
+    random_value = "".join(chr(ord("a") + (i * 7919 % 26)) + str(i * 104729) for i in range(20))
+    if binary:
+        long_value, short_value, marked_value = long_value.encode(), short_value.encode(), marked_value.encode()
+        random_value = random_value.encode()
+
+    compressed = compress(long_value)
+    assert len(compressed) < len(long_value)
+    assert decompress(compressed) == long_value
+    assert compress(short_value) is short_value
+    assert decompress(short_value) is short_value
+    # values that start with the marker are always compressed, so they are never mistaken for compressed values
+    assert compress(marked_value) != marked_value
+    assert decompress(compress(marked_value)) == marked_value
+    assert decompress(compress(random_value)) == random_value
+
+
+def test_compression_codecs_unknown():
+    """Only known compressions can be used"""
+    with pytest.raises(ValueError, match=r"Unknown compression"):
+        build_compression_codecs("zip", threshold=64, binary=False)
+
+
+def test_compression_codecs_read_other_algorithms():
+    """Values compressed with one algorithm can be read after switching to another"""
+    pytest.importorskip("lz4")
+    zlib_compress, _ = build_compression_codecs("zlib", threshold=64, binary=False)
+    _, lz4_decompress = build_compression_codecs("lz4", threshold=64, binary=False)
+    assert lz4_decompress(zlib_compress(LONG_TEXT)) == LONG_TEXT
+
+
+@pytest.mark.parametrize("model_class", [Article, BlobArticle, Lz4Article])
+async def test_compressed_model(redis_store, model_class):
+    """Compressed models round trip and take less memory"""
+    pytest.importorskip(model_class._compression)
+    redis_store.register_model(model_class)
+    instances = [model_class(**article) for article in articles]
+    await model_class.insert(instances)
+
+    result = await model_class.select()
+    assert sorted(result, key=lambda article: article.slug) == instances
+    result = await model_class.select(columns=["body", "summary"], ids=["long"])
+    assert result == [{"body": LONG_TEXT, "summary": "\x1fnot compressed"}]
+    result = await model_class.select(where={"tags": ["tale"]})
+    assert [article.slug for article in result] == ["short"]
+
+    key = f"{model_class._get_tablename()}:long"
+    if model_class._storage == "blob":
+        stored = await redis_store.redis_store.get(key)
+        assert stored.startswith("\x1f")
+    else:
+        stored = await redis_store.redis_store.hgetall(key)
+        assert stored["body"].startswith("\x1f")
+        assert len(stored["body"]) < len(LONG_TEXT)
+        assert stored["views"] == "3"
+        short = await redis_store.redis_store.hgetall(f"{model_class._get_tablename()}:short")
+        assert short["body"] == "short"
+
+
+@pytest.mark.parametrize("model_class", [Article, Lz4Article])
+async def test_compressed_indexed_fields(redis_store, model_class):
+    """Index entries of compressed indexed fields are removed when the field changes or the row is deleted"""
+    pytest.importorskip(model_class._compression)
+    redis_store.register_model(model_class)
+    await model_class.insert(model_class(**articles[0]))
+    table = model_class._get_tablename()
+    assert (await redis_store.redis_store.hget(f"{table}:long", "tags")).startswith("\x1f")
+
+    instance = (await model_class.select(ids=["long"]))[0]
+    instance.tags = ["other"]
+    await instance.save()
+    assert await model_class.select(where={"tags": articles[0]["tags"]}) is None
+    assert await model_class.select(where={"tags": ["other"]}) == [instance]
+
+    instance.tags = articles[0]["tags"]
+    await instance.save()
+    await model_class.delete(ids=["long"])
+    assert await redis_store.redis_store.keys(f"{table}:__index:*") == []
+
+
+async def test_compressed_msgpack_model(binary_redis_store):
+    """Packed values are compressed too"""
+    pytest.importorskip("msgpack")
+    binary_redis_store.register_model(MsgpackArticle)
+    instances = [MsgpackArticle(**article) for article in articles]
+    await MsgpackArticle.insert(instances)
+
+    result = await MsgpackArticle.select()
+    assert sorted(result, key=lambda article: article.slug) == instances
+    stored = await binary_redis_store.redis_store.hget("msgpackarticle:long", "body")
+    assert stored.startswith(b"\x1fz")
+
+
+async def test_compression_can_be_turned_on(redis_store):
+    """Rows saved before compression was turned on can still be read"""
+
+    class Plain(Article):
+        _compression = None
+        _table_name = "article"
+
+    redis_store.register_model(Plain)
+    await Plain.insert(Plain(**articles[0]))
+    redis_store.register_model(Article)
+    result = await Article.select()
+    assert result == [Article(**articles[0])]
+
+
+@pytest.mark.parametrize(
+    "attributes, message",
+    [
+        ({"_compression": "zip"}, r"unknown _compression"),
+        ({"_compressed_fields": ["title"]}, r"can not compress title"),
+    ],
+)
+def test_register_compressed_model_errors(redis_store, attributes, message):
+    """Bad compression settings are caught when the model is registered"""
+    model_class = type("BadArticle", (Article,), attributes)
+    with pytest.raises(ValueError, match=message):
+        redis_store.register_model(model_class)
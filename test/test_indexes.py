@@ -0,0 +1,303 @@
+"""Tests for secondary and sorted indexes"""
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import List
+from typing import Optional
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic import ValidationError
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+from pydantic_aioredis.utils import to_score
+from redis.exceptions import ResponseError
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _indexes = ["author", "in_stock", "published_on", "series"]
+    _sorted_indexes = ["published_on", "rating"]
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+    series: Optional[str]
+    rating: Optional[float]
+
+
+books = [
+    Book(
+        title="Oliver Twist",
+        author="Charles Dickens",
+        published_on=date(year=1215, month=4, day=4),
+        in_stock=False,
+        rating=4.5,
+    ),
+    Book(
+        title="Great Expectations",
+        author="Charles Dickens",
+        published_on=date(year=1220, month=4, day=4),
+        rating=3,
+    ),
+    Book(
+        title="Jane Eyre",
+        author="Charles Dickens",
+        published_on=date(year=1225, month=6, day=4),
+        in_stock=False,
+        rating=5,
+    ),
+    Book(
+        title="Wuthering Heights",
+        author="Jane Austen",
+        published_on=date(year=1600, month=4, day=4),
+        series="Brontes",
+    ),
+]
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store and adds the book model to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    await Book.insert([book.copy() for book in books])
+    yield store
+    await store.redis_store.flushall()
+
+
+def titles(result):
+    return sorted(book.title for book in result)
+
+
+def test_register_model_with_bad_index(redis_store):
+    """Indexes have to be fields of the model"""
+
+    class BadIndexModel(Model):
+        _primary_key_field = "name"
+        _indexes = ["not_a_field"]
+        name: str
+
+    with pytest.raises(ValueError, match=r"not_a_field"):
+        redis_store.register_model(BadIndexModel)
+
+
+async def test_select_where(redis_store):
+    """where returns only the rows matching the indexed value"""
+    result = await Book.select(where={"author": "Charles Dickens"})
+    assert titles(result) == ["Great Expectations", "Jane Eyre", "Oliver Twist"]
+
+
+async def test_select_where_multiple_fields(redis_store):
+    """where with more than one field intersects the indexes"""
+    result = await Book.select(where={"author": "Charles Dickens", "in_stock": False})
+    assert titles(result) == ["Jane Eyre", "Oliver Twist"]
+
+
+async def test_select_where_coerces_values(redis_store):
+    """where values are validated like the fields they query"""
+    assert titles(await Book.select(where={"in_stock": "true"})) == ["Great Expectations", "Wuthering Heights"]
+    assert titles(await Book.select(where={"published_on": "1600-04-04"})) == ["Wuthering Heights"]
+    assert titles(await Book.select(where={"series": None})) == ["Great Expectations", "Jane Eyre", "Oliver Twist"]
+    with pytest.raises(ValidationError):
+        await Book.select(where={"published_on": "not a date"})
+
+
+async def test_select_where_with_ids_columns_and_pagination(redis_store):
+    """where works with the other select arguments"""
+    result = await Book.select(where={"author": "Charles Dickens"}, ids=["Jane Eyre", "Wuthering Heights"])
+    assert titles(result) == ["Jane Eyre"]
+
+    result = await Book.select(where={"author": "Charles Dickens"}, skip=1, limit=1)
+    assert titles(result) == ["Jane Eyre"]
+
+    result = await Book.select(where={"author": "Jane Austen"}, columns=["title"])
+    assert result == [{"title": "Wuthering Heights"}]
+
+
+async def test_select_where_no_match(redis_store):
+    """where without any matching rows returns None"""
+    assert await Book.select(where={"author": "Herman Melville"}) is None
+
+
+async def test_select_where_not_indexed(redis_store):
+    """Only indexed fields can be used in where"""
+    with pytest.raises(ValueError, match=r"not indexed"):
+        await Book.select(where={"title": "Jane Eyre"})
+
+
+async def test_index_follows_updates(redis_store):
+    """Saving a changed row moves it from the old value's index to the new one"""
+    book = (await Book.select(ids=["Jane Eyre"]))[0]
+    book.author = "Charlotte Bronte"
+    await book.save()
+
+    assert titles(await Book.select(where={"author": "Charles Dickens"})) == ["Great Expectations", "Oliver Twist"]
+    assert titles(await Book.select(where={"author": "Charlotte Bronte"})) == ["Jane Eyre"]
+
+
+async def test_index_follows_deletes(redis_store):
+    """Deleting rows removes them from the indexes"""
+    await Book.delete(ids=["Jane Eyre"])
+    assert titles(await Book.select(where={"author": "Charles Dickens"})) == ["Great Expectations", "Oliver Twist"]
+    assert (
+        await redis_store.redis_store.sismember(Book.get_field_index_key("author", "Charles Dickens"), "book:Jane Eyre")
+        == 0
+    )
+
+    await Book.delete()
+    assert await redis_store.redis_store.exists(Book.get_field_index_key("author", "Charles Dickens")) == 0
+
+
+async def test_index_skips_expired_rows(redis_store):
+    """Rows that expired while still in an index are not returned"""
+    await redis_store.redis_store.delete("book:Great Expectations")
+    assert titles(await Book.select(where={"author": "Charles Dickens"})) == ["Jane Eyre", "Oliver Twist"]
+
+
+def test_register_model_with_bad_sorted_index(redis_store):
+    """Sorted indexes have to be number, date or datetime fields of the model"""
+
+    class NotAFieldModel(Model):
+        _primary_key_field = "name"
+        _sorted_indexes = ["not_a_field"]
+        name: str
+
+    class NotSortableModel(Model):
+        _primary_key_field = "name"
+        _sorted_indexes = ["tags"]
+        name: str
+        tags: List[int]
+
+    with pytest.raises(ValueError, match=r"not a field"):
+        redis_store.register_model(NotAFieldModel)
+    with pytest.raises(ValueError, match=r"not a number"):
+        redis_store.register_model(NotSortableModel)
+
+
+def test_to_score():
+    """Dates and naive datetimes are scored as UTC timestamps"""
+    assert to_score(3) == 3.0
+    assert to_score(True) == 1.0
+    assert to_score(date(1970, 1, 2)) == 86400
+    assert to_score(datetime(1970, 1, 2)) == 86400
+    assert to_score(datetime(1970, 1, 2, 1, tzinfo=timezone(timedelta(hours=1)))) == 86400
+    with pytest.raises(TypeError):
+        to_score("3")
+
+
+async def test_select_order_by(redis_store):
+    """order_by returns the rows ordered by the sorted field"""
+    result = await Book.select(order_by="published_on")
+    assert [book.title for book in result] == [book.title for book in books]
+
+    result = await Book.select(order_by="-published_on")
+    assert [book.title for book in result] == [book.title for book in reversed(books)]
+
+
+async def test_select_order_by_range(redis_store):
+    """min and max limit the rows to an inclusive range of the sorted field"""
+    result = await Book.select(order_by="published_on", min=date(1220, 4, 4), max="1225-06-04")
+    assert [book.title for book in result] == ["Great Expectations", "Jane Eyre"]
+
+    result = await Book.select(order_by="-rating", min=4)
+    assert [book.title for book in result] == ["Jane Eyre", "Oliver Twist"]
+
+    assert await Book.select(order_by="rating", min=10) is None
+
+
+async def test_select_order_by_pagination(redis_store):
+    """skip and limit page through the ordered rows"""
+    result = await Book.select(order_by="published_on", skip=1, limit=2)
+    assert [book.title for book in result] == ["Great Expectations", "Jane Eyre"]
+
+    result = await Book.select(order_by="published_on", limit=1)
+    assert [book.title for book in result] == ["Oliver Twist"]
+
+    result = await Book.select(order_by="published_on", skip=3, columns=["title"])
+    assert result == [{"title": "Wuthering Heights"}]
+
+
+async def test_sorted_index_skips_none(redis_store):
+    """Rows where the sorted field is None are not in its sorted index"""
+    result = await Book.select(order_by="rating")
+    assert [book.title for book in result] == ["Great Expectations", "Oliver Twist", "Jane Eyre"]
+
+    book = (await Book.select(ids=["Jane Eyre"]))[0]
+    book.rating = None
+    await book.save()
+    result = await Book.select(order_by="rating")
+    assert [book.title for book in result] == ["Great Expectations", "Oliver Twist"]
+
+
+async def test_sorted_index_follows_updates_and_deletes(redis_store):
+    """Saving and deleting rows keeps the sorted index in sync"""
+    book = (await Book.select(ids=["Wuthering Heights"]))[0]
+    book.published_on = date(1100, 1, 1)
+    await book.save()
+    result = await Book.select(order_by="published_on", limit=1)
+    assert [book.title for book in result] == ["Wuthering Heights"]
+
+    await Book.delete(ids=["Wuthering Heights"])
+    result = await Book.select(order_by="published_on", limit=1)
+    assert [book.title for book in result] == ["Oliver Twist"]
+
+
+async def test_select_order_by_bad_arguments(redis_store):
+    """order_by needs a sorted field and can not be mixed with where or ids"""
+    with pytest.raises(ValueError, match=r"not sorted"):
+        await Book.select(order_by="author")
+    with pytest.raises(ValueError, match=r"can not be combined"):
+        await Book.select(order_by="rating", where={"author": "Jane Austen"})
+    with pytest.raises(ValueError, match=r"can not be combined"):
+        await Book.select(order_by="rating", ids=["Jane Eyre"])
+    with pytest.raises(ValueError, match=r"need an order_by"):
+        await Book.select(min=1)
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {},
+        {"where": {"author": "Charles Dickens"}},
+        {"where": {"author": "Charles Dickens", "in_stock": False}},
+        {"where": {"author": "Nobody"}},
+        {"order_by": "rating", "min": 4},
+        {"order_by": "-published_on", "max": date(year=1230, month=1, day=1)},
+        {"order_by": "rating"},
+    ],
+)
+async def test_count(redis_store, arguments):
+    """count matches the number of rows select returns with the same arguments"""
+    assert await Book.count(**arguments) == len(await Book.select(**arguments) or [])
+
+
+async def test_count_without_sintercard(redis_store, monkeypatch):
+    """Servers without SINTERCARD count the intersection client side"""
+
+    async def sintercard(*args, **kwargs):
+        raise ResponseError("unknown command 'SINTERCARD'")
+
+    monkeypatch.setattr(redis_store.redis_store, "sintercard", sintercard)
+    assert await Book.count(where={"author": "Charles Dickens", "in_stock": False}) == 2
+
+
+async def test_count_bad_arguments(redis_store):
+    """count takes the same arguments as select, with the same rules"""
+    with pytest.raises(ValueError, match=r"not indexed"):
+        await Book.count(where={"title": "Jane Eyre"})
+    with pytest.raises(ValueError, match=r"not sorted"):
+        await Book.count(order_by="author")
+    with pytest.raises(ValueError, match=r"can not be combined"):
+        await Book.count(order_by="rating", where={"author": "Jane Austen"})
+    with pytest.raises(ValueError, match=r"need an order_by"):
+        await Book.count(max=1)
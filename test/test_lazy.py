@@ -0,0 +1,137 @@
+"""Tests for lazy rows, which validate their fields when they are read"""
+
+from datetime import date
+from typing import List
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic import ValidationError
+from pydantic import root_validator
+from pydantic import validator
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.lazy import LazyRecord
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+validated = []
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _cache_size = 10
+    title: str
+    author: str
+    published_on: date
+    editions: List[str] = []
+    in_stock: bool = True
+
+    @validator("author")
+    def count_author_validations(cls, value):
+        validated.append(value)
+        return value
+
+    @root_validator
+    def no_unknown_authors(cls, values):
+        if values.get("author") == "Unknown":
+            raise ValueError("unknown author")
+        return values
+
+
+books = [
+    Book(title="Oliver Twist", author="Charles Dickens", published_on=date(1215, 4, 4), editions=["first"]),
+    Book(title="Jane Eyre", author="Charlotte Bronte", published_on=date(1847, 10, 16), in_stock=False),
+]
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store and adds the book model to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    await Book.insert(books)
+    validated.clear()
+    yield store
+    await store.redis_store.flushall()
+
+
+async def test_fields_are_validated_on_access(redis_store):
+    """Only the fields that are read are validated, once each"""
+    result = await Book.select(ids=["Oliver Twist"], lazy=True)
+    assert len(result) == 1
+    record = result[0]
+    assert isinstance(record, LazyRecord)
+    assert record.published_on == date(1215, 4, 4)
+    assert validated == []
+    assert record.author == "Charles Dickens"
+    assert record.author == "Charles Dickens"
+    assert validated == ["Charles Dickens"]
+    assert record.dict(include={"title", "editions"}) == {"title": "Oliver Twist", "editions": ["first"]}
+    assert record.dict(exclude={"author"}) == {
+        "title": "Oliver Twist",
+        "published_on": date(1215, 4, 4),
+        "editions": ["first"],
+        "in_stock": True,
+    }
+
+
+async def test_to_model(redis_store):
+    """to_model builds the whole model once, it can be changed and saved"""
+    record = (await Book.select(ids=["Jane Eyre"], lazy=True))[0]
+    assert record == books[1]
+    model = record.to_model()
+    assert model is record.to_model()
+    assert model._dirty_fields == set()
+    model.in_stock = True
+    await model.save()
+    assert (await Book.get("Jane Eyre")).in_stock is True
+
+
+async def test_lazy_rows_are_read_only(redis_store):
+    """Lazy rows can't be changed"""
+    record = (await Book.select(ids=["Jane Eyre"], lazy=True))[0]
+    with pytest.raises(TypeError, match="read only"):
+        record.in_stock = True
+    with pytest.raises(AttributeError):
+        record.not_a_field
+
+
+async def test_errors_are_raised_on_access(redis_store):
+    """Bad stored values raise when they are read, missing fields use their defaults"""
+    await redis_store.redis_store.hset("book:Oliver Twist", "published_on", '"not a date"')
+    await redis_store.redis_store.hset("book:Oliver Twist", "author", "Unknown")
+    await redis_store.redis_store.hdel("book:Oliver Twist", "editions")
+    record = (await Book.select(ids=["Oliver Twist"], lazy=True))[0]
+    assert record.author == "Unknown"
+    assert record.editions == []
+    assert record.raw["published_on"] == "not a date"
+    with pytest.raises(ValidationError):
+        record.published_on
+    with pytest.raises(ValidationError):
+        record.to_model()
+
+    await redis_store.redis_store.hdel("book:Oliver Twist", "title")
+    record = (await Book.select(ids=["Oliver Twist"], lazy=True))[0]
+    with pytest.raises(ValidationError):
+        record.title
+
+
+async def test_lazy_select_page_and_iter_select(redis_store):
+    """select_page and iter_select can return lazy rows too"""
+    page, _ = await Book.select_page(lazy=True)
+    assert [record.title for record in page] == ["Jane Eyre", "Oliver Twist"]
+    titles = [record.title async for record in Book.iter_select(lazy=True)]
+    assert sorted(titles) == ["Jane Eyre", "Oliver Twist"]
+    assert validated == []
+    assert Book.cache_info().misses == 0
+
+
+async def test_lazy_with_columns(redis_store):
+    """lazy and columns can't be used together"""
+    with pytest.raises(ValueError, match="lazy"):
+        await Book.select(columns=["title"], lazy=True)
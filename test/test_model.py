@@ -1,9 +1,13 @@
 """Test methods in model.py. Uses hypothesis"""
 
+import json
+from datetime import date
 from typing import Dict
 from typing import List
+from typing import Optional
 
 from fakeredis.aioredis import FakeRedis
+from pydantic import BaseModel
 from pydantic_aioredis.config import RedisConfig
 from pydantic_aioredis.model import Model
 from pydantic_aioredis.store import Store
@@ -150,3 +154,226 @@ async def test_storing_complex_dict(redis_store):
     assert len(instance_in_redis[0].value.keys()) == len(instance.value.keys())
     for key in instance_in_redis[0].value.keys():
         assert instance.value[key] == instance_in_redis[0].value[key]
+
+
+class ContainerModel(Model):
+    _primary_key_field: str = "key"
+
+    key: str
+    dates: List[date]
+    nested: Dict[str, List[int]]
+    maybe: Optional[List[date]]
+
+
+async def test_containers_are_encoded_once(redis_store):
+    """Containers of complex data types are json dumped a single time"""
+    redis_store.register_model(ContainerModel)
+    instance = ContainerModel(key="once", dates=[date(2020, 1, 1)], nested={"a": [1, 2]}, maybe=None)
+    await instance.save()
+
+    stored = await redis_store.redis_store.hgetall("containermodel:once")
+    assert stored["dates"] == '["2020-01-01"]'
+    assert stored["nested"] == '{"a": [1, 2]}'
+    assert stored["maybe"] == "null"
+    assert (await ContainerModel.select(ids=["once"]))[0] == instance
+
+
+async def test_reads_double_encoded_containers(redis_store):
+    """Values stored by versions that json dumped containers twice can still be read"""
+    redis_store.register_model(ContainerModel)
+    await redis_store.redis_store.hset(
+        "containermodel:legacy",
+        mapping={
+            "key": "legacy",
+            "dates": json.dumps(json.dumps(["2020-01-01"])),
+            "nested": json.dumps(json.dumps({"a": [1, 2]})),
+            "maybe": json.dumps(json.dumps(None)),
+        },
+    )
+    await redis_store.redis_store.sadd(ContainerModel.get_table_index_key(), "containermodel:legacy")
+
+    from_redis = await ContainerModel.select(ids=["legacy"])
+    assert from_redis[0] == ContainerModel(key="legacy", dates=[date(2020, 1, 1)], nested={"a": [1, 2]}, maybe=None)
+
+
+class DirtyModel(Model):
+    _primary_key_field: str = "key"
+    _indexes = ["status"]
+    key: str
+    status: str
+    quantity: int = 0
+    note: Optional[str] = None
+
+
+async def test_save_writes_changed_fields(redis_store):
+    """Rows that were selected only write the fields that changed"""
+    redis_store.register_model(DirtyModel)
+    await DirtyModel.insert(DirtyModel(key="changed", status="new", note="first"))
+    instance = (await DirtyModel.select(ids=["changed"]))[0]
+    # change a field behind the instance's back, a full save would overwrite it
+    await redis_store.redis_store.hset("dirtymodel:changed", "note", "changed elsewhere")
+
+    instance.quantity = 3
+    await instance.save()
+    stored = await redis_store.redis_store.hgetall("dirtymodel:changed")
+    assert stored["quantity"] == "3"
+    assert stored["note"] == "changed elsewhere"
+    assert await redis_store.redis_store.ttl("dirtymodel:changed") > 0
+
+    # saving again without changes writes nothing
+    await redis_store.redis_store.hset("dirtymodel:changed", "quantity", "4")
+    await instance.save()
+    assert await redis_store.redis_store.hget("dirtymodel:changed", "quantity") == "4"
+
+
+async def test_save_writes_fields_updated_by_copy(redis_store):
+    """Fields given to copy(update=...) are saved like fields that were set"""
+    redis_store.register_model(DirtyModel)
+    await DirtyModel.insert(DirtyModel(key="copied", status="new"))
+    selected = (await DirtyModel.select(ids=["copied"]))[0]
+    updated = selected.copy(update={"quantity": 5, "note": "updated"})
+    assert selected._dirty_fields == set()
+    await updated.save()
+    assert (await DirtyModel.select(ids=["copied"]))[0] == updated
+
+
+class RankedModel(Model):
+    _primary_key_field: str = "key"
+    _indexes = ["status"]
+    _sorted_indexes = ["rank"]
+    key: str
+    status: str
+    rank: int
+    note: Optional[str] = None
+
+
+async def test_save_changed_fields_refreshes_index_expiry(redis_store):
+    """The indexes a row is in get the same expiry as the row when its changed fields are saved"""
+    redis_store.register_model(RankedModel)
+    await RankedModel.insert(RankedModel(key="ranked", status="new", rank=1))
+    instance = (await RankedModel.select(ids=["ranked"]))[0]
+    index_keys = ["rankedmodel:__index:status:new", "rankedmodel:__sorted_index:rank"]
+    for key in index_keys:
+        await redis_store.redis_store.expire(key, 5)
+    instance.note = "changed"
+    await instance.save()
+    for key in ["rankedmodel:ranked", *index_keys]:
+        assert await redis_store.redis_store.ttl(key) > 3000
+    assert await RankedModel.select(where={"status": "new"}) == [instance]
+
+
+async def test_insert_rereads_rows_written_concurrently(redis_store, monkeypatch):
+    """A row written by another client while insert reads its indexed values is not left in the index of either"""
+    redis_store.register_model(RankedModel)
+    await RankedModel.insert(RankedModel(key="raced", status="new", rank=1))
+    get_indexed_values = RankedModel._get_indexed_values
+    raced = []
+
+    async def racing_get_indexed_values(keys):
+        values = await get_indexed_values(keys)
+        if len(raced) == 0:
+            raced.append(keys)
+            await RankedModel.insert(RankedModel(key="raced", status="racing", rank=2))
+        return values
+
+    monkeypatch.setattr(RankedModel, "_get_indexed_values", racing_get_indexed_values)
+    instance = RankedModel(key="raced", status="done", rank=3)
+    await RankedModel.insert(instance)
+    assert len(raced) == 1
+    assert await RankedModel.select(where={"status": "done"}) == [instance]
+    assert await RankedModel.select(where={"status": "racing"}) is None
+    assert await RankedModel.select(where={"status": "new"}) is None
+
+
+async def test_rebuild_indexes(redis_store):
+    """Rows written before the model had its indexes are added to them"""
+    redis_store.register_model(RankedModel)
+    rows = [RankedModel(key=f"row {rank}", status="new" if rank % 2 else "old", rank=rank) for rank in range(5)]
+    await RankedModel.insert(rows)
+    # like rows written before the indexes existed, and a row that has since expired
+    for key in await redis_store.redis_store.keys("rankedmodel:__*index:*"):
+        await redis_store.redis_store.delete(key)
+    await redis_store.redis_store.delete(RankedModel.get_table_sorted_index_key())
+    await redis_store.redis_store.sadd(RankedModel.get_table_index_key(), "rankedmodel:expired")
+    assert await RankedModel.select_page(limit=10) == ([], None)
+    assert await RankedModel.select(where={"status": "new"}) is None
+
+    assert await RankedModel.rebuild_indexes(batch_size=2) == 5
+    assert await RankedModel.select_page(limit=10) == (rows, None)
+    assert await RankedModel.select(where={"status": "new"}) == [rows[1], rows[3]]
+    assert await RankedModel.select(order_by="-rank", limit=2) == [rows[4], rows[3]]
+    for key in ["rankedmodel:__index:status:old", "rankedmodel:__sorted_index:rank", "rankedmodel:__sorted_index"]:
+        assert await redis_store.redis_store.ttl(key) > 3000
+
+
+async def test_save_writes_whole_row(redis_store):
+    """New rows, rows that disappeared and changes to indexed fields write the whole row"""
+    redis_store.register_model(DirtyModel)
+    instance = DirtyModel(key="whole", status="new")
+    instance.quantity = 1
+    await instance.save()
+    assert (await DirtyModel.select(ids=["whole"]))[0] == instance
+
+    await DirtyModel.delete(ids=["whole"])
+    instance.quantity = 2
+    await instance.save()
+    assert (await DirtyModel.select(ids=["whole"]))[0] == instance
+
+    instance.status = "done"
+    await instance.save()
+    assert await DirtyModel.select(where={"status": "new"}) is None
+    assert await DirtyModel.select(where={"status": "done"}) == [instance]
+
+
+class Author(BaseModel):
+    name: str
+    born: Optional[int] = None
+
+
+class MutableModel(Model):
+    _primary_key_field: str = "key"
+    key: str
+    tags: List[str] = []
+    counts: Dict[str, int] = {}
+    author: Optional[Author] = None
+    note: str = ""
+
+
+async def test_save_writes_changes_made_in_place(redis_store):
+    """Lists, dicts and nested models changed without setting the field are saved"""
+    redis_store.register_model(MutableModel)
+    await MutableModel.insert(MutableModel(key="in place", author=Author(name="Charles")))
+    instance = (await MutableModel.select(ids=["in place"]))[0]
+    instance.tags.append("new")
+    instance.counts["views"] = 1
+    instance.author.born = 1812
+    await instance.save()
+    assert (await MutableModel.select(ids=["in place"]))[0] == MutableModel(
+        key="in place", tags=["new"], counts={"views": 1}, author=Author(name="Charles", born=1812)
+    )
+
+    # fields that can't change in place are still only written when they are set
+    await redis_store.redis_store.hset("mutablemodel:in place", "note", "changed elsewhere")
+    instance.tags.append("newer")
+    await instance.save()
+    stored = await redis_store.redis_store.hgetall("mutablemodel:in place")
+    assert stored["note"] == "changed elsewhere"
+    assert json.loads(stored["tags"]) == ["new", "newer"]
+
+
+async def test_update_cm_writes_changed_fields(redis_store):
+    """update() saves the fields changed in it once at the end"""
+    redis_store.register_model(DirtyModel)
+    await DirtyModel.insert(DirtyModel(key="update", status="new"))
+    instance = (await DirtyModel.select(ids=["update"]))[0]
+    copy = instance.copy()
+    async with instance.update():
+        instance.quantity = 5
+        instance.note = "updated"
+    assert await redis_store.redis_store.hgetall("dirtymodel:update") == {
+        "key": "update",
+        "status": "new",
+        "quantity": "5",
+        "note": "updated",
+    }
+    assert copy._dirty_fields == set()
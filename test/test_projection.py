@@ -0,0 +1,107 @@
+"""Tests for selecting columns as typed projection models"""
+
+from datetime import date
+from typing import List
+from typing import Optional
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic import BaseModel
+from pydantic import ValidationError
+from pydantic import root_validator
+from pydantic import validator
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    title: str
+    author: str
+    published_on: date
+    editions: List[str] = []
+    rating: Optional[int] = None
+
+    @validator("author")
+    def strip_author(cls, value):
+        return value.strip()
+
+    @root_validator
+    def needs_every_field(cls, values):
+        assert "published_on" in values
+        return values
+
+
+class TrustedBook(Book):
+    _trusted_reads = True
+
+
+books = [
+    Book(title="Oliver Twist", author="Charles Dickens", published_on=date(1215, 4, 4), editions=["first"]),
+    Book(title="Jane Eyre", author="Charlotte Bronte", published_on=date(1847, 10, 16), rating=5),
+]
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store and adds the book models to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(TrustedBook)
+    await Book.insert(books)
+    await TrustedBook.insert([TrustedBook(**book.dict()) for book in books])
+    yield store
+    await store.redis_store.flushall()
+
+
+@pytest.mark.parametrize("model_class", [Book, TrustedBook])
+async def test_typed_columns(redis_store, model_class):
+    """Typed selects return projection models with the selected fields"""
+    result = await model_class.select(columns=["title", "published_on", "editions"], ids=["Oliver Twist"], typed=True)
+    projection = model_class.get_projection_model(["title", "published_on", "editions"])
+    assert result == [projection(title="Oliver Twist", published_on=date(1215, 4, 4), editions=["first"])]
+    assert type(result[0]) is projection
+    assert isinstance(result[0], BaseModel)
+    assert not isinstance(result[0], Model)
+    assert type(result[0].published_on) is date
+
+    page, _ = await model_class.select_page(columns=["title", "rating"], typed=True)
+    assert [(book.title, book.rating) for book in page] == [("Jane Eyre", 5), ("Oliver Twist", None)]
+    iterated = [book async for book in model_class.iter_select(columns=["rating"], typed=True)]
+    assert sorted(book.rating or 0 for book in iterated) == [0, 5]
+
+
+async def test_projection_models_are_cached(redis_store):
+    """Each list of columns has one projection model, with the fields' types, defaults and validators"""
+    projection = Book.get_projection_model(["author", "editions"])
+    assert Book.get_projection_model(["author", "editions"]) is projection
+    assert Book.get_projection_model(["editions", "author"]) is not projection
+    assert list(projection.__fields__) == ["author", "editions"]
+    assert projection(author=" Charles Dickens ").dict() == {"author": "Charles Dickens", "editions": []}
+    with pytest.raises(ValidationError):
+        projection(editions=["first"])
+    with pytest.raises(ValueError, match="not a field"):
+        Book.get_projection_model(["title", "isbn"])
+
+
+async def test_missing_columns(redis_store):
+    """Columns a row doesn't have get their defaults, or fail if they are required"""
+    await redis_store.redis_store.hdel("book:Oliver Twist", "editions")
+    result = await Book.select(columns=["title", "editions"], ids=["Oliver Twist"], typed=True)
+    assert result[0].editions == []
+    await redis_store.redis_store.hdel("book:Oliver Twist", "author")
+    with pytest.raises(ValidationError):
+        await Book.select(columns=["title", "author"], ids=["Oliver Twist"], typed=True)
+
+
+async def test_typed_needs_columns(redis_store):
+    """typed can only be used with columns"""
+    with pytest.raises(ValueError, match="typed needs columns"):
+        await Book.select(typed=True)
@@ -1,5 +1,6 @@
 """Tests for the redis orm"""
 
+import asyncio
 from datetime import date
 from enum import Enum
 from ipaddress import ip_network
@@ -253,6 +254,42 @@ async def test_bulk_insert(store, models, model_class, key_prefix: str):
     assert models == models_deserialized
 
 
+@pytest.mark.parametrize("transaction", [True, False])
+@pytest.mark.parametrize("concurrency", [1, 3])
+async def test_chunked_insert(redis_store, monkeypatch, transaction, concurrency):
+    """Chunked inserts write every row, with at most concurrency pipelines of chunk_size rows in flight"""
+    many_books = [Book(**{**books[0].dict(), "title": f"Volume {index}"}) for index in range(10)]
+    chunks = []
+    in_flight = []
+    peak = []
+    insert_chunk = Book._insert_chunk
+
+    async def recording_insert_chunk(data_list, life_span, transaction=True):
+        chunks.append(len(data_list))
+        in_flight.append(1)
+        await asyncio.sleep(0)
+        peak.append(len(in_flight))
+        try:
+            return await insert_chunk(data_list, life_span, transaction)
+        finally:
+            in_flight.pop()
+
+    monkeypatch.setattr(Book, "_insert_chunk", recording_insert_chunk)
+    response = await Book.insert(many_books, chunk_size=4, transaction=transaction, concurrency=concurrency)
+
+    assert chunks == [4, 4, 2]
+    assert max(peak) <= concurrency
+    assert len(response) > 0
+    assert sorted(await Book.select(), key=lambda book: int(book.title.split()[1])) == many_books
+
+
+@pytest.mark.parametrize("arguments", [{"chunk_size": 0}, {"concurrency": 0}])
+async def test_chunked_insert_bad_arguments(redis_store, arguments):
+    """chunk_size and concurrency have to be at least 1"""
+    with pytest.raises(ValueError, match=r"at least 1"):
+        await Book.insert(books, **arguments)
+
+
 @pytest.mark.parametrize("store, models, model_class, key_prefix", parameters)
 async def test_insert_single(store, models, model_class, key_prefix: str):
     """
@@ -511,3 +548,151 @@ async def test_uuid_support(redis_store):
     from_redis = await UUIDModel.select()
     assert from_redis[0] == this_model
     assert isinstance(from_redis[0].uuid, UUID)
+
+
+@pytest.mark.parametrize("store, models, model_class, key_prefix", parameters)
+async def test_select_page(store, models, model_class, key_prefix):
+    """Walking select_page with its continuation tokens returns every row, in the same order as select"""
+    await model_class.insert(models)
+    expected = await model_class.select()
+
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = await model_class.select_page(after=cursor, limit=1)
+        pages.extend(page)
+        if cursor is None:
+            break
+    assert pages == expected
+
+
+async def test_select_page_columns(redis_store):
+    """select_page can return some of the columns"""
+    await Book.insert(books)
+    page, cursor = await Book.select_page(limit=2, columns=["title", "author"])
+    assert len(page) == 2
+    assert cursor is not None
+    assert sorted(page[0].keys()) == ["author", "title"]
+
+    page, cursor = await Book.select_page(after=cursor, limit=2, columns=["title", "author"])
+    assert len(page) == 2
+    assert cursor is None
+
+
+async def test_select_page_empty(redis_store):
+    """select_page on an empty table returns no rows and no continuation token"""
+    assert await Book.select_page() == ([], None)
+
+
+async def test_select_page_after_delete(redis_store):
+    """Deleted rows are removed from the sorted index"""
+    await Book.insert(books)
+    await Book.delete(ids=[books[0].title])
+    page, cursor = await Book.select_page(limit=len(books))
+    assert len(page) == len(books) - 1
+    assert books[0] not in page
+    assert cursor is None
+
+
+async def test_select_page_bad_arguments(redis_store):
+    """Invalid continuation tokens and limits raise a ValueError"""
+    with pytest.raises(ValueError, match=r"Invalid cursor"):
+        await Book.select_page(after="not a cursor!")
+    with pytest.raises(ValueError, match=r"limit"):
+        await Book.select_page(limit=0)
+
+
+@pytest.mark.parametrize("store, models, model_class, key_prefix", parameters)
+async def test_iter_select(store, models, model_class, key_prefix):
+    """iter_select yields every row in the table"""
+    await model_class.insert(models)
+    rows = [row async for row in model_class.iter_select(batch_size=2)]
+    assert len(rows) == len(models)
+    assert all(row in rows for row in models)
+
+
+async def test_iter_select_batches(redis_store, monkeypatch):
+    """iter_select never fetches more than batch_size rows at a time"""
+    many_books = [Book(**{**books[0].dict(), "title": f"Volume {index}"}) for index in range(25)]
+    await Book.insert(many_books)
+    batches = []
+    fetch_records = Book._fetch_records
+
+    async def recording_fetch_records(keys, columns=None):
+        batches.append(len(keys))
+        return await fetch_records(keys, columns)
+
+    monkeypatch.setattr(Book, "_fetch_records", recording_fetch_records)
+    titles = [row["title"] async for row in Book.iter_select(batch_size=4, columns=["title"])]
+    assert sorted(titles) == sorted(book.title for book in many_books)
+    assert max(batches) <= 4
+
+
+async def test_iter_select_empty(redis_store):
+    """iter_select on an empty table yields nothing"""
+    assert [row async for row in Book.iter_select()] == []
+
+
+async def test_iter_select_bad_batch_size(redis_store):
+    """batch_size has to be at least 1"""
+    with pytest.raises(ValueError, match=r"batch_size"):
+        await Book.iter_select(batch_size=0).__anext__()
+
+
+@pytest.mark.parametrize("store, models, model_class, key_prefix", parameters)
+async def test_get(store, models, model_class, key_prefix):
+    """get returns the row with a primary key, or None"""
+    await model_class.insert(models)
+    primary_key = getattr(models[0], model_class._primary_key_field)
+    assert await model_class.get(primary_key) == models[0]
+    assert await model_class.get("not a key") is None
+
+
+async def test_get_is_batched(redis_store, monkeypatch):
+    """Concurrent gets are read in one round trip, each caller gets its own instance"""
+    await Book.insert(books)
+    batches = []
+    fetch_records = Book._fetch_records
+
+    async def recording_fetch_records(keys, columns=None):
+        batches.append(keys)
+        return await fetch_records(keys, columns)
+
+    monkeypatch.setattr(Book, "_fetch_records", recording_fetch_records)
+    titles = [book.title for book in books] + [books[0].title, "not a title"]
+    result = await asyncio.gather(*(Book.get(title) for title in titles))
+
+    assert result == books + [books[0], None]
+    assert result[0] is not result[-2]
+    assert len(batches) == 1
+    assert len(batches[0]) == len(books) + 1
+
+
+async def test_get_errors(redis_store, monkeypatch):
+    """Every get in a failed batch gets the error"""
+
+    async def failing_fetch_records(keys, columns=None):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(Book, "_fetch_records", failing_fetch_records)
+    result = await asyncio.gather(Book.get("a"), Book.get("b"), return_exceptions=True)
+    assert [str(error) for error in result] == ["redis went away"] * 2
+
+
+@pytest.mark.parametrize("store, models, model_class, key_prefix", parameters)
+async def test_count(store, models, model_class, key_prefix):
+    """count returns the number of rows in the table"""
+    assert await model_class.count() == 0
+    await model_class.insert(models)
+    assert await model_class.count() == len(models)
+    await model_class.delete(ids=[getattr(models[0], model_class._primary_key_field)])
+    assert await model_class.count() == len(models) - 1
+
+
+async def test_exists(redis_store):
+    """exists checks rows without reading them, for one id or a list of them"""
+    await Book.insert(books)
+    assert await Book.exists(books[0].title) is True
+    assert await Book.exists("not a title") is False
+    assert await Book.exists([books[1].title, "not a title", books[0].title]) == [True, False, True]
+    assert await Book.exists([]) == []
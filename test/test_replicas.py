@@ -0,0 +1,235 @@
+"""Tests for routing reads to replicas"""
+
+import asyncio
+from datetime import date
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis import ClusterStore
+from pydantic_aioredis import ShardedStore
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.routing import ReadRouter
+from pydantic_aioredis.store import Store
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _indexes = ["author"]
+    _sorted_indexes = ["published_on"]
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+
+
+class FreshBook(Book):
+    _read_your_writes = 1.0
+
+
+books = [
+    Book(title="Oliver Twist", author="Charles Dickens", published_on=date(1838, 4, 4)),
+    Book(title="Great Expectations", author="Charles Dickens", published_on=date(1861, 4, 4)),
+    Book(title="Jane Eyre", author="Charlotte Bronte", published_on=date(1847, 10, 16)),
+]
+
+
+@pytest_asyncio.fixture()
+async def replicated_store():
+    """Sets up a store with two replicas, each on its own fake redis server, and adds the book models to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, replicas=[("replica-1", 1024), ("replica-2", 1024)]),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.replica_stores = [FakeRedis(decode_responses=True), FakeRedis(decode_responses=True)]
+    store.register_model(Book)
+    store.register_model(FreshBook)
+    yield store
+    for client in [store.redis_store, *store.replica_stores]:
+        await client.flushall()
+
+
+async def replicate(store, model_class, rows, replicas=None):
+    """Writes rows to the replicas, like replication would"""
+    primary = store.redis_store
+    for replica in store.replica_stores if replicas is None else replicas:
+        store.redis_store = replica
+        await model_class.insert(rows)
+    store.redis_store = primary
+
+
+async def test_reads_go_to_replicas(replicated_store):
+    """Writes go to the primary, select, count and exists read the replicas"""
+    await Book.insert(books)
+    assert await replicated_store.redis_store.exists("book:Oliver Twist") == 1
+    assert await Book.select() is None
+    assert await Book.count() == 0
+    assert await Book.exists("Oliver Twist") is False
+    assert await Book.get("Oliver Twist") is None
+
+    await replicate(replicated_store, Book, books)
+    assert len(await Book.select()) == 3
+    assert await Book.select(where={"author": "Charles Dickens"}) == [books[1], books[0]]
+    assert await Book.select(order_by="published_on", limit=1) == [books[0]]
+    page, after = await Book.select_page(limit=1)
+    assert page == [books[1]]
+    assert after is not None
+    assert len([book async for book in Book.iter_select()]) == 3
+    assert await Book.count(where={"author": "Charlotte Bronte"}) == 1
+    assert await Book.get("Jane Eyre") == books[2]
+
+
+async def test_round_robin(replicated_store):
+    """Each read goes to the next replica"""
+    await replicate(replicated_store, Book, books[:1], replicas=replicated_store.replica_stores[:1])
+    assert [await Book.exists("Oliver Twist") for _ in range(4)] == [True, False, True, False]
+
+
+async def test_iter_select_scans_one_replica(replicated_store, monkeypatch):
+    """A cursor is only followed on the replica that returned it"""
+    rows = [
+        Book(title=f"Book {number}", author="Anonymous", published_on=date(1900, 1, 1) + timedelta(days=number))
+        for number in range(300)
+    ]
+    # with a third replica, the reads of each batch don't bring round robin back to the replica that is scanned
+    replicated_store.replica_stores.append(FakeRedis(decode_responses=True))
+    await replicate(replicated_store, Book, rows)
+    scanned = []
+    for replica in replicated_store.replica_stores:
+
+        def sscan(*args, replica=replica, sscan=replica.sscan, **kwargs):
+            scanned.append(replica)
+            return sscan(*args, **kwargs)
+
+        monkeypatch.setattr(replica, "sscan", sscan)
+
+    assert len([book async for book in Book.iter_select(batch_size=20)]) == 300
+    assert len(scanned) > 1
+    assert all(replica is scanned[0] for replica in scanned)
+
+
+async def test_writes_stay_on_the_primary(replicated_store):
+    """Saves and deletes change the primary, and use what is on the primary"""
+    await Book.insert(books)
+    await replicate(replicated_store, Book, books)
+    book = (await Book.select(ids=["Oliver Twist"]))[0]
+    book.in_stock = False
+    await book.save()
+    book.author = "Someone Else"
+    await book.save()
+    assert await replicated_store.redis_store.hget("book:Oliver Twist", "in_stock") == "false"
+    assert await replicated_store.redis_store.smembers("book:__index:author:Charles Dickens") == {
+        "book:Great Expectations"
+    }
+    await Book.delete()
+    assert await replicated_store.redis_store.keys("book*") == []
+    # the replicas catch up with replication, not with the store
+    assert await Book.count() == 3
+
+
+async def test_read_your_writes(replicated_store, monkeypatch):
+    """Models with _read_your_writes read the primary for a while after they write"""
+    now = 1000.0
+    monkeypatch.setattr("pydantic_aioredis.model.monotonic", lambda: now)
+    assert await FreshBook.select() is None
+    await FreshBook.insert([FreshBook(**book.dict()) for book in books])
+    assert await FreshBook.count() == 3
+    assert await FreshBook.get("Jane Eyre") == FreshBook(**books[2].dict())
+    # other models don't read the primary because of it
+    assert await Book.count() == 0
+    now += 1.5
+    assert await FreshBook.count() == 0
+
+
+class Replica:
+    """A replica that answers PING after delay seconds, or fails if delay is None"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def ping(self):
+        if self.delay is None:
+            raise ConnectionError("replica went away")
+        await asyncio.sleep(self.delay)
+        return True
+
+
+async def test_least_latency():
+    """Reads go to the replica that answers the fastest, and not to ones that don't answer"""
+    slow, fast, gone = Replica(0.05), Replica(0.0), Replica(None)
+    router = ReadRouter([slow, gone, fast], "least_latency", probe_interval=0)
+    # nothing is measured yet
+    assert [router.pick() for _ in range(3)] == [slow, gone, fast]
+    await router._probe
+    assert router.latencies[1] is None
+    assert [router.pick() for _ in range(3)] == [fast] * 3
+    fast.delay = None
+    await router._probe
+    await router.probe()
+    assert router.pick() is slow
+    await router._probe
+
+
+def test_connects_to_replicas():
+    """Replicas share the db and password of the primary"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(db=2, password="secret", replicas=[("replica-1", 6380)]),  # nosec
+    )
+    assert [replica.connection_pool.connection_kwargs["host"] for replica in store.replica_stores] == ["replica-1"]
+    assert store.replica_stores[0].connection_pool.connection_kwargs["port"] == 6380
+    assert store.replica_stores[0].connection_pool.connection_kwargs["db"] == 2
+    assert store.replica_stores[0].connection_pool.connection_kwargs["password"] == "secret"  # nosec
+    assert Store(name="sample", redis_config=RedisConfig()).reader() is not None
+
+
+def test_connects_with_sentinels():
+    """Sentinels find the primary for writes and the replicas for reads"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(sentinels=[("sentinel-1", 26379), ("sentinel-2", 26379)], sentinel_service="books"),
+    )
+    assert store.redis_store.connection_pool.is_master is True
+    assert store.redis_store.connection_pool.service_name == "books"
+    assert [replica.connection_pool.is_master for replica in store.replica_stores] == [False]
+
+
+@pytest.mark.parametrize(
+    "arguments, message",
+    [
+        ({"redis_config": RedisConfig(), "read_policy": "random"}, "read_policy"),
+        ({"redis_config": RedisConfig(sentinels=[("sentinel", 26379)])}, "sentinel_service"),
+        (
+            {
+                "redis_config": RedisConfig(
+                    sentinels=[("sentinel", 26379)], sentinel_service="books", replicas=[("replica", 6379)]
+                )
+            },
+            "replicas",
+        ),
+    ],
+)
+def test_bad_arguments(arguments, message):
+    """Bad replica settings are caught when the store is made"""
+    with pytest.raises(ValueError, match=message):
+        Store(name="sample", **arguments)
+
+
+def test_bad_arguments_of_other_stores():
+    with pytest.raises(ValueError, match="replicas"):
+        ClusterStore(name="sample", redis_config=RedisConfig(replicas=[("replica", 6379)]))
+    store = ShardedStore(name="sample", redis_configs=[RedisConfig(port=1, replicas=[("replica", 6379)])])
+    assert store.replica_stores == []
+    assert len(store.shards[0].replica_stores) == 1
+
+
+def test_bad_read_your_writes():
+    class HastyBook(Book):
+        _read_your_writes = 0
+
+    with pytest.raises(ValueError, match="_read_your_writes"):
+        Store(name="sample", redis_config=RedisConfig()).register_model(HastyBook)
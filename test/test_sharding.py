@@ -0,0 +1,198 @@
+"""Tests for spreading models over several redis servers"""
+
+from datetime import date
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis import ShardedStore
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.sharding import HashRing
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _indexes = ["author", "in_stock"]
+    _sorted_indexes = ["published_on"]
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+    copies: int = 0
+
+
+class BlobBook(Book):
+    _storage = "blob"
+
+
+books = [
+    Book(
+        title=f"Book {number:02}",
+        author=f"Author {number % 3}",
+        # a few books share a date, to check the order of ties
+        published_on=date(1900, 1, 1) + timedelta(days=number // 2),
+        in_stock=number % 2 == 0,
+    )
+    for number in range(30)
+]
+
+
+@pytest_asyncio.fixture()
+async def sharded_store():
+    """Sets up a store sharded over three fake redis servers and adds the book models to it"""
+    store = ShardedStore(
+        name="sample",
+        redis_configs=[RedisConfig(port=port) for port in (1024, 1025, 1026)],  # nosec
+        life_span_in_seconds=3600,
+    )
+    for shard in store.shards:
+        shard.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(BlobBook)
+    yield store
+    for shard in store.shards:
+        await shard.redis_store.flushall()
+
+
+async def test_rows_are_spread(sharded_store):
+    """Each row and its index entries are on the shard its key hashes to"""
+    await Book.insert(books)
+    counts = []
+    for shard in sharded_store.shards:
+        keys = await shard.redis_store.smembers("book:__index")
+        assert all(sharded_store.shard_of(key) is shard for key in keys)
+        assert await shard.redis_store.exists(*keys) == len(keys)
+        index_keys = await shard.redis_store.smembers("book:__index:author:Author 0")
+        assert index_keys <= keys
+        counts.append(len(keys))
+    assert sum(counts) == len(books)
+    assert all(count > 0 for count in counts)
+
+
+@pytest.mark.parametrize("model_class", [Book, BlobBook])
+async def test_queries(sharded_store, model_class):
+    """Queries read every shard and merge the results like a single server would return them"""
+    rows = [model_class(**book.dict()) for book in books]
+    await model_class.insert(rows)
+    assert await model_class.select() == rows
+    assert await model_class.select(ids=["Book 07", "Book 03"]) == [rows[3], rows[7]]
+    assert await model_class.get("Book 12") == rows[12]
+    assert await model_class.select(where={"author": "Author 1", "in_stock": True}) == [
+        row for row in rows if row.author == "Author 1" and row.in_stock
+    ]
+    by_date = sorted(rows, key=lambda row: (row.published_on, row.title))
+    assert await model_class.select(order_by="published_on", skip=5, limit=10) == by_date[5:15]
+    assert await model_class.select(order_by="-published_on", limit=7) == by_date[::-1][:7]
+    assert (
+        await model_class.select(order_by="published_on", min=date(1900, 1, 5), skip=3)
+        == [row for row in by_date if row.published_on >= date(1900, 1, 5)][3:]
+    )
+
+    pages, after = [], None
+    while True:
+        page, after = await model_class.select_page(after=after, limit=8)
+        pages.append(page)
+        if after is None:
+            break
+    assert [len(page) for page in pages] == [8, 8, 8, 6]
+    assert [row for page in pages for row in page] == rows
+    assert sorted([row.title async for row in model_class.iter_select(batch_size=4)]) == [row.title for row in rows]
+
+    assert await model_class.count() == 30
+    assert await model_class.count(where={"author": "Author 2", "in_stock": False}) == 5
+    assert await model_class.count(order_by="published_on", max=date(1900, 1, 3)) == 6
+    assert await model_class.exists(["Book 01", "Book 50", "Book 29"]) == [True, False, True]
+
+
+async def test_writes(sharded_store):
+    """Saves and deletes reach the shards with the rows"""
+    await Book.insert(books)
+    book = await Book.get("Book 04")
+    book.copies = 3
+    await book.save()
+    book.author = "Someone Else"
+    await book.save()
+    assert await Book.select(where={"author": "Someone Else"}) == [book]
+    assert (await Book.get("Book 04")).copies == 3
+    await Book.delete(ids=["Book 04", "Book 05", "Book 06"])
+    assert await Book.count() == 27
+    assert await Book.exists(["Book 04", "Book 05", "Book 06"]) == [False] * 3
+    await Book.delete()
+    assert await Book.count() == 0
+    for shard in sharded_store.shards:
+        assert await shard.redis_store.keys("book*") == []
+
+
+async def test_row_operations_touch_one_shard(sharded_store, monkeypatch):
+    """Reading or writing a row by its primary key only talks to the shard that has it"""
+    await Book.insert(books)
+    shard = sharded_store.shard_of("book:Book 10")
+    for other in sharded_store.shards:
+        if other is not shard:
+            # any use of the other shards fails
+            monkeypatch.setattr(other, "redis_store", None)
+    book = await Book.get("Book 10")
+    book.copies = 5
+    await book.save()
+    assert await Book.exists("Book 10") is True
+    assert (await Book.select(ids=["Book 10"]))[0].copies == 5
+    await Book.insert(book)
+    await Book.delete(ids=["Book 10"])
+    assert await Book.exists("Book 10") is False
+
+
+@pytest.mark.parametrize("model_class", [Book, BlobBook])
+async def test_rebuild_indexes(sharded_store, model_class):
+    """The indexes of every shard are rebuilt from the rows it keeps"""
+    rows = [model_class(**book.dict()) for book in books]
+    await model_class.insert(rows)
+    for shard in sharded_store.shards:
+        index_keys = await shard.redis_store.keys(f"{model_class.get_key_prefix()}__*")
+        await shard.redis_store.delete(*[key for key in index_keys if key != model_class.get_table_index_key()])
+    assert await model_class.rebuild_indexes() == len(books)
+    assert await model_class.select_page(limit=len(books)) == (rows, None)
+    assert await model_class.select(where={"author": "Author 1", "in_stock": True}) == rows[4:30:6]
+    assert await model_class.select(order_by="published_on", limit=2) == rows[:2]
+
+
+async def test_client_tracking_needs_invalidations(sharded_store):
+    """A sharded store can't track keys by itself"""
+    with pytest.raises(ValueError, match="invalidations"):
+        await sharded_store.start_client_tracking()
+
+
+def test_hash_ring():
+    """Keys are spread evenly, and adding a node only moves keys to it"""
+    keys = [f"book:{number}" for number in range(10000)]
+    ring = HashRing(["a", "b", "c"])
+    placement = [ring.nodes[ring.index_of(key)] for key in keys]
+    assert all(2800 < placement.count(node) < 3900 for node in "abc")
+    assert [HashRing(["c", "a", "b"]).nodes[HashRing(["c", "a", "b"]).index_of(key)] for key in keys[:100]] == (
+        placement[:100]
+    )
+    bigger = HashRing(["a", "b", "c", "d"])
+    moved = [(before, bigger.nodes[bigger.index_of(key)]) for key, before in zip(keys, placement)]
+    moved = [(before, after) for before, after in moved if before != after]
+    assert all(after == "d" for _, after in moved)
+    assert 1800 < len(moved) < 3200
+
+
+@pytest.mark.parametrize(
+    "redis_configs, message",
+    [
+        ([], "at least one"),
+        ([RedisConfig(port=1), RedisConfig(port=2, decode_responses=False)], "decode_responses"),
+        ([RedisConfig(), RedisConfig()], "different names"),
+    ],
+)
+def test_bad_arguments(redis_configs, message):
+    """Bad shard settings are caught when the store is made"""
+    with pytest.raises(ValueError, match=message):
+        ShardedStore(name="sample", redis_configs=redis_configs)
+
+
+def test_bad_ring_points():
+    with pytest.raises(ValueError, match="points"):
+        ShardedStore(name="sample", redis_configs=[RedisConfig()], ring_points=0)
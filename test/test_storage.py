@@ -0,0 +1,224 @@
+"""Tests for the storage modes of models"""
+
+from datetime import date
+from ipaddress import IPv4Network
+from typing import Dict
+from typing import List
+from typing import Optional
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+
+class BlobBook(Model):
+    _primary_key_field: str = "title"
+    _storage = "blob"
+    _indexes = ["author"]
+    _sorted_indexes = ["published_on"]
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+    editions: List[str] = []
+    prices: Dict[str, float] = {}
+    isbn: Optional[UUID]
+    network: Optional[IPv4Network]
+
+
+books = [
+    BlobBook(
+        title="Oliver Twist",
+        author="Charles Dickens",
+        published_on=date(year=1215, month=4, day=4),
+        in_stock=False,
+        editions=["first", "ebook"],
+        prices={"ebook": 2.5},
+        isbn=uuid4(),
+        network=IPv4Network("10.0.0.0/24"),
+    ),
+    BlobBook(
+        title="Great Expectations",
+        author="Charles Dickens",
+        published_on=date(year=1220, month=4, day=4),
+    ),
+    BlobBook(
+        title="Wuthering Heights",
+        author="Jane Austen",
+        published_on=date(year=1600, month=4, day=4),
+    ),
+]
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store and adds the blob book model to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(BlobBook)
+    await BlobBook.insert([book.copy() for book in books])
+    yield store
+    await store.redis_store.flushall()
+
+
+def test_register_model_with_bad_storage(redis_store):
+    """Only known storage modes can be used"""
+
+    class BadStorageModel(Model):
+        _primary_key_field = "name"
+        _storage = "carrier pigeon"
+        name: str
+
+    with pytest.raises(ValueError, match=r"unknown _storage"):
+        redis_store.register_model(BadStorageModel)
+
+
+async def test_blob_is_a_single_value(redis_store):
+    """Blob rows are stored as one string with the store's life span"""
+    key = "blobbook:Oliver Twist"
+    assert await redis_store.redis_store.type(key) == "string"
+    assert 0 < await redis_store.redis_store.ttl(key) <= 3600
+
+
+async def test_blob_select(redis_store):
+    """Blob rows round trip through select"""
+    result = await BlobBook.select()
+    assert sorted(result, key=lambda book: book.title) == sorted(books, key=lambda book: book.title)
+    assert await BlobBook.select(ids=["Oliver Twist"]) == [books[0]]
+    assert await BlobBook.select(ids=["Not in there"]) is None
+
+
+async def test_blob_select_columns(redis_store):
+    """Columns of blob rows are projected client side"""
+    result = await BlobBook.select(columns=["title", "editions"], ids=["Oliver Twist"])
+    assert result == [{"title": "Oliver Twist", "editions": ["first", "ebook"]}]
+
+
+async def test_blob_indexes(redis_store):
+    """Indexes, sorted indexes and pagination work with blob rows"""
+    result = await BlobBook.select(where={"author": "Charles Dickens"})
+    assert sorted(book.title for book in result) == ["Great Expectations", "Oliver Twist"]
+
+    result = await BlobBook.select(order_by="-published_on", limit=1)
+    assert [book.title for book in result] == ["Wuthering Heights"]
+
+    page, cursor = await BlobBook.select_page(limit=2)
+    assert [book.title for book in page] == ["Great Expectations", "Oliver Twist"]
+    page, cursor = await BlobBook.select_page(after=cursor, limit=2)
+    assert [book.title for book in page] == ["Wuthering Heights"]
+    assert cursor is None
+
+
+async def test_blob_update_and_delete(redis_store):
+    """Saving and deleting blob rows keeps the indexes in sync"""
+    book = (await BlobBook.select(ids=["Great Expectations"]))[0]
+    book.author = "Jane Austen"
+    await book.save()
+    result = await BlobBook.select(where={"author": "Jane Austen"})
+    assert sorted(book.title for book in result) == ["Great Expectations", "Wuthering Heights"]
+
+    await BlobBook.delete(ids=["Great Expectations", "Oliver Twist"])
+    assert await BlobBook.select(where={"author": "Charles Dickens"}) is None
+    assert [book.title for book in await BlobBook.select()] == ["Wuthering Heights"]
+
+
+class MsgpackBook(Model):
+    _primary_key_field: str = "title"
+    _codec = "msgpack"
+    _indexes = ["author", "published_on"]
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+    editions: List[str] = []
+    prices: Dict[str, float] = {}
+    isbn: Optional[UUID]
+    network: Optional[IPv4Network]
+
+
+class MsgpackBlobBook(MsgpackBook):
+    _storage = "blob"
+
+
+class JsonBook(MsgpackBook):
+    _codec = "json"
+
+
+@pytest_asyncio.fixture()
+async def binary_redis_store():
+    """Sets up a redis store that does not decode responses"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1, decode_responses=False),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=False)
+    yield store
+    await store.redis_store.flushall()
+
+
+def test_register_msgpack_model_needs_binary_store(redis_store):
+    """msgpack models can not be used with connections that decode responses"""
+    with pytest.raises(ValueError, match=r"decode_responses=False"):
+        redis_store.register_model(MsgpackBook)
+
+
+def test_register_model_with_bad_codec(redis_store):
+    """Only known codecs can be used"""
+
+    class BadCodecModel(Model):
+        _primary_key_field = "name"
+        _codec = "morse"
+        name: str
+
+    with pytest.raises(ValueError, match=r"unknown _codec"):
+        redis_store.register_model(BadCodecModel)
+
+
+@pytest.mark.parametrize("model_class", [MsgpackBook, MsgpackBlobBook, JsonBook])
+async def test_binary_store(binary_redis_store, model_class):
+    """Models round trip through a store that does not decode responses, whatever their codec"""
+    pytest.importorskip("msgpack")
+    binary_redis_store.register_model(model_class)
+    instances = [model_class(**book.dict()) for book in books]
+    await model_class.insert(instances)
+
+    result = await model_class.select()
+    assert sorted(result, key=lambda book: book.title) == sorted(instances, key=lambda book: book.title)
+    result = await model_class.select(columns=["title", "prices"], ids=["Oliver Twist"])
+    assert result == [{"title": "Oliver Twist", "prices": {"ebook": 2.5}}]
+
+    result = await model_class.select(where={"published_on": date(1215, 4, 4)})
+    assert [book.title for book in result] == ["Oliver Twist"]
+    instances[0].author = "Jane Austen"
+    await instances[0].save()
+    result = await model_class.select(where={"author": "Jane Austen"})
+    assert sorted(book.title for book in result) == ["Oliver Twist", "Wuthering Heights"]
+
+    page, cursor = await model_class.select_page(limit=1)
+    assert [book.title for book in page] == ["Great Expectations"]
+    await model_class.delete()
+    assert await model_class.select() is None
+
+
+async def test_msgpack_is_smaller(binary_redis_store):
+    """msgpack rows take fewer bytes than json rows"""
+    pytest.importorskip("msgpack")
+    binary_redis_store.register_model(MsgpackBlobBook)
+
+    class JsonBlobBook(JsonBook):
+        _storage = "blob"
+
+    binary_redis_store.register_model(JsonBlobBook)
+    msgpack_size = len(MsgpackBlobBook.get_serialization_plan().encode_record(books[0].dict()))
+    json_size = len(JsonBlobBook.get_serialization_plan().encode_record(books[0].dict()).encode())
+    assert msgpack_size < json_size
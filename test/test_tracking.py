@@ -0,0 +1,228 @@
+"""Tests for keeping model caches in sync with redis client tracking"""
+
+import asyncio
+from datetime import date
+
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+from pydantic_aioredis.tracking import INVALIDATE_CHANNEL
+from pydantic_aioredis.tracking import RedisInvalidations
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    _cache_size = 10
+    title: str
+    author: str
+    published_on: date
+
+
+class Author(Model):
+    _primary_key_field: str = "name"
+    _cache_size = 10
+    name: str
+
+
+class FakeInvalidations:
+    """Invalidations sent by the test, like redis would send them"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    async def send(self, keys):
+        await self.queue.put(keys)
+        # let the store handle them
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    async def __aiter__(self):
+        while True:
+            keys = await self.queue.get()
+            if isinstance(keys, Exception):
+                raise keys
+            yield keys
+
+    async def close(self):
+        self.closed = True
+
+
+class StubConnection:
+    """A connection that records the commands sent to it, and answers CLIENT ID"""
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.disconnected = False
+
+    async def send_command(self, *arguments):
+        self.commands.append(list(arguments))
+
+    async def read_response(self):
+        return 7 if self.commands[-1] == ["CLIENT", "ID"] else b"OK"
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+class StubPubSub:
+    """A pubsub connection that has the given messages, without aclose like before redis 5.0.1"""
+
+    def __init__(self, commands, messages):
+        self.commands = commands
+        self.messages = messages
+        self.connection = None
+        self.closed = False
+
+    async def connect(self):
+        self.connection = StubConnection(self.commands)
+
+    async def subscribe(self, channel):
+        self.commands.append(["SUBSCRIBE", channel])
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+
+    async def close(self):
+        self.closed = True
+
+
+class StubRedis:
+    """The parts of a redis client RedisInvalidations uses"""
+
+    def __init__(self, messages):
+        self.commands = []
+        self.released = []
+        self._pubsub = StubPubSub(self.commands, messages)
+        self.connection_pool = self
+
+    def pubsub(self):
+        return self._pubsub
+
+    async def get_connection(self, command_name, *keys, **options):
+        self.commands.append(["GET CONNECTION", command_name])
+        return StubConnection(self.commands)
+
+    async def release(self, connection):
+        self.released.append(connection)
+
+
+books = [
+    Book(title="Oliver Twist", author="Charles Dickens", published_on=date(1215, 4, 4)),
+    Book(title="Jane Eyre", author="Charlotte Bronte", published_on=date(1847, 10, 16)),
+]
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store with cached models, kept in sync by fake invalidations"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(Author)
+    await Book.insert(books)
+    await Author.insert(Author(name="Charles Dickens"))
+    yield store
+    await store.stop_client_tracking()
+    await store.redis_store.flushall()
+
+
+async def test_changes_elsewhere_are_evicted(redis_store):
+    """Rows changed by other clients are read again"""
+    invalidations = FakeInvalidations()
+    await redis_store.start_client_tracking(invalidations)
+    assert redis_store.client_tracking
+    assert await Book.get("Oliver Twist") == books[0]
+    assert await Book.get("Jane Eyre") == books[1]
+    assert await Author.get("Charles Dickens") == Author(name="Charles Dickens")
+    await redis_store.redis_store.hset("book:Oliver Twist", "author", "Somebody Else")
+    await invalidations.send(["book:Oliver Twist", "unrelated:key"])
+    assert (await Book.get("Oliver Twist")).author == "Somebody Else"
+    assert Book.cache_info().size == 2
+    assert Author.cache_info().size == 1
+
+
+async def test_invalidate_everything(redis_store):
+    """None, e.g. after FLUSHDB, empties every cache"""
+    invalidations = FakeInvalidations()
+    await redis_store.start_client_tracking(invalidations)
+    await Book.select()
+    await Author.select()
+    await invalidations.send(None)
+    assert Book.cache_info().size == 0
+    assert Author.cache_info().size == 0
+
+
+async def test_stopping_empties_caches(redis_store):
+    """Cached rows aren't trusted once tracking stops"""
+    invalidations = FakeInvalidations()
+    await redis_store.start_client_tracking(invalidations)
+    await Book.select()
+    await redis_store.stop_client_tracking()
+    assert not redis_store.client_tracking
+    assert invalidations.closed
+    assert Book.cache_info().size == 0
+
+
+async def test_lost_invalidations_empty_caches(redis_store):
+    """Cached rows aren't trusted once the invalidations stop"""
+    invalidations = FakeInvalidations()
+    await redis_store.start_client_tracking(invalidations)
+    await Book.select()
+    await invalidations.send(ConnectionError("redis went away"))
+    assert not redis_store.client_tracking
+    assert Book.cache_info().size == 0
+
+
+async def test_redis_invalidations_prefixes(redis_store, monkeypatch):
+    """By default tracking covers the rows of the cached models"""
+    started = []
+
+    async def start(self):
+        started.append(self.prefixes)
+
+    monkeypatch.setattr(RedisInvalidations, "start", start)
+    monkeypatch.setattr(RedisInvalidations, "__aiter__", lambda self: FakeInvalidations().__aiter__())
+    await redis_store.start_client_tracking()
+    assert started == [["book:", "author:"]]
+
+
+def test_parse_message():
+    """Invalidation messages are turned into lists of keys"""
+    assert RedisInvalidations.parse_message(None) is False
+    assert RedisInvalidations.parse_message({"type": "subscribe", "channel": INVALIDATE_CHANNEL, "data": 1}) is False
+    assert RedisInvalidations.parse_message({"type": "message", "channel": INVALIDATE_CHANNEL, "data": None}) is None
+    assert RedisInvalidations.parse_message({"type": "message", "data": [b"book:a", "book:b"]}) == ["book:a", "book:b"]
+    assert RedisInvalidations.parse_message({"type": "message", "data": b"book:a"}) == ["book:a"]
+
+
+async def test_redis_invalidations():
+    """Tracking is redirected to the subscribed connection, and its invalidation messages are yielded as keys"""
+    messages = [
+        {"type": "subscribe", "channel": INVALIDATE_CHANNEL, "data": 1},
+        {"type": "message", "channel": INVALIDATE_CHANNEL, "data": [b"book:a", b"book:b"]},
+        {"type": "message", "channel": INVALIDATE_CHANNEL, "data": None},
+    ]
+    redis_store = StubRedis(messages)
+    invalidations = RedisInvalidations(redis_store, ["book:", "author:"])
+    await invalidations.start()
+    assert redis_store.commands == [
+        ["CLIENT", "ID"],
+        ["SUBSCRIBE", INVALIDATE_CHANNEL],
+        ["GET CONNECTION", "CLIENT"],
+        ["CLIENT", "TRACKING", "ON", "REDIRECT", 7, "BCAST", "PREFIX", "book:", "PREFIX", "author:"],
+    ]
+    assert [keys async for keys in invalidations] == [["book:a", "book:b"], None]
+
+    tracking_connection = invalidations._tracking_connection
+    await invalidations.close()
+    assert tracking_connection.disconnected
+    assert redis_store.released == [tracking_connection]
+    assert redis_store._pubsub.closed
@@ -0,0 +1,136 @@
+"""Tests for building rows without validating them, for models with _trusted_reads"""
+
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+from enum import Enum
+from ipaddress import IPv4Network
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+from uuid import UUID
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic import BaseModel
+from pydantic import ValidationError
+from pydantic import validator
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+
+
+class Color(str, Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+class Publisher(BaseModel):
+    name: str
+    founded: date
+
+
+class Book(Model):
+    _primary_key_field: str = "title"
+    title: str
+    pages: int
+    price: float
+    rating: Optional[int] = None
+    published_on: date
+    updated_at: datetime
+    in_stock: bool = True
+    isbn: UUID
+    cover: Color
+    network: IPv4Network
+    editions: List[str] = []
+    publisher: Publisher
+    extras: Dict[str, int] = {}
+    code: Union[int, str] = 0
+
+    @validator("title")
+    def upper_title(cls, value):
+        return value.upper()
+
+
+class TrustedBook(Book):
+    _trusted_reads = True
+
+
+def new_book(model_class, **data):
+    return model_class(
+        **{
+            "title": "oliver twist",
+            "pages": 300,
+            "price": 9.5,
+            "published_on": date(1838, 4, 4),
+            "updated_at": datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            "isbn": UUID("12345678-1234-5678-1234-567812345678"),
+            "cover": Color.BLUE,
+            "network": "10.0.0.0/24",
+            "editions": ["first", "second"],
+            "publisher": {"name": "Bentley", "founded": date(1829, 1, 1)},
+            "extras": {"reprints": 3},
+            "code": "a1",
+            **data,
+        }
+    )
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store with a trusted and a validated book model"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(TrustedBook)
+    yield store
+    await store.redis_store.flushall()
+
+
+async def test_trusted_rows_match_validated_rows(redis_store):
+    """Trusted reads build the same rows as validated reads"""
+    await Book.insert([new_book(Book), new_book(Book, title="jane eyre", rating=None, in_stock=False)])
+    await TrustedBook.insert([new_book(TrustedBook), new_book(TrustedBook, title="jane eyre", in_stock=False)])
+    validated = await Book.select()
+    trusted = await TrustedBook.select()
+    assert [book.dict() for book in trusted] == [book.dict() for book in validated]
+    for book in trusted:
+        assert type(book.publisher) is Publisher
+        assert type(book.isbn) is UUID
+        assert book._dirty_fields == set()
+    assert (await TrustedBook.get("OLIVER TWIST")).updated_at == datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+async def test_validators_are_skipped(redis_store):
+    """Values are trusted to be valid, validators don't run again"""
+    await TrustedBook.insert(new_book(TrustedBook))
+    await redis_store.redis_store.hset("trustedbook:OLIVER TWIST", "title", "lower case")
+    assert (await TrustedBook.select())[0].title == "lower case"
+
+
+async def test_values_that_need_validation(redis_store):
+    """Values that can't be parsed, or rows missing required fields, are validated"""
+    await TrustedBook.insert(new_book(TrustedBook))
+    await redis_store.redis_store.hset("trustedbook:OLIVER TWIST", "pages", "many")
+    with pytest.raises(ValidationError):
+        await TrustedBook.select()
+    await redis_store.redis_store.hset("trustedbook:OLIVER TWIST", "pages", "301")
+    assert (await TrustedBook.select())[0].pages == 301
+    await redis_store.redis_store.hdel("trustedbook:OLIVER TWIST", "price")
+    with pytest.raises(ValidationError):
+        await TrustedBook.select()
+
+
+async def test_trusted_lazy_rows(redis_store):
+    """Lazy rows of trusted models parse their fields the same way"""
+    await TrustedBook.insert(new_book(TrustedBook))
+    record = (await TrustedBook.select(lazy=True))[0]
+    assert record.pages == 300
+    assert record.published_on == date(1838, 4, 4)
+    assert record.to_model() == new_book(TrustedBook)
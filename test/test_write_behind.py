@@ -0,0 +1,199 @@
+"""Tests for the write-behind queue used by automatic saving"""
+
+import asyncio
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+from pydantic_aioredis.config import RedisConfig
+from pydantic_aioredis.model import AutoModel
+from pydantic_aioredis.model import Model
+from pydantic_aioredis.store import Store
+from pydantic_aioredis.write_behind import WriteBehindQueue
+
+
+class Book(AutoModel):
+    _primary_key_field: str = "title"
+    title: str
+    author: str
+    published_on: date
+    in_stock: bool = True
+    copies: int = 0
+
+
+class Author(AutoModel):
+    _primary_key_field: str = "name"
+    name: str
+
+
+@pytest_asyncio.fixture()
+async def redis_store():
+    """Sets up a redis store and adds the book model to it"""
+    store = Store(
+        name="sample",
+        redis_config=RedisConfig(port=1024, db=1),  # nosec
+        life_span_in_seconds=3600,
+    )
+    store.redis_store = FakeRedis(decode_responses=True)
+    store.register_model(Book)
+    store.register_model(Author)
+    yield store
+    await store.close()
+    await store.redis_store.flushall()
+
+
+def new_book(title: str = "Oliver Twist") -> Book:
+    return Book(title=title, author="Charles Dickens", published_on=date(year=1215, month=4, day=4))
+
+
+async def test_writes_are_queued(redis_store):
+    """Automatic saves don't write until the queue runs, flush waits for them"""
+    book = new_book()
+    assert len(redis_store.write_behind) == 1
+    assert await redis_store.redis_store.exists("book:Oliver Twist") == 0
+    await redis_store.flush()
+    assert len(redis_store.write_behind) == 0
+    assert await redis_store.redis_store.hget("book:Oliver Twist", "author") == book.author
+
+
+async def test_writes_are_coalesced(redis_store, monkeypatch):
+    """Setting many fields of a queued instance saves it once"""
+    book = new_book()
+    await redis_store.flush()
+    saved = []
+    save_many = Book._save_many
+
+    async def recording_save_many(instances):
+        saved.append(list(instances))
+        await save_many(instances)
+
+    monkeypatch.setattr(Book, "_save_many", recording_save_many)
+    for copies in range(10):
+        book.copies = copies
+    book.in_stock = False
+    await redis_store.flush()
+
+    assert saved == [[book]]
+    stored = await redis_store.redis_store.hgetall("book:Oliver Twist")
+    assert stored["copies"] == "9"
+    assert stored["in_stock"] == "false"
+
+
+async def test_newest_instance_of_a_row_is_saved(redis_store, monkeypatch):
+    """Instances of the same row queued together are saved once, with the values of the newest one"""
+    saved = []
+    save_many = Book._save_many
+
+    async def recording_save_many(instances):
+        saved.append(list(instances))
+        await save_many(instances)
+
+    monkeypatch.setattr(Book, "_save_many", recording_save_many)
+    new_book()
+    newest = new_book()
+    newest.copies = 2
+    assert len(redis_store.write_behind) == 1
+    await redis_store.flush()
+    assert saved == [[newest]]
+    assert await Book.select(ids=["Oliver Twist"]) == [newest]
+
+
+async def test_writes_are_batched(redis_store, monkeypatch):
+    """Queued instances are saved in batches of batch_size"""
+    monkeypatch.setattr(redis_store.write_behind, "batch_size", 4)
+    books = [new_book(f"Volume {index}") for index in range(10)]
+    await redis_store.flush()
+    assert sorted(await Book.select(), key=lambda book: int(book.title.split()[1])) == books
+
+
+async def test_select_flushes(redis_store):
+    """Selects see automatic saves that are still queued"""
+    book = new_book()
+    assert await Book.select(ids=["Oliver Twist"]) == [book]
+    book.copies = 3
+    assert (await Book.select(ids=["Oliver Twist"]))[0].copies == 3
+
+
+async def test_delete_flushes(redis_store):
+    """Queued automatic saves don't bring deleted rows back"""
+    new_book()
+    await Book.delete(ids=["Oliver Twist"])
+    await redis_store.flush()
+    assert await Book.select() is None
+
+
+async def test_flush_raises_background_errors(redis_store, monkeypatch):
+    """Errors from saving in the background are raised by the next flush, once"""
+
+    async def failing_save_many(instances):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(Book, "_save_many", failing_save_many)
+    new_book()
+    with pytest.raises(ConnectionError, match=r"redis went away"):
+        await redis_store.flush()
+    await redis_store.flush()
+
+
+async def test_errors_are_raised_for_their_model(redis_store, monkeypatch):
+    """An error from saving one model is raised by reads of that model, not by reads of other models"""
+
+    async def failing_save_many(instances):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(Book, "_save_many", failing_save_many)
+    new_book()
+    author = Author(name="Charles Dickens")
+    assert await Author.select() == [author]
+    with pytest.raises(ConnectionError, match=r"redis went away"):
+        await Book.select()
+    await redis_store.flush()
+
+
+async def test_cancelled_saves_stay_queued(redis_store, monkeypatch):
+    """Instances that weren't saved when saving was cancelled are saved by the next flush"""
+    started = asyncio.Event()
+    save_many = Book._save_many
+
+    async def stalled_save_many(instances):
+        started.set()
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(Book, "_save_many", stalled_save_many)
+    book = new_book()
+    await started.wait()
+    task = redis_store.write_behind._task
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert len(redis_store.write_behind) == 1
+
+    monkeypatch.setattr(Book, "_save_many", save_many)
+    await redis_store.flush()
+    assert len(redis_store.write_behind) == 0
+    assert await Book.select(ids=["Oliver Twist"]) == [book]
+
+
+async def test_close_saves_queued_instances(redis_store):
+    """close saves what is queued"""
+    book = new_book()
+    await redis_store.close()
+    assert len(redis_store.write_behind) == 0
+    assert await Book.select(ids=["Oliver Twist"]) == [book]
+
+
+def test_enqueue_without_running_loop():
+    """Without a running event loop, instances are saved right away"""
+    saved = []
+
+    class Instance(Model):
+        _primary_key_field: str = "key"
+        key: str
+
+        async def save(self):
+            saved.append(self)
+
+    instance = Instance(key="sync")
+    WriteBehindQueue().enqueue(instance)
+    assert saved == [instance]